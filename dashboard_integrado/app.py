@@ -7,7 +7,8 @@ Sistema unificado integrando todas as fases do projeto (1-4, 6)
 
 import streamlit as st
 from datetime import datetime
-from servicos.database import init_all_databases
+from servicos.database import init_all_databases, estatisticas_pools
+from servicos.recursos import estatisticas_recursos, invalidar_recurso, memoria_total_recursos
 
 # Inicializar bancos de dados
 init_all_databases()
@@ -143,6 +144,33 @@ with st.sidebar:
     - Maison Ramos (RM 565616)
     """)
 
+    with st.expander("🗄️ Conexões com Banco"):
+        for banco, stats in estatisticas_pools().items():
+            st.markdown(f"**{banco}**")
+            st.caption(
+                f"Criadas: {stats['conexoes_criadas']} | "
+                f"Reutilizadas: {stats['conexoes_reutilizadas']} | "
+                f"Em uso: {stats['em_uso']}"
+            )
+
+    with st.expander("🧠 Modelos em Memória"):
+        recursos = estatisticas_recursos()
+        if recursos:
+            st.caption(f"Total estimado: {memoria_total_recursos()} MB")
+            for chave, stats in recursos.items():
+                st.markdown(f"**{chave.split(':', 1)[0]}**")
+                st.caption(
+                    f"{stats['tamanho_mb']} MB | "
+                    f"Carga: {stats['tempo_carga_s']}s | "
+                    f"Cargas: {stats['cargas']} | "
+                    f"Acessos: {stats['acessos']}"
+                )
+            if st.button("🔄 Recarregar modelos"):
+                invalidar_recurso()
+                st.rerun()
+        else:
+            st.caption("Nenhum modelo carregado ainda")
+
 # Conteúdo principal
 st.markdown("## 📋 Visão Geral do Sistema")
 
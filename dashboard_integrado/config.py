@@ -34,6 +34,10 @@ DB_ORACLE = {
     'password': os.getenv('ORACLE_PASSWORD', 'oracle')
 }
 
+# Configurações YOLO (Fase 6): backend de inferência do DetectorYOLO
+# ("pt", "onnx", "onnx_int8" ou "auto"); padrão de DetectorYOLO em servicos/fase6_yolo.py
+YOLO_BACKEND = os.getenv('YOLO_BACKEND', 'auto')
+
 # Configurações AWS
 AWS_REGION = os.getenv('AWS_DEFAULT_REGION', 'sa-east-1')
 AWS_SNS_TOPIC_ARN = os.getenv('AWS_SNS_TOPIC_ARN', '')
@@ -17,11 +17,15 @@ sys.path.append(str(Path(__file__).parent.parent))
 from servicos.fase2_canatrack import (
     RegistroColheita,
     AnalisadorPerdas,
+    AnalisadorPerdasSQL,
     gerar_dados_exemplo,
     salvar_registro,
-    carregar_registros,
+    carregar_pagina_registros,
+    contar_registros,
+    listar_valores_filtro,
     inicializar_com_exemplos
 )
+from servicos.fase2_importacao import importar_registros
 from servicos.database import init_fase2_db
 
 # Configuração da página
@@ -101,11 +105,35 @@ st.markdown("---")
 init_fase2_db()
 inicializar_com_exemplos()
 
-# Inicializar session state
-if 'registros' not in st.session_state:
-    st.session_state.registros = carregar_registros()
-    if not st.session_state.registros:
-        st.session_state.registros = gerar_dados_exemplo()
+# Agregados calculados no banco (só as linhas de resumo chegam à página).
+# Sem registros no banco, analisa os dados de exemplo em memória
+analisador = AnalisadorPerdasSQL()
+usando_exemplos = not analisador.total_registros()
+if usando_exemplos:
+    if 'analisador' not in st.session_state:
+        st.session_state.analisador = AnalisadorPerdas(gerar_dados_exemplo())
+    analisador = st.session_state.analisador
+
+# Paginação da tabela de registros: a sessão guarda só os cursores das
+# páginas visitadas, e cada rerun busca apenas a página atual no banco
+if 'paginacao_colheitas' not in st.session_state:
+    st.session_state.paginacao_colheitas = {"cursores": [None], "proximo": None, "filtros": None}
+
+
+def reiniciar_paginacao():
+    st.session_state.paginacao_colheitas.update({"cursores": [None], "proximo": None})
+
+
+def pagina_anterior():
+    cursores = st.session_state.paginacao_colheitas["cursores"]
+    if len(cursores) > 1:
+        cursores.pop()
+
+
+def proxima_pagina():
+    paginacao = st.session_state.paginacao_colheitas
+    if paginacao["proximo"] is not None:
+        paginacao["cursores"].append(paginacao["proximo"])
 
 # Tabs
 tab1, tab2, tab3, tab4 = st.tabs(["📋 Novo Registro", "📊 Análise de Perdas", "🏆 Rankings", "💡 Sugestões"])
@@ -235,7 +263,8 @@ with tab1:
 
             # Salvar no banco de dados
             if salvar_registro(novo_registro):
-                st.session_state.registros.insert(0, novo_registro)
+                analisador.invalidar()
+                reiniciar_paginacao()
                 st.success("✅ Colheita registrada com sucesso no banco de dados!")
             else:
                 st.error("❌ Erro ao salvar no banco de dados")
@@ -253,13 +282,48 @@ with tab1:
                 pct_perda = (perda_real / quantidade_colhida * 100) if quantidade_colhida > 0 else 0
                 st.metric("% Perda", f"{pct_perda:.2f}%")
 
+    st.markdown("---")
+
+    # Importação em lote
+    with st.expander("📥 Importar planilha de colheitas (CSV ou Parquet)"):
+        st.caption(
+            "Colunas obrigatórias: talhao, maquina, operador, quantidade_colhida, tipo_colheita, perda_real. "
+            "Opcionais: id, data_colheita, perda_estimada, causa_perda, condicao_solo, condicao_clima, "
+            "severidade_perda. Os cabeçalhos da tabela de detalhamento também são aceitos. "
+            "Sem id, linhas com mesmo talhão, máquina, operador, data, quantidade, tipo e perda real "
+            "são consideradas o mesmo registro."
+        )
+        arquivo = st.file_uploader("Planilha", type=["csv", "parquet"], key="importacao_colheitas")
+
+        if arquivo is not None and st.button("📥 Importar", use_container_width=True):
+            with st.spinner("Importando registros..."):
+                resultado = importar_registros(arquivo)
+
+            if resultado["colunas_faltando"]:
+                st.error(f"❌ Colunas obrigatórias ausentes: {', '.join(resultado['colunas_faltando'])}")
+            else:
+                col1, col2, col3, col4 = st.columns(4)
+                col1.metric("Linhas lidas", resultado["linhas_lidas"])
+                col2.metric("Inseridas", resultado["linhas_inseridas"])
+                col3.metric("Inválidas", resultado["linhas_invalidas"])
+                col4.metric("Linhas/s", f"{resultado['linhas_por_segundo']:,.0f}")
+                if resultado["linhas_duplicadas"]:
+                    st.info(f"ℹ️ {resultado['linhas_duplicadas']} linhas ignoradas (registro já existente no banco)")
+                if resultado["linhas_inseridas"]:
+                    st.success(f"✅ {resultado['linhas_inseridas']} registros importados em {resultado['tempo_s']:.1f}s")
+                    analisador.invalidar()
+                    reiniciar_paginacao()
+
+            if resultado["erros"]:
+                st.markdown("#### ⚠️ Linhas com erro")
+                st.dataframe(pd.DataFrame(resultado["erros"]), use_container_width=True, hide_index=True)
+                if resultado["linhas_invalidas"] > len(resultado["erros"]):
+                    st.caption(f"Exibindo {len(resultado['erros'])} de {resultado['linhas_invalidas']} erros")
+
 # TAB 2: ANÁLISE DE PERDAS
 with tab2:
     st.markdown("## 📊 Análise de Perdas")
 
-    # Criar analisador
-    analisador = AnalisadorPerdas(st.session_state.registros)
-
     # Métricas principais
     col1, col2, col3, col4 = st.columns(4)
 
@@ -267,7 +331,7 @@ with tab2:
         st.markdown(f"""
 <div class="metric-box">
     <h3>📊 Colheitas Registradas</h3>
-    <h2>{len(st.session_state.registros)}</h2>
+    <h2>{analisador.total_registros()}</h2>
 </div>
 """, unsafe_allow_html=True)
 
@@ -300,11 +364,62 @@ with tab2:
 
     # Tabela de registros
     st.markdown("### 📋 Detalhamento de Colheitas")
-    df_registros = pd.DataFrame([r.to_dict() for r in st.session_state.registros])
 
-    # Remover coluna de ID para exibição
-    display_cols = [col for col in df_registros.columns if col != "ID"]
-    st.dataframe(df_registros[display_cols], use_container_width=True, hide_index=True)
+    if usando_exemplos:
+        registros_pagina = analisador.registros
+        legenda_pagina = f"{len(registros_pagina)} registros de exemplo"
+    else:
+        col_f1, col_f2, col_f3, col_f4, col_f5 = st.columns(5)
+        with col_f1:
+            filtro_talhao = st.selectbox("Talhão", ["Todos"] + listar_valores_filtro("talhao"))
+        with col_f2:
+            filtro_maquina = st.selectbox("Máquina", ["Todas"] + listar_valores_filtro("maquina"))
+        with col_f3:
+            filtro_operador = st.selectbox("Operador", ["Todos"] + listar_valores_filtro("operador"))
+        with col_f4:
+            ordem = st.selectbox("Ordem", ["Mais recentes", "Mais antigas"])
+        with col_f5:
+            tamanho_pagina = st.selectbox("Por página", [25, 50, 100], index=1)
+
+        filtros = {
+            "talhao": "" if filtro_talhao == "Todos" else filtro_talhao,
+            "maquina": "" if filtro_maquina == "Todas" else filtro_maquina,
+            "operador": "" if filtro_operador == "Todos" else filtro_operador,
+        }
+        decrescente = ordem == "Mais recentes"
+
+        # Filtro, ordem ou tamanho diferentes voltam para a primeira página
+        paginacao = st.session_state.paginacao_colheitas
+        chave_filtros = (tuple(filtros.values()), decrescente, tamanho_pagina)
+        if paginacao["filtros"] != chave_filtros:
+            paginacao["filtros"] = chave_filtros
+            reiniciar_paginacao()
+
+        registros_pagina, paginacao["proximo"] = carregar_pagina_registros(
+            tamanho_pagina, paginacao["cursores"][-1], filtros, decrescente
+        )
+        numero_pagina = len(paginacao["cursores"])
+        total_filtrado = contar_registros(filtros)
+        total_paginas = max(1, -(-total_filtrado // tamanho_pagina))
+        legenda_pagina = f"Página {numero_pagina} de {total_paginas} • {total_filtrado} registros"
+
+    if registros_pagina:
+        df_registros = pd.DataFrame([r.to_dict() for r in registros_pagina])
+
+        # Remover coluna de ID para exibição
+        display_cols = [col for col in df_registros.columns if col != "ID"]
+        st.dataframe(df_registros[display_cols], use_container_width=True, hide_index=True)
+    else:
+        st.info("Nenhum registro encontrado")
+
+    col_ant, col_legenda, col_prox = st.columns([1, 3, 1])
+    if not usando_exemplos:
+        with col_ant:
+            st.button("⬅️ Anterior", on_click=pagina_anterior, disabled=numero_pagina == 1, use_container_width=True)
+        with col_prox:
+            st.button("Próxima ➡️", on_click=proxima_pagina, disabled=paginacao["proximo"] is None, use_container_width=True)
+    with col_legenda:
+        st.caption(legenda_pagina)
 
     st.markdown("---")
 
@@ -340,8 +455,6 @@ with tab2:
 with tab3:
     st.markdown("## 🏆 Rankings")
 
-    analisador = AnalisadorPerdas(st.session_state.registros)
-
     col1, col2, col3 = st.columns(3)
 
     with col1:
@@ -372,7 +485,6 @@ with tab3:
 with tab4:
     st.markdown("## 💡 Sugestões de Melhoria")
 
-    analisador = AnalisadorPerdas(st.session_state.registros)
     sugestoes = analisador.sugestoes_melhorias()
 
     if sugestoes:
@@ -21,6 +21,8 @@ from servicos.fase3_iot import (
     gerar_dados_exemplo_sensores,
     gerar_alertas_sensores,
     calcular_historico_resumido,
+    JANELAS_RESUMO,
+    serie_sensor,
     carregar_sensores_do_banco,
     simular_e_salvar_leituras,
     carregar_alertas,
@@ -28,7 +30,7 @@ from servicos.fase3_iot import (
     adicionar_contato,
     remover_contato,
     listar_contatos_ativos,
-    contar_contatos_ativos
+    versoes_dados
 )
 from servicos.database import init_fase3_db
 
@@ -123,8 +125,10 @@ with st.expander("ℹ️ Sobre o Sistema IoT"):
 
 st.markdown("---")
 
-# Inicializar banco de dados
-init_fase3_db()
+# Inicializar banco de dados (uma vez por sessão)
+if 'fase3_db_inicializado' not in st.session_state:
+    init_fase3_db()
+    st.session_state.fase3_db_inicializado = True
 
 # Header com botão de atualização
 col_header1, col_header2 = st.columns([4, 1])
@@ -136,19 +140,41 @@ with col_header2:
     if st.button("🔄 Atualizar", use_container_width=True):
         st.rerun()
 
+# Versões das tabelas: cada seção só recarrega quando sua tabela mudou
+versoes = versoes_dados()
+cache_secoes = st.session_state.setdefault('cache_secoes', {})
+
+
+def dados_secao(chave: str, tabela: str, carregar):
+    """Retorna os dados da seção do cache da sessão, recarregando se a tabela mudou"""
+    versao = versoes.get(tabela)
+    if versao is None or chave not in cache_secoes or cache_secoes[chave][0] != versao:
+        cache_secoes[chave] = (versao, carregar())
+    return cache_secoes[chave][1]
+
+
+# Reexecução disparada por novos dados do simulador não gera leituras próprias
+atualizacao_automatica = st.session_state.pop('atualizacao_automatica', False)
+
 # Carregar dados do banco de dados
-sensores = carregar_sensores_do_banco()
+sensores = dados_secao("sensores", "leituras_sensores", carregar_sensores_do_banco)
 
 # Se não houver dados, usar exemplos
-if not sensores["DHT22_01"].leituras:
+sensores_exemplo = not sensores["DHT22_01"].leituras
+if sensores_exemplo:
     sensores = gerar_dados_exemplo_sensores()
-else:
+elif not atualizacao_automatica:
     # Gerar e salvar novas leituras simuladas a cada atualização
     sensores = simular_e_salvar_leituras()
+    versoes = versoes_dados()
+    cache_secoes["sensores"] = (versoes.get("leituras_sensores"), sensores)
+
+alertas_recentes = dados_secao("alertas", "alertas", lambda: carregar_alertas(limite=10))
+contatos_ativos = dados_secao("contatos", "contatos_notificacao", listar_contatos_ativos)
 
 # Verificar alertas críticos e mostrar banner
-alertas_criticos = [a for a in carregar_alertas(limite=5) if a['severidade'] == 'crítico']
-total_contatos_banner = contar_contatos_ativos()
+alertas_criticos = [a for a in alertas_recentes[:5] if a['severidade'] == 'crítico']
+total_contatos_banner = len(contatos_ativos)
 
 if alertas_criticos:
     if total_contatos_banner > 0:
@@ -263,8 +289,7 @@ with tab1:
 
     with col1:
         # Gráfico de Umidade
-        leituras_umidade = [l.valor for l in sensores["DHT22_01"].leituras]
-        timestamps = [l.timestamp.split()[-1] for l in sensores["DHT22_01"].leituras]
+        leituras_umidade = sensores["DHT22_01"].leituras.valores()
 
         fig_umidade = go.Figure()
         fig_umidade.add_trace(go.Scatter(
@@ -287,7 +312,7 @@ with tab1:
 
     with col2:
         # Gráfico de pH
-        leituras_ph = [l.valor for l in sensores["LDR_01"].leituras]
+        leituras_ph = sensores["LDR_01"].leituras.valores()
 
         fig_ph = go.Figure()
         fig_ph.add_trace(go.Scatter(
@@ -312,11 +337,11 @@ with tab1:
 with tab2:
     st.markdown("## 🚨 Alertas do Sistema")
 
-    # Carregar alertas do banco de dados
-    alertas = carregar_alertas(limite=10)
+    # Alertas e contatos já carregados (recarregados só quando mudam)
+    alertas = alertas_recentes
 
     # Verificar se há contatos cadastrados
-    contatos = listar_contatos_ativos()
+    contatos = contatos_ativos
     total_contatos = len(contatos)
 
     if alertas:
@@ -383,7 +408,9 @@ with tab3:
     st.markdown("## 💧 Sistema de Irrigação Automática")
 
     # Carregar histórico do banco
-    historico_irrigacao = carregar_historico_irrigacao(limite=20)
+    historico_irrigacao = dados_secao(
+        "irrigacao", "historico_irrigacao", lambda: carregar_historico_irrigacao(limite=20)
+    )
 
     # Verificar condições atuais
     umidade_atual = sensores["DHT22_01"].ultima_leitura()
@@ -489,15 +516,70 @@ with tab3:
 
 # TAB 4: HISTÓRICO
 with tab4:
-    st.markdown("## 📈 Resumo do Histórico (24h)")
-
-    df_resumo = calcular_historico_resumido(sensores, horas=24)
+    st.markdown("## 📈 Resumo do Histórico")
+
+    janela_resumo = st.radio(
+        "Janela:",
+        list(JANELAS_RESUMO),
+        index=1,
+        horizontal=True,
+        key="janela_resumo"
+    )
+
+    # Resumo e séries por janela só voltam a consultar o banco quando há novas
+    # leituras; os sensores de exemplo mudam a cada execução e não são guardados
+    def carregar_resumo():
+        return calcular_historico_resumido(sensores, horas=JANELAS_RESUMO[janela_resumo] // 3600)
+
+    if sensores_exemplo:
+        df_resumo = carregar_resumo()
+    else:
+        df_resumo = dados_secao(f"resumo:{janela_resumo}", "leituras_sensores", carregar_resumo)
 
     if not df_resumo.empty:
         st.dataframe(df_resumo, use_container_width=True, hide_index=True)
 
         st.markdown("---")
 
+        # Séries históricas (resolução escolhida conforme a janela e o limite de pontos)
+        nomes_resolucao = {0: "leituras brutas", 60: "1 minuto", 3600: "1 hora", 86400: "1 dia"}
+        col1, col2 = st.columns(2)
+
+        for coluna, sensor_id, titulo, cor in [
+            (col1, "DHT22_01", "💧 Umidade", "#2196F3"),
+            (col2, "LDR_01", "🧪 pH", "#4CAF50"),
+        ]:
+            df_serie = dados_secao(
+                f"serie:{sensor_id}:{janela_resumo}", "leituras_sensores",
+                lambda: serie_sensor(sensor_id, JANELAS_RESUMO[janela_resumo], max_pontos=300)
+            )
+            if df_serie.empty:
+                continue
+
+            fig_serie = go.Figure()
+            fig_serie.add_trace(go.Scatter(
+                x=df_serie["timestamp"], y=df_serie["maximo"],
+                mode='lines', line=dict(width=0), showlegend=False, hoverinfo='skip'
+            ))
+            fig_serie.add_trace(go.Scatter(
+                x=df_serie["timestamp"], y=df_serie["minimo"],
+                mode='lines', line=dict(width=0), fill='tonexty',
+                fillcolor='rgba(150, 150, 150, 0.25)', name='Mín/Máx'
+            ))
+            fig_serie.add_trace(go.Scatter(
+                x=df_serie["timestamp"], y=df_serie["media"],
+                mode='lines', name='Média', line=dict(color=cor)
+            ))
+            fig_serie.update_layout(
+                title=f"{titulo} ({janela_resumo}, {nomes_resolucao[df_serie.attrs['resolucao']]})",
+                xaxis_title="Horário",
+                hovermode='x unified'
+            )
+            with coluna:
+                st.plotly_chart(fig_serie, use_container_width=True)
+
+        st.markdown("---")
+
         # Distribuição de status
         status_counts = df_resumo["Status"].value_counts()
 
@@ -564,7 +646,7 @@ with tab5:
 
     with col2:
         # Estatísticas
-        total_contatos = contar_contatos_ativos()
+        total_contatos = len(contatos_ativos)
 
         st.markdown(f"""
         <div style="background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); padding: 20px; border-radius: 10px; color: white; text-align: center;">
@@ -586,7 +668,7 @@ with tab5:
     # Lista de contatos
     st.markdown("### 📋 Contatos Cadastrados")
 
-    contatos = listar_contatos_ativos()
+    contatos = contatos_ativos
 
     if contatos:
         # Criar DataFrame para exibição
@@ -626,12 +708,22 @@ st.markdown("""
 </div>
 """, unsafe_allow_html=True)
 
-# Auto-refresh no final (só se não estiver em um formulário)
-if 'last_refresh' not in st.session_state:
-    st.session_state.last_refresh = time.time()
+# Auto-refresh: verifica as versões dos dados a cada 5 segundos e só
+# reexecuta a página quando o simulador gravou algo novo
+versoes_renderizadas = dict(versoes)
+fragmento = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None)
 
-tempo_decorrido = time.time() - st.session_state.last_refresh
-if tempo_decorrido >= 5:
-    st.session_state.last_refresh = time.time()
-    time.sleep(0.1)
+if fragmento is not None:
+    @fragmento(run_every=5)
+    def verificar_novos_dados():
+        if versoes_dados() != versoes_renderizadas:
+            st.session_state.atualizacao_automatica = True
+            st.rerun()
+
+    verificar_novos_dados()
+else:
+    # Versões antigas do Streamlit (sem fragmentos): aguarda 5 segundos e
+    # reexecuta a página; as seções sem dados novos vêm do cache da sessão
+    time.sleep(5)
+    st.session_state.atualizacao_automatica = True
     st.rerun()
@@ -20,14 +20,20 @@ except ImportError:
 # Adicionar diretório pai ao path
 sys.path.append(str(Path(__file__).parent.parent))
 
-from servicos.database import DatabaseManager, DB_FASE6
 from servicos.fase6_yolo import (
     DetectorYOLO,
     GeradorImagensTeste,
     RelatorioVisao,
-    gerar_dados_exemplo_yolo
+    decodificar_imagem,
+    gerar_dados_exemplo_yolo,
+    gerar_tiles,
+    hash_conteudo,
+    obter_cache_imagens,
+    salvar_deteccao
 )
 
+from servicos.fase6_servico import ClienteInferencia
+
 # Configuração da página
 st.set_page_config(
     page_title="Fase 6 - Vision Computacional YOLO",
@@ -140,47 +146,6 @@ if 'dados_yolo' not in st.session_state:
     st.session_state.imagens_analisadas = []
 
 
-# Função para salvar detecção no banco de dados
-def salvar_deteccao_db(resultado):
-    """Salva detecção no banco de dados"""
-    try:
-        db = DatabaseManager(DB_FASE6)
-
-        # Inserir detecção principal
-        cursor = db.execute("""
-            INSERT INTO deteccoes (timestamp, total_objetos, confianca_media, modo_deteccao)
-            VALUES (?, ?, ?, ?)
-        """, (resultado['timestamp'], resultado['total_objetos'], resultado['confianca_media'], resultado.get('modo', 'Desconhecido')))
-
-        deteccao_id = cursor.lastrowid
-
-        # Inserir objetos detectados
-        for det in resultado['deteccoes']:
-            db.execute("""
-                INSERT INTO objetos_detectados
-                (deteccao_id, classe, classe_original, classe_id, confianca,
-                 bbox_x, bbox_y, bbox_width, bbox_height, area_pixels)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                deteccao_id,
-                det['classe'],
-                det.get('classe_original', det['classe']),
-                det.get('classe_id', 0),
-                det['confianca'],
-                det['bbox'].get('x', 0),
-                det['bbox'].get('y', 0),
-                det['bbox'].get('width', 0),
-                det['bbox'].get('height', 0),
-                det.get('area_pixels', 0)
-            ))
-
-        db.close()
-        return True
-    except Exception as e:
-        print(f"Erro ao salvar no banco: {e}")
-        return False
-
-
 # Tabs
 tab1, tab2, tab3, tab4 = st.tabs(["📷 Análise de Imagem", "📊 Histórico", "🎯 Detecções", "📈 Estatísticas"])
 
@@ -200,17 +165,19 @@ with tab1:
         )
 
         if arquivo_upload:
-            imagem_pil = Image.open(arquivo_upload)
+            # Imagem decodificada uma única vez por conteúdo (cache LRU compartilhado)
+            dados_upload = arquivo_upload.getvalue()
+            chave_imagem = hash_conteudo(dados_upload)
+            imagem_numpy = obter_cache_imagens().imagem(
+                chave_imagem, lambda: decodificar_imagem(dados_upload)
+            )
 
-            # Converter para numpy array
-            if cv2 is not None:
-                imagem_numpy = cv2.cvtColor(np.array(imagem_pil), cv2.COLOR_RGB2BGR)
+            st.image(dados_upload, caption="Imagem Enviada", use_container_width=True)
+            if imagem_numpy is not None:
+                st.session_state.imagem_temp = imagem_numpy
+                st.session_state.imagem_chave = chave_imagem
             else:
-                # Fallback sem cv2 - usa array RGB direto
-                imagem_numpy = np.array(imagem_pil)
-
-            st.image(imagem_pil, caption="Imagem Enviada", use_container_width=True)
-            st.session_state.imagem_temp = imagem_numpy
+                st.error("Não foi possível decodificar a imagem enviada")
 
     with col2:
         st.markdown("### Parâmetros de Detecção")
@@ -224,6 +191,25 @@ with tab1:
             help="Objetos com confiança menor serão ignorados"
         )
 
+        modo_mosaico = st.checkbox(
+            "🧩 Modo mosaico (imagens grandes)",
+            value=False,
+            help="Divide imagens de drone/ortofotos em tiles sobrepostos e junta as detecções"
+        )
+        if modo_mosaico:
+            tamanho_tile = st.select_slider(
+                "Tamanho do tile (px):",
+                options=[320, 480, 640, 960, 1280],
+                value=640
+            )
+            sobreposicao_tiles = st.slider(
+                "Sobreposição entre tiles:",
+                min_value=0.0,
+                max_value=0.5,
+                value=0.2,
+                step=0.05
+            )
+
         st.markdown("---")
 
         st.markdown("### ✨ Modelos Disponíveis")
@@ -239,84 +225,124 @@ with tab1:
             detector = st.session_state.dados_yolo["detector"]
             imagem = st.session_state.imagem_temp
 
-            # Detectar objetos
-            resultado = detector.detectar_objetos(imagem, confianca_minima)
+            # Detectar objetos: o modelo roda no limiar piso (no serviço de
+            # inferência compartilhado, se disponível) e as boxes brutas vêm
+            # do cache quando a mesma imagem já foi analisada
+            mosaico = None
+            variante = f"{detector.chave_modelo}:inteira"
+            if modo_mosaico:
+                mosaico = {"tamanho_tile": tamanho_tile, "sobreposicao": sobreposicao_tiles}
+                variante = f"{detector.chave_modelo}:mosaico:{tamanho_tile}:{sobreposicao_tiles}"
+
+            try:
+                boxes = obter_cache_imagens().boxes(
+                    st.session_state.imagem_chave,
+                    variante,
+                    detector.limiar_inferencia(confianca_minima),
+                    lambda conf: ClienteInferencia(detector).inferir_boxes(imagem, conf, mosaico)
+                )
+            except Exception as e:
+                # Falha do modelo não vira "nenhum objeto": nada vai para o cache
+                st.error(f"❌ Erro na detecção: {e}")
+                boxes = None
+
+            if boxes is not None:
+                resultado = detector.detectar_de_boxes(boxes, confianca_minima)
+                tiles = len(gerar_tiles(imagem.shape[0], imagem.shape[1], tamanho_tile, sobreposicao_tiles)) if mosaico else None
+
+                # Salvar no banco de dados (análise e objetos em uma transação)
+                if salvar_deteccao(resultado):
+                    st.success("💾 Detecção salva no banco de dados!")
+
+                # Armazenar análise
+                st.session_state.imagens_analisadas.append({
+                    "timestamp": resultado['timestamp'],
+                    "total_objetos": resultado['total_objetos'],
+                    "confianca_media": resultado['confianca_media'],
+                    "saude": detector.analisar_saude_plantacao(resultado['deteccoes'])
+                })
+
+                # Boxes brutas da última análise: o slider de confiança só refiltra
+                st.session_state.ultima_analise = {"boxes": boxes, "tiles": tiles}
+        else:
+            st.error("❌ Por favor, primeiro gere ou envie uma imagem")
 
-            # Analisar saúde
-            saude = detector.analisar_saude_plantacao(resultado['deteccoes'])
+    if 'ultima_analise' in st.session_state:
+        detector = st.session_state.dados_yolo["detector"]
+        ultima_analise = st.session_state.ultima_analise
 
-            # Armazenar análise
-            st.session_state.imagens_analisadas.append({
-                "timestamp": resultado['timestamp'],
-                "total_objetos": resultado['total_objetos'],
-                "confianca_media": resultado['confianca_media'],
-                "saude": saude
-            })
+        # Resultado no limiar atual do slider, sem executar o modelo de novo
+        resultado = detector.refiltrar(confianca_minima, ultima_analise["boxes"])
+        if ultima_analise["tiles"]:
+            resultado["tiles"] = ultima_analise["tiles"]
 
-            # Exibir resultados
-            st.markdown("### 📊 Resultados da Detecção")
+        # Analisar saúde
+        saude = detector.analisar_saude_plantacao(resultado['deteccoes'])
 
-            # Mostrar modo de detecção
-            modo = resultado.get('modo', 'Desconhecido')
-            if modo == "YOLO Real":
-                st.success(f"✅ **Modo:** {modo} - Usando modelo treinado (100 épocas (labels corrigidas))")
-            else:
-                st.warning(f"⚠️ **Modo:** {modo} - Modelo não carregado, usando simulação")
+        # Exibir resultados
+        st.markdown("### 📊 Resultados da Detecção")
 
-            col1, col2, col3, col4 = st.columns(4)
+        # Mostrar modo de detecção
+        modo = resultado.get('modo', 'Desconhecido')
+        if modo == "YOLO Real":
+            st.success(f"✅ **Modo:** {modo} - Usando modelo treinado (100 épocas (labels corrigidas)) | Backend: {detector.backend}")
+        else:
+            st.warning(f"⚠️ **Modo:** {modo} - Modelo não carregado, usando simulação")
+        if "tiles" in resultado:
+            st.caption(f"🧩 Imagem analisada em {resultado['tiles']} tiles")
 
-            with col1:
-                st.metric(
-                    "Objetos Detectados",
-                    resultado['total_objetos']
-                )
+        col1, col2, col3, col4 = st.columns(4)
 
-            with col2:
-                st.metric(
-                    "Confiança Média",
-                    f"{resultado['confianca_media']:.1%}"
-                )
+        with col1:
+            st.metric(
+                "Objetos Detectados",
+                resultado['total_objetos']
+            )
 
-            with col3:
-                st.metric(
-                    "Score de Confiança",
-                    f"{saude['score_saude']:.1f}/100"
-                )
+        with col2:
+            st.metric(
+                "Confiança Média",
+                f"{resultado['confianca_media']:.1%}"
+            )
 
-            with col4:
-                cor_status = "🟢" if saude['score_saude'] >= 80 else "🟡" if saude['score_saude'] >= 50 else "🔴"
-                st.metric(
-                    "Status",
-                    cor_status,
-                    saude['status']
-                )
+        with col3:
+            st.metric(
+                "Score de Confiança",
+                f"{saude['score_saude']:.1f}/100"
+            )
 
-            st.markdown("---")
+        with col4:
+            cor_status = "🟢" if saude['score_saude'] >= 80 else "🟡" if saude['score_saude'] >= 50 else "🔴"
+            st.metric(
+                "Status",
+                cor_status,
+                saude['status']
+            )
 
-            # Detecções detalhadas
-            if resultado['deteccoes']:
-                st.markdown("### 🎯 Detecções Encontradas")
+        st.markdown("---")
 
-                for i, det in enumerate(resultado['deteccoes'], 1):
-                    col1, col2, col3 = st.columns([2, 1, 1])
+        # Detecções detalhadas
+        if resultado['deteccoes']:
+            st.markdown("### 🎯 Detecções Encontradas")
 
-                    with col1:
-                        st.write(f"**{i}. {det['classe']}**")
+            for i, det in enumerate(resultado['deteccoes'], 1):
+                col1, col2, col3 = st.columns([2, 1, 1])
 
-                    with col2:
-                        st.write(f"Confiança: {det['confianca']:.1%}")
+                with col1:
+                    st.write(f"**{i}. {det['classe']}**")
 
-                    with col3:
-                        st.write(f"Área: {det['bbox']['width']}×{det['bbox']['height']}")
+                with col2:
+                    st.write(f"Confiança: {det['confianca']:.1%}")
 
-            st.markdown("---")
+                with col3:
+                    st.write(f"Área: {det['bbox']['width']}×{det['bbox']['height']}")
 
-            # Recomendações
-            st.markdown("### 💡 Recomendações")
-            for rec in saude['recomendacoes']:
-                st.write(rec)
-        else:
-            st.error("❌ Por favor, primeiro gere ou envie uma imagem")
+        st.markdown("---")
+
+        # Recomendações
+        st.markdown("### 💡 Recomendações")
+        for rec in saude['recomendacoes']:
+            st.write(rec)
 
 # TAB 2: HISTÓRICO
 with tab2:
@@ -326,23 +352,25 @@ with tab2:
     historico = detector.obter_historico()
 
     if historico:
+        # Métricas vêm dos agregados do histórico (cobrem também análises antigas)
+        stats_historico = detector.obter_estatisticas()
         col1, col2, col3 = st.columns(3)
 
         with col1:
             st.metric(
                 "Total de Análises",
-                len(historico)
+                stats_historico['total_analises']
             )
 
         with col2:
-            media_objetos = np.mean([h['total_objetos'] for h in historico])
+            media_objetos = stats_historico['media_objetos_por_imagem']
             st.metric(
                 "Média de Objetos",
                 f"{media_objetos:.1f}"
             )
 
         with col3:
-            media_confianca = np.mean([h['confianca_media'] for h in historico])
+            media_confianca = stats_historico['confianca_media_geral']
             st.metric(
                 "Confiança Média",
                 f"{media_confianca:.1%}"
@@ -412,12 +440,8 @@ with tab3:
     historico = detector.obter_historico()
 
     if historico:
-        # Contar todas as detecções
-        todas_deteccoes = []
-        for h in historico:
-            todas_deteccoes.extend(h['deteccoes'])
-
-        saude_geral = detector.analisar_saude_plantacao(todas_deteccoes)
+        # Contagens de todas as detecções (agregados do histórico)
+        saude_geral = detector.analisar_saude_historico()
 
         # Exibir score de confiança
         col1, col2 = st.columns([2, 1])
@@ -523,12 +547,7 @@ with tab4:
         # Classes mais detectadas
         st.markdown("### 🏆 Classes Mais Detectadas")
 
-        historico = detector.obter_historico()
-        classes_count = {}
-        for h in historico:
-            for det in h['deteccoes']:
-                classe = det['classe']
-                classes_count[classe] = classes_count.get(classe, 0) + 1
+        classes_count = detector.historico_deteccoes.contagem_classes
 
         if classes_count:
             df_classes = pd.DataFrame([
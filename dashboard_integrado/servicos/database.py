@@ -4,8 +4,10 @@ FarmTech Solutions - Dashboard Integrado
 """
 
 import sqlite3
+import threading
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Optional
+from typing import Dict, Iterator, List, Optional
 import os
 
 # Diretório para armazenar os bancos de dados
@@ -18,33 +20,280 @@ DB_FASE2 = DB_DIR / "fase2_canatrack.db"
 DB_FASE3 = DB_DIR / "fase3_iot.db"
 DB_FASE6 = DB_DIR / "fase6_yolo.db"
 
+# Resoluções (em segundos) dos agregados incrementais de leituras da Fase 3:
+# 1 minuto, 1 hora e 1 dia
+RESOLUCOES_AGREGADOS = (60, 3600, 86400)
+
+# Tabelas da Fase 3 cujas alterações incrementam a versão em versoes_dados
+TABELAS_VERSIONADAS_FASE3 = (
+    "leituras_sensores",
+    "alertas",
+    "historico_irrigacao",
+    "contatos_notificacao",
+)
+
+
+class PoolConexoes:
+    """
+    Pool de conexões SQLite para um único arquivo de banco de dados
+
+    Mantém conexões ociosas separadas para escrita e para leitura (abertas
+    em modo somente leitura), reaproveita a conexão já em uso pela thread
+    atual em chamadas aninhadas e aplica os PRAGMAs de desempenho (WAL,
+    synchronous=NORMAL, cache em memória) uma única vez por conexão.
+    """
+
+    PRAGMAS = (
+        "PRAGMA busy_timeout = 5000",
+        "PRAGMA synchronous = NORMAL",
+        "PRAGMA temp_store = MEMORY",
+        "PRAGMA cache_size = -8000",
+        "PRAGMA mmap_size = 67108864",
+    )
+
+    def __init__(self, db_path: Path, max_ociosas: int = 4):
+        self.db_path = Path(db_path)
+        self.max_ociosas = max_ociosas
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._ociosas: Dict[bool, List[sqlite3.Connection]] = {False: [], True: []}
+        self._wal_configurado = False
+        self._stats = {
+            "conexoes_criadas": 0,
+            "conexoes_reutilizadas": 0,
+            "conexoes_descartadas": 0,
+            "aquisicoes_leitura": 0,
+            "aquisicoes_escrita": 0,
+            "em_uso": 0,
+        }
+
+    def _criar_conexao(self, somente_leitura: bool) -> sqlite3.Connection:
+        """Abre uma nova conexão já configurada"""
+        if somente_leitura and self.db_path.exists():
+            conn = sqlite3.connect(
+                f"file:{self.db_path}?mode=ro",
+                uri=True,
+                check_same_thread=False
+            )
+            conn.execute("PRAGMA query_only = ON")
+        else:
+            conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+            if not self._wal_configurado:
+                conn.execute("PRAGMA journal_mode = WAL")
+                self._wal_configurado = True
+            if somente_leitura:
+                conn.execute("PRAGMA query_only = ON")
+
+        conn.row_factory = sqlite3.Row
+        for pragma in self.PRAGMAS:
+            conn.execute(pragma)
+
+        self._stats["conexoes_criadas"] += 1
+        return conn
+
+    def _em_uso_na_thread(self) -> Dict[bool, List]:
+        """Conexões em uso pela thread atual: {somente_leitura: [conexão, usos, transações]}"""
+        if not hasattr(self._local, "em_uso"):
+            self._local.em_uso = {}
+        return self._local.em_uso
+
+    def adquirir(self, somente_leitura: bool = False) -> sqlite3.Connection:
+        """Obtém uma conexão do pool (reutiliza a da thread atual se houver)"""
+        em_uso = self._em_uso_na_thread()
+        if somente_leitura in em_uso:
+            em_uso[somente_leitura][1] += 1
+            return em_uso[somente_leitura][0]
+
+        with self._lock:
+            chave = "aquisicoes_leitura" if somente_leitura else "aquisicoes_escrita"
+            self._stats[chave] += 1
+            self._stats["em_uso"] += 1
+            if self._ociosas[somente_leitura]:
+                conn = self._ociosas[somente_leitura].pop()
+                self._stats["conexoes_reutilizadas"] += 1
+            else:
+                conn = self._criar_conexao(somente_leitura)
+
+        em_uso[somente_leitura] = [conn, 1, 0]
+        return conn
+
+    def devolver(self, conn: sqlite3.Connection, somente_leitura: bool = False):
+        """Devolve uma conexão ao pool"""
+        em_uso = self._em_uso_na_thread()
+        registro = em_uso.get(somente_leitura)
+        if registro is not None and registro[0] is conn:
+            registro[1] -= 1
+            if registro[1] > 0:
+                return
+            del em_uso[somente_leitura]
+
+        if conn.in_transaction:
+            conn.rollback()
+
+        with self._lock:
+            self._stats["em_uso"] -= 1
+            if len(self._ociosas[somente_leitura]) < self.max_ociosas:
+                self._ociosas[somente_leitura].append(conn)
+                return
+            self._stats["conexoes_descartadas"] += 1
+        conn.close()
+
+    @contextmanager
+    def leitura(self) -> Iterator[sqlite3.Connection]:
+        """Context manager com uma conexão somente leitura"""
+        conn = self.adquirir(somente_leitura=True)
+        try:
+            yield conn
+        finally:
+            self.devolver(conn, somente_leitura=True)
+
+    def em_transacao(self) -> bool:
+        """Indica se a thread atual tem uma transação (transacao) aberta neste banco"""
+        registro = self._em_uso_na_thread().get(False)
+        return registro is not None and registro[2] > 0
+
+    @contextmanager
+    def transacao(self) -> Iterator[sqlite3.Connection]:
+        """
+        Context manager de escrita: commit ao final, rollback em caso de erro
+
+        Transações aninhadas na mesma thread fazem parte da mais externa, que
+        é a única a confirmar ou desfazer. O BEGIN é explícito para que
+        comandos DDL (CREATE, ALTER) também fiquem dentro da transação.
+        """
+        conn = self.adquirir()
+        registro = self._em_uso_na_thread()[False]
+        registro[2] += 1
+        externa = registro[2] == 1
+        try:
+            if externa and not conn.in_transaction:
+                conn.execute("BEGIN")
+            yield conn
+            if externa:
+                conn.commit()
+        except Exception:
+            if externa:
+                conn.rollback()
+            raise
+        finally:
+            registro[2] -= 1
+            self.devolver(conn)
+
+    def estatisticas(self) -> Dict:
+        """Retorna métricas de uso do pool"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["ociosas_leitura"] = len(self._ociosas[True])
+            stats["ociosas_escrita"] = len(self._ociosas[False])
+        stats["banco"] = self.db_path.name
+        return stats
+
+    def fechar(self):
+        """Fecha todas as conexões ociosas"""
+        with self._lock:
+            for conexoes in self._ociosas.values():
+                for conn in conexoes:
+                    conn.close()
+                conexoes.clear()
+
+
+_POOLS: Dict[str, PoolConexoes] = {}
+_POOLS_LOCK = threading.Lock()
+
+
+def obter_pool(db_path: Path) -> PoolConexoes:
+    """Retorna o pool compartilhado (por processo) do banco informado"""
+    chave = str(Path(db_path).resolve())
+    with _POOLS_LOCK:
+        pool = _POOLS.get(chave)
+        if pool is None:
+            pool = PoolConexoes(db_path)
+            _POOLS[chave] = pool
+        return pool
+
+
+def estatisticas_pools() -> Dict[str, Dict]:
+    """Retorna as métricas de todos os pools abertos"""
+    with _POOLS_LOCK:
+        pools = list(_POOLS.values())
+    return {pool.db_path.name: pool.estatisticas() for pool in pools}
+
+
+def fechar_pools():
+    """Fecha as conexões ociosas de todos os pools"""
+    with _POOLS_LOCK:
+        pools = list(_POOLS.values())
+    for pool in pools:
+        pool.fechar()
+
+
+def conexao_leitura(db_path: Path):
+    """Atalho para obter_pool(db_path).leitura()"""
+    return obter_pool(db_path).leitura()
+
+
+def transacao(db_path: Path):
+    """Atalho para obter_pool(db_path).transacao()"""
+    return obter_pool(db_path).transacao()
+
+
+def em_transacao(db_path: Path) -> bool:
+    """Indica se a thread atual está dentro de transacao(db_path)"""
+    return obter_pool(db_path).em_transacao()
+
+
+def _conexao_consulta(db_path: Path):
+    """Conexão somente leitura ou, dentro de uma transação, a da própria transação (que vê suas escritas)"""
+    pool = obter_pool(db_path)
+    return pool.transacao() if pool.em_transacao() else pool.leitura()
+
+
+def executar(db_path: Path, query: str, params: tuple = ()) -> sqlite3.Cursor:
+    """Executa um comando de escrita em sua própria transação (ou na transação aberta pela thread)"""
+    with transacao(db_path) as conn:
+        return conn.execute(query, params)
+
+
+def consultar(db_path: Path, query: str, params: tuple = ()) -> List[sqlite3.Row]:
+    """Executa uma consulta em conexão somente leitura e retorna todas as linhas"""
+    with _conexao_consulta(db_path) as conn:
+        return conn.execute(query, params).fetchall()
+
+
+def consultar_um(db_path: Path, query: str, params: tuple = ()) -> Optional[sqlite3.Row]:
+    """Executa uma consulta em conexão somente leitura e retorna uma linha"""
+    with _conexao_consulta(db_path) as conn:
+        return conn.execute(query, params).fetchone()
+
 
 class DatabaseManager:
-    """Gerenciador de conexões com banco de dados SQLite"""
+    """Gerenciador de conexões com banco de dados SQLite (usa o pool compartilhado)"""
 
-    def __init__(self, db_path: Path):
+    def __init__(self, db_path: Path, somente_leitura: bool = False):
         self.db_path = db_path
+        self.somente_leitura = somente_leitura
+        self.pool = obter_pool(db_path)
         self.connection: Optional[sqlite3.Connection] = None
 
     def connect(self) -> sqlite3.Connection:
-        """Conecta ao banco de dados"""
+        """Obtém uma conexão do pool"""
         if self.connection is None:
-            self.connection = sqlite3.connect(str(self.db_path), check_same_thread=False)
-            self.connection.row_factory = sqlite3.Row
+            self.connection = self.pool.adquirir(self.somente_leitura)
         return self.connection
 
     def close(self):
-        """Fecha a conexão"""
+        """Devolve a conexão ao pool"""
         if self.connection:
-            self.connection.close()
+            self.pool.devolver(self.connection, self.somente_leitura)
             self.connection = None
 
     def execute(self, query: str, params: tuple = ()):
-        """Executa uma query"""
+        """Executa uma query (dentro de uma transacao aberta, o commit fica para ela)"""
         conn = self.connect()
         cursor = conn.cursor()
         cursor.execute(query, params)
-        conn.commit()
+        if not self.somente_leitura and not self.pool.em_transacao():
+            conn.commit()
         return cursor
 
     def fetchall(self, query: str, params: tuple = ()):
@@ -102,6 +351,22 @@ def init_fase2_db():
         )
     """)
 
+    # Índices de cobertura dos rankings (AnalisadorPerdasSQL): o GROUP BY
+    # percorre só o índice, já ordenado pela chave, sem ler a tabela
+    for coluna in ("operador", "maquina", "talhao"):
+        db.execute(f"""
+            CREATE INDEX IF NOT EXISTS idx_colheita_{coluna}
+            ON registros_colheita ({coluna}, perda_real)
+        """)
+    db.execute("CREATE INDEX IF NOT EXISTS idx_colheita_causa ON registros_colheita (causa_perda)")
+    db.execute("CREATE INDEX IF NOT EXISTS idx_colheita_severidade ON registros_colheita (severidade_perda)")
+
+    # Paginação por chave da tabela de registros (carregar_pagina_registros)
+    db.execute("""
+        CREATE INDEX IF NOT EXISTS idx_colheita_data_id
+        ON registros_colheita (data_colheita, id)
+    """)
+
     db.close()
     return db
 
@@ -120,10 +385,101 @@ def init_fase3_db():
             unidade TEXT NOT NULL,
             timestamp TEXT NOT NULL,
             status TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            ts_epoch INTEGER
         )
     """)
 
+    # Migrações (coluna ts_epoch, triggers de agregados e suas cargas) em uma
+    # única transação: uma falha no meio não deixa o banco meio migrado
+    with transacao(DB_FASE3):
+        # Bancos criados antes da coluna ts_epoch: adiciona e preenche uma única vez.
+        # ts_epoch guarda o timestamp da leitura em segundos (ordenável e indexável)
+        colunas = {row['name'] for row in db.fetchall("PRAGMA table_info(leituras_sensores)")}
+        if "ts_epoch" not in colunas:
+            db.execute("ALTER TABLE leituras_sensores ADD COLUMN ts_epoch INTEGER")
+            db.execute("""
+                UPDATE leituras_sensores
+                SET ts_epoch = CAST(strftime('%s', timestamp) AS INTEGER)
+                WHERE ts_epoch IS NULL
+            """)
+
+        db.execute("""
+            CREATE INDEX IF NOT EXISTS idx_leituras_sensor_ts
+            ON leituras_sensores (sensor_id, ts_epoch)
+        """)
+        db.execute("""
+            CREATE INDEX IF NOT EXISTS idx_leituras_ts
+            ON leituras_sensores (ts_epoch)
+        """)
+
+        # Agregados incrementais por sensor e intervalo (contagem/soma/mín/máx/último),
+        # mantidos por trigger a cada leitura inserida
+        db.execute("""
+            CREATE TABLE IF NOT EXISTS agregados_sensores (
+                sensor_id TEXT NOT NULL,
+                resolucao INTEGER NOT NULL,
+                bucket INTEGER NOT NULL,
+                contagem INTEGER NOT NULL,
+                soma REAL NOT NULL,
+                minimo REAL NOT NULL,
+                maximo REAL NOT NULL,
+                ultimo REAL NOT NULL,
+                ultimo_epoch INTEGER NOT NULL,
+                PRIMARY KEY (sensor_id, resolucao, bucket)
+            ) WITHOUT ROWID
+        """)
+        db.execute("CREATE INDEX IF NOT EXISTS idx_agregados_bucket ON agregados_sensores (bucket)")
+
+        for resolucao in RESOLUCOES_AGREGADOS:
+            trigger_existia = db.fetchone(
+                "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = ?",
+                (f"trg_agregados_{resolucao}",)
+            ) is not None
+
+            db.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS trg_agregados_{resolucao}
+                AFTER INSERT ON leituras_sensores
+                WHEN NEW.ts_epoch IS NOT NULL
+                BEGIN
+                    INSERT INTO agregados_sensores (
+                        sensor_id, resolucao, bucket, contagem, soma,
+                        minimo, maximo, ultimo, ultimo_epoch
+                    ) VALUES (
+                        NEW.sensor_id, {resolucao}, NEW.ts_epoch - NEW.ts_epoch % {resolucao}, 1, NEW.valor,
+                        NEW.valor, NEW.valor, NEW.valor, NEW.ts_epoch
+                    )
+                    ON CONFLICT (sensor_id, resolucao, bucket) DO UPDATE SET
+                        contagem = contagem + 1,
+                        soma = soma + excluded.soma,
+                        minimo = MIN(minimo, excluded.minimo),
+                        maximo = MAX(maximo, excluded.maximo),
+                        ultimo = CASE WHEN excluded.ultimo_epoch >= ultimo_epoch
+                                      THEN excluded.ultimo ELSE ultimo END,
+                        ultimo_epoch = MAX(ultimo_epoch, excluded.ultimo_epoch);
+                END
+            """)
+
+            if not trigger_existia:
+                # Resolução nova: carrega os agregados a partir das leituras existentes
+                db.execute(f"""
+                    INSERT INTO agregados_sensores
+                    SELECT sensor_id, {resolucao}, bucket, contagem, soma, minimo, maximo,
+                           (SELECT valor FROM leituras_sensores ult
+                            WHERE ult.sensor_id = g.sensor_id AND ult.ts_epoch = g.ultimo_epoch
+                            ORDER BY ult.id DESC LIMIT 1),
+                           ultimo_epoch
+                    FROM (
+                        SELECT sensor_id, ts_epoch - ts_epoch % {resolucao} AS bucket,
+                               COUNT(*) AS contagem, SUM(valor) AS soma,
+                               MIN(valor) AS minimo, MAX(valor) AS maximo,
+                               MAX(ts_epoch) AS ultimo_epoch
+                        FROM leituras_sensores
+                        WHERE ts_epoch IS NOT NULL
+                        GROUP BY sensor_id, bucket
+                    ) g
+                """)
+
     # Tabela de histórico de irrigação
     db.execute("""
         CREATE TABLE IF NOT EXISTS historico_irrigacao (
@@ -135,6 +491,8 @@ def init_fase3_db():
         )
     """)
 
+    db.execute("CREATE INDEX IF NOT EXISTS idx_irrigacao_timestamp ON historico_irrigacao (timestamp)")
+
     # Tabela de alertas
     db.execute("""
         CREATE TABLE IF NOT EXISTS alertas (
@@ -149,6 +507,8 @@ def init_fase3_db():
         )
     """)
 
+    db.execute("CREATE INDEX IF NOT EXISTS idx_alertas_timestamp ON alertas (timestamp)")
+
     # Tabela de contatos para notificações
     db.execute("""
         CREATE TABLE IF NOT EXISTS contatos_notificacao (
@@ -161,15 +521,35 @@ def init_fase3_db():
         )
     """)
 
+    # Versão de dados por tabela: incrementada por trigger a cada alteração,
+    # permite que o dashboard detecte mudanças com uma consulta barata
+    db.execute("""
+        CREATE TABLE IF NOT EXISTS versoes_dados (
+            tabela TEXT PRIMARY KEY,
+            versao INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+
+    for tabela in TABELAS_VERSIONADAS_FASE3:
+        db.execute("INSERT OR IGNORE INTO versoes_dados (tabela, versao) VALUES (?, 0)", (tabela,))
+        for evento in ("INSERT", "UPDATE", "DELETE"):
+            db.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS trg_versao_{tabela}_{evento.lower()}
+                AFTER {evento} ON {tabela}
+                BEGIN
+                    UPDATE versoes_dados SET versao = versao + 1 WHERE tabela = '{tabela}';
+                END
+            """)
+
     db.close()
     return db
 
 
 
 
-def init_fase6_db():
-    """Inicializa banco de dados da Fase 6 - YOLO Vision"""
-    db = DatabaseManager(DB_FASE6)
+def init_fase6_db(db_path: Path = DB_FASE6):
+    """Inicializa banco de dados da Fase 6 - YOLO Vision (ou outro arquivo com o mesmo esquema)"""
+    db = DatabaseManager(db_path)
 
     # Tabela de detecções YOLO
     db.execute("""
@@ -201,6 +581,10 @@ def init_fase6_db():
         )
     """)
 
+    # Índices para as consultas de histórico (objetos por análise e por classe)
+    db.execute("CREATE INDEX IF NOT EXISTS idx_objetos_deteccao ON objetos_detectados (deteccao_id)")
+    db.execute("CREATE INDEX IF NOT EXISTS idx_objetos_classe ON objetos_detectados (classe)")
+
     db.close()
     return db
 
@@ -210,6 +594,7 @@ def init_all_databases():
     init_fase1_db()
     init_fase2_db()
     init_fase3_db()
+    init_fase6_db()
     print(f"✅ Bancos de dados inicializados em: {DB_DIR}")
 
 
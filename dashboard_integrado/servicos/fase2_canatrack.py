@@ -5,9 +5,11 @@ FarmTech Solutions
 
 import uuid
 from datetime import datetime
+from pathlib import Path
 from typing import Dict, List, Tuple, Optional
+import numpy as np
 import pandas as pd
-from .database import DatabaseManager, DB_FASE2, init_fase2_db
+from .database import DB_FASE2, init_fase2_db, executar, consultar, consultar_um, transacao, em_transacao
 
 
 class RegistroColheita:
@@ -70,25 +72,86 @@ class RegistroColheita:
         }
 
 
+# Colunas categóricas do frame do analisador (poucos valores distintos, muitas linhas)
+COLUNAS_CATEGORICAS = ["talhao", "maquina", "operador", "causa_perda", "condicao_clima", "severidade_perda"]
+
+# Dimensões dos rankings -> rótulo do índice exibido na página
+DIMENSOES_RANKING = {"operador": "Operador", "maquina": "Máquina", "talhao": "Talhão"}
+
+
 class AnalisadorPerdas:
-    """Analisa perdas de colheita"""
+    """
+    Analisa perdas de colheita
+
+    Os registros são convertidos uma única vez em um DataFrame colunar
+    (categorias para talhão/máquina/operador) e cada agregado é calculado
+    só no primeiro acesso. Se a lista de registros mudar, chame invalidar().
+    """
 
     def __init__(self, registros: List[RegistroColheita]):
         self.registros = registros
+        self._cache: Dict = {}
+
+    def invalidar(self):
+        """Descarta o frame e os agregados calculados"""
+        self._cache.clear()
+
+    def _memo(self, chave: str, calcular):
+        if chave not in self._cache:
+            self._cache[chave] = calcular()
+        return self._cache[chave]
+
+    @property
+    def frame(self) -> pd.DataFrame:
+        """Registros em formato colunar, montado em uma única passada"""
+        return self._memo("frame", self._montar_frame)
+
+    def _montar_frame(self) -> pd.DataFrame:
+        colunas = {nome: [] for nome in COLUNAS_CATEGORICAS + ["quantidade_colhida", "perda_real"]}
+        for r in self.registros:
+            colunas["talhao"].append(r.talhao)
+            colunas["maquina"].append(r.maquina)
+            colunas["operador"].append(r.operador)
+            colunas["causa_perda"].append(r.causa_perda)
+            colunas["condicao_clima"].append(r.condicao_clima)
+            colunas["severidade_perda"].append(r.severidade_perda)
+            colunas["quantidade_colhida"].append(r.quantidade_colhida)
+            colunas["perda_real"].append(r.perda_real)
+
+        frame = pd.DataFrame({
+            nome: np.asarray(valores, dtype=np.float64)
+            for nome, valores in colunas.items() if nome not in COLUNAS_CATEGORICAS
+        })
+        for nome in COLUNAS_CATEGORICAS:
+            # Categorias na ordem de aparição (mantém a ordem das contagens)
+            valores = colunas[nome]
+            # (None fica fora das categorias: vira NaN na coluna)
+            frame[nome] = pd.Categorical(valores, categories=pd.unique(pd.Series(valores, dtype=object).dropna()))
+        return frame
+
+    def _totais(self) -> Dict[str, float]:
+        return self._memo("totais", lambda: {
+            "perda_total": float(self.frame["perda_real"].sum()),
+            "quantidade_colhida_total": float(self.frame["quantidade_colhida"].sum()),
+        })
+
+    def total_registros(self) -> int:
+        """Quantidade de colheitas analisadas"""
+        return len(self.registros)
 
     def perda_total(self) -> float:
         """Calcula perda total em toneladas"""
-        return sum(r.perda_real for r in self.registros)
+        return self._totais()["perda_total"]
 
     def perda_media(self) -> float:
         """Calcula perda média por colheita"""
-        if not self.registros:
+        if not self.total_registros():
             return 0.0
-        return self.perda_total() / len(self.registros)
+        return self.perda_total() / self.total_registros()
 
     def quantidade_colhida_total(self) -> float:
         """Calcula quantidade total colhida"""
-        return sum(r.quantidade_colhida for r in self.registros)
+        return self._totais()["quantidade_colhida_total"]
 
     def percentual_perda_geral(self) -> float:
         """Calcula percentual de perda geral"""
@@ -97,62 +160,77 @@ class AnalisadorPerdas:
             return 0.0
         return (self.perda_total() / total) * 100
 
-    def ranking_operadores(self) -> pd.DataFrame:
-        """Retorna ranking de operadores por perda média"""
-        if not self.registros:
+    def _agregado_base(self) -> pd.DataFrame:
+        """Soma e contagem de perdas por (operador, máquina, talhão) em uma passada pelos registros"""
+        return self._memo("agregado_base", lambda: self.frame.groupby(
+            list(DIMENSOES_RANKING), observed=True
+        )["perda_real"].agg(["sum", "count"]))
+
+    def _ranking(self, dimensao: str) -> pd.DataFrame:
+        """Ranking por perda total, reagregado a partir do agregado base (sem reler os registros)"""
+        if not self.total_registros():
             return pd.DataFrame()
 
-        df = pd.DataFrame([r.to_dict() for r in self.registros])
-        operador_stats = df.groupby("Operador").agg({
-            "Perda Real (t)": ["sum", "mean", "count"]
-        }).round(2)
+        def calcular():
+            grupos = self._agregado_base().groupby(level=dimensao, observed=True).sum()
+            stats = pd.DataFrame({
+                "Perda Total (t)": grupos["sum"],
+                "Perda Média (t)": grupos["sum"] / grupos["count"],
+                "Colheitas": grupos["count"],
+            }).round(2)
+            stats.index = pd.Index(stats.index.astype(object), name=DIMENSOES_RANKING[dimensao])
+            return stats.sort_values("Perda Total (t)", ascending=False)
 
-        operador_stats.columns = ["Perda Total (t)", "Perda Média (t)", "Colheitas"]
-        operador_stats = operador_stats.sort_values("Perda Total (t)", ascending=False)
-        return operador_stats
+        return self._memo(f"ranking_{dimensao}", calcular).copy()
+
+    def ranking_operadores(self) -> pd.DataFrame:
+        """Retorna ranking de operadores por perda média"""
+        return self._ranking("operador")
 
     def ranking_maquinas(self) -> pd.DataFrame:
         """Retorna ranking de máquinas por perda média"""
-        if not self.registros:
-            return pd.DataFrame()
-
-        df = pd.DataFrame([r.to_dict() for r in self.registros])
-        maquina_stats = df.groupby("Máquina").agg({
-            "Perda Real (t)": ["sum", "mean", "count"]
-        }).round(2)
-
-        maquina_stats.columns = ["Perda Total (t)", "Perda Média (t)", "Colheitas"]
-        maquina_stats = maquina_stats.sort_values("Perda Total (t)", ascending=False)
-        return maquina_stats
+        return self._ranking("maquina")
 
     def ranking_talhaos(self) -> pd.DataFrame:
         """Retorna ranking de talhões com maiores perdas"""
-        if not self.registros:
-            return pd.DataFrame()
-
-        df = pd.DataFrame([r.to_dict() for r in self.registros])
-        talhao_stats = df.groupby("Talhão").agg({
-            "Perda Real (t)": ["sum", "mean", "count"]
-        }).round(2)
-
-        talhao_stats.columns = ["Perda Total (t)", "Perda Média (t)", "Colheitas"]
-        talhao_stats = talhao_stats.sort_values("Perda Total (t)", ascending=False)
-        return talhao_stats
+        return self._ranking("talhao")
+
+    def _contagem(self, coluna: str, incluir_nulos: bool = True) -> Dict[str, int]:
+        """Ocorrências de cada valor da coluna, na ordem de aparição (None conta como "None")"""
+        if not self.total_registros():
+            return {}
+        serie = self.frame[coluna]
+        # reindex pela ordem de aparição: value_counts põe os nulos sempre no fim
+        contagem = serie.value_counts(sort=False, dropna=False).reindex(serie.unique())
+        return {
+            str(None if pd.isna(valor) else valor): int(n)
+            for valor, n in contagem.items()
+            if n and (incluir_nulos or not pd.isna(valor))
+        }
 
     def analise_causa(self) -> Dict[str, int]:
         """Conta ocorrências de causas de perda"""
-        causas = {}
-        for r in self.registros:
-            if r.causa_perda:
-                causas[r.causa_perda] = causas.get(r.causa_perda, 0) + 1
-        return dict(sorted(causas.items(), key=lambda x: x[1], reverse=True))
+        def calcular():
+            causas = {causa: n for causa, n in self._contagem("causa_perda", incluir_nulos=False).items() if causa}
+            return dict(sorted(causas.items(), key=lambda x: x[1], reverse=True))
+        return dict(self._memo("causas", calcular))
 
     def analise_severidade(self) -> Dict[str, int]:
         """Conta ocorrências por severidade"""
-        severidades = {}
-        for r in self.registros:
-            severidades[r.severidade_perda] = severidades.get(r.severidade_perda, 0) + 1
-        return severidades
+        return dict(self._memo("severidades", lambda: self._contagem("severidade_perda")))
+
+    def perdas_chuva(self) -> int:
+        """Colheitas registradas com clima chuvoso"""
+        if not self.total_registros():
+            return 0
+
+        def calcular():
+            # Testa só as categorias distintas e expande pelos códigos
+            clima = self.frame["condicao_clima"].cat
+            chuvosas = np.asarray(clima.categories.astype(str).str.contains("Chuva", regex=False))
+            return int(chuvosas[clima.codes].sum())
+
+        return self._memo("perdas_chuva", calcular)
 
     def sugestoes_melhorias(self) -> List[str]:
         """Gera sugestões baseadas nas análises"""
@@ -179,20 +257,97 @@ class AnalisadorPerdas:
             sugestoes.append(f"🔧 Revisar manutenção da máquina: {pior_maquina} (média de {perda_media_maq:.1f}t de perda)")
 
         # Análise de condições
-        perdas_chuva = sum(1 for r in self.registros if "Chuva" in r.condicao_clima)
-        if perdas_chuva > len(self.registros) * 0.3:
+        if self.perdas_chuva() > self.total_registros() * 0.3:
             sugestoes.append("☔ Muitas perdas em condições chuvosas. Revise cronograma.")
 
         return sugestoes
 
 
+class AnalisadorPerdasSQL(AnalisadorPerdas):
+    """
+    Mesma interface do AnalisadorPerdas, com os agregados calculados no SQLite
+
+    Nenhum registro é carregado em memória: cada análise é uma consulta
+    GROUP BY (apoiada pelos índices de init_fase2_db) que devolve só as
+    linhas de resumo. Os resultados ficam memorizados até invalidar().
+    """
+
+    def __init__(self, db_path: Path = DB_FASE2):
+        super().__init__([])
+        self.db_path = db_path
+
+    def _consultar(self, query: str) -> list:
+        try:
+            return consultar(self.db_path, query)
+        except Exception as e:
+            print(f"Erro ao consultar agregados de colheita: {e}")
+            return []
+
+    def _totais(self) -> Dict[str, float]:
+        def calcular():
+            rows = self._consultar("""
+                SELECT
+                    COUNT(*) AS total_registros,
+                    COALESCE(SUM(perda_real), 0) AS perda_total,
+                    COALESCE(SUM(quantidade_colhida), 0) AS quantidade_colhida_total,
+                    COALESCE(SUM(instr(condicao_clima, 'Chuva') > 0), 0) AS perdas_chuva
+                FROM registros_colheita
+            """)
+            if not rows:
+                return {"total_registros": 0, "perda_total": 0.0, "quantidade_colhida_total": 0.0, "perdas_chuva": 0}
+            return dict(rows[0])
+        return self._memo("totais", calcular)
+
+    def total_registros(self) -> int:
+        """Quantidade de colheitas no banco"""
+        return int(self._totais()["total_registros"])
+
+    def perdas_chuva(self) -> int:
+        """Colheitas registradas com clima chuvoso"""
+        return int(self._totais()["perdas_chuva"])
+
+    def _ranking(self, dimensao: str) -> pd.DataFrame:
+        """Ranking por perda total agrupado no banco (coluna vinda de DIMENSOES_RANKING)"""
+        def calcular():
+            rows = self._consultar(f"""
+                SELECT {dimensao} AS chave, SUM(perda_real) AS soma, COUNT(*) AS colheitas
+                FROM registros_colheita
+                GROUP BY {dimensao}
+            """)
+            if not rows:
+                return pd.DataFrame()
+
+            soma = np.array([row["soma"] for row in rows], dtype=np.float64)
+            colheitas = np.array([row["colheitas"] for row in rows], dtype=np.int64)
+            stats = pd.DataFrame({
+                "Perda Total (t)": soma,
+                "Perda Média (t)": soma / colheitas,
+                "Colheitas": colheitas,
+            }, index=pd.Index([row["chave"] for row in rows], dtype=object, name=DIMENSOES_RANKING[dimensao])).round(2)
+            return stats.sort_values("Perda Total (t)", ascending=False)
+
+        return self._memo(f"ranking_{dimensao}", calcular).copy()
+
+    def _contagem(self, coluna: str, incluir_nulos: bool = True) -> Dict[str, int]:
+        """Ocorrências de cada valor da coluna, da mais frequente para a menos frequente"""
+        def calcular():
+            rows = self._consultar(f"""
+                SELECT {coluna} AS valor, COUNT(*) AS total
+                FROM registros_colheita
+                {"" if incluir_nulos else f"WHERE {coluna} IS NOT NULL"}
+                GROUP BY {coluna}
+                ORDER BY total DESC, valor
+            """)
+            return {str(row["valor"]): row["total"] for row in rows}
+        return self._memo(f"contagem_{coluna}_{incluir_nulos}", calcular)
+
+
 # ===== FUNÇÕES DE BANCO DE DADOS =====
 
 def salvar_registro(registro: RegistroColheita) -> bool:
     """Salva um registro de colheita no banco de dados"""
     try:
-        db = DatabaseManager(DB_FASE2)
-        db.execute("""
+        executar(DB_FASE2, """
             INSERT INTO registros_colheita (
                 id, talhao, maquina, operador, data_colheita,
                 quantidade_colhida, tipo_colheita, perda_estimada, perda_real,
@@ -215,56 +370,148 @@ def salvar_registro(registro: RegistroColheita) -> bool:
             registro.severidade_perda,
             registro.data_registro
         ))
-        db.close()
         return True
     except Exception as e:
         print(f"Erro ao salvar registro: {e}")
+        if em_transacao(DB_FASE2):
+            # Parte de uma transação maior: quem a abriu precisa desfazê-la
+            raise
         return False
 
 
+def _registro_de_linha(row) -> RegistroColheita:
+    """Converte uma linha de registros_colheita em RegistroColheita"""
+    registro = RegistroColheita(
+        talhao=row['talhao'],
+        maquina=row['maquina'],
+        operador=row['operador'],
+        data_colheita=row['data_colheita'],
+        quantidade_colhida=row['quantidade_colhida'],
+        tipo_colheita=row['tipo_colheita'],
+        perda_estimada=row['perda_estimada'],
+        perda_real=row['perda_real'],
+        causa_perda=row['causa_perda'],
+        condicao_solo=row['condicao_solo'],
+        condicao_clima=row['condicao_clima'],
+        severidade_perda=row['severidade_perda']
+    )
+    registro.id = row['id']
+    registro.data_registro = row['data_registro']
+    return registro
+
+
 def carregar_registros() -> List[RegistroColheita]:
     """Carrega todos os registros do banco de dados"""
     try:
-        db = DatabaseManager(DB_FASE2)
-        rows = db.fetchall("SELECT * FROM registros_colheita ORDER BY data_colheita DESC")
-
-        registros = []
-        for row in rows:
-            registro = RegistroColheita(
-                talhao=row['talhao'],
-                maquina=row['maquina'],
-                operador=row['operador'],
-                data_colheita=row['data_colheita'],
-                quantidade_colhida=row['quantidade_colhida'],
-                tipo_colheita=row['tipo_colheita'],
-                perda_estimada=row['perda_estimada'],
-                perda_real=row['perda_real'],
-                causa_perda=row['causa_perda'],
-                condicao_solo=row['condicao_solo'],
-                condicao_clima=row['condicao_clima'],
-                severidade_perda=row['severidade_perda']
-            )
-            registro.id = row['id']
-            registro.data_registro = row['data_registro']
-            registros.append(registro)
-
-        db.close()
-        return registros
+        rows = consultar(DB_FASE2, "SELECT * FROM registros_colheita ORDER BY data_colheita DESC")
+        return [_registro_de_linha(row) for row in rows]
     except Exception as e:
         print(f"Erro ao carregar registros: {e}")
         return []
 
 
+# Filtros aceitos na paginação -> condição SQL
+FILTROS_REGISTROS = {
+    "talhao": "talhao = ?",
+    "maquina": "maquina = ?",
+    "operador": "operador = ?",
+    "severidade_perda": "severidade_perda = ?",
+    "data_inicio": "data_colheita >= ?",
+    "data_fim": "data_colheita <= ?",
+}
+
+
+def _condicoes_filtros(filtros: Optional[Dict]) -> Tuple[List[str], List]:
+    """Monta as condições WHERE dos filtros informados (valores vazios são ignorados)"""
+    condicoes, params = [], []
+    for chave, valor in (filtros or {}).items():
+        if chave in FILTROS_REGISTROS and valor not in (None, ""):
+            condicoes.append(FILTROS_REGISTROS[chave])
+            params.append(str(valor))
+    return condicoes, params
+
+
+def carregar_pagina_registros(
+    tamanho_pagina: int = 50,
+    cursor: Optional[Tuple[str, str]] = None,
+    filtros: Optional[Dict] = None,
+    decrescente: bool = True
+) -> Tuple[List[RegistroColheita], Optional[Tuple[str, str]]]:
+    """
+    Carrega uma página de registros com paginação por chave (data_colheita, id)
+
+    Em vez de OFFSET, cada página começa depois do último registro da
+    anterior, então o custo não cresce com o número da página.
+
+    Args:
+        tamanho_pagina: Registros por página
+        cursor: (data_colheita, id) do último registro da página anterior (None = primeira)
+        filtros: Valores de FILTROS_REGISTROS (talhão, máquina, operador, severidade, datas)
+        decrescente: Mais recentes primeiro
+
+    Returns:
+        (registros da página, cursor da próxima página ou None se for a última)
+    """
+    try:
+        condicoes, params = _condicoes_filtros(filtros)
+        if cursor is not None:
+            condicoes.append(f"(data_colheita, id) {'<' if decrescente else '>'} (?, ?)")
+            params.extend(cursor)
+
+        ordem = "DESC" if decrescente else "ASC"
+        where = f"WHERE {' AND '.join(condicoes)}" if condicoes else ""
+        # Uma linha a mais indica se existe próxima página
+        rows = consultar(DB_FASE2, f"""
+            SELECT * FROM registros_colheita
+            {where}
+            ORDER BY data_colheita {ordem}, id {ordem}
+            LIMIT ?
+        """, tuple(params) + (tamanho_pagina + 1,))
+
+        registros = [_registro_de_linha(row) for row in rows[:tamanho_pagina]]
+        proximo = None
+        if len(rows) > tamanho_pagina:
+            ultimo = registros[-1]
+            proximo = (ultimo.data_colheita, ultimo.id)
+        return registros, proximo
+    except Exception as e:
+        print(f"Erro ao carregar página de registros: {e}")
+        return [], None
+
+
+def contar_registros(filtros: Optional[Dict] = None) -> int:
+    """Quantidade de registros que atendem aos filtros"""
+    try:
+        condicoes, params = _condicoes_filtros(filtros)
+        where = f"WHERE {' AND '.join(condicoes)}" if condicoes else ""
+        row = consultar_um(DB_FASE2, f"SELECT COUNT(*) AS total FROM registros_colheita {where}", tuple(params))
+        return row['total'] if row else 0
+    except Exception as e:
+        print(f"Erro ao contar registros: {e}")
+        return 0
+
+
+def listar_valores_filtro(coluna: str) -> List[str]:
+    """Valores distintos de uma coluna de filtro (talhao, maquina, operador, severidade_perda)"""
+    if coluna not in FILTROS_REGISTROS or coluna.startswith("data_"):
+        return []
+    try:
+        rows = consultar(DB_FASE2, f"SELECT DISTINCT {coluna} AS valor FROM registros_colheita WHERE {coluna} IS NOT NULL ORDER BY {coluna}")
+        return [row['valor'] for row in rows]
+    except Exception as e:
+        print(f"Erro ao listar valores de {coluna}: {e}")
+        return []
+
+
 def inicializar_com_exemplos():
     """Inicializa o banco com dados de exemplo se estiver vazio"""
-    db = DatabaseManager(DB_FASE2)
-    count = db.fetchone("SELECT COUNT(*) as total FROM registros_colheita")
-    db.close()
+    count = consultar_um(DB_FASE2, "SELECT COUNT(*) as total FROM registros_colheita")
 
     if count and count['total'] == 0:
         exemplos = gerar_dados_exemplo()
-        for registro in exemplos:
-            salvar_registro(registro)
+        with transacao(DB_FASE2):
+            for registro in exemplos:
+                salvar_registro(registro)
         print(f"✅ {len(exemplos)} registros de exemplo adicionados ao banco de dados")
 
 
@@ -0,0 +1,345 @@
+"""
+Serviços da Fase 2 - Importação em lote de registros de colheita
+FarmTech Solutions
+
+Lê planilhas CSV ou Parquet em blocos, valida cada bloco com versões
+vetorizadas das regras de fases/fase_2/src/registro_colheita.py e grava
+as linhas válidas em registros_colheita com uma transação por bloco.
+Linhas inválidas não interrompem a importação: são listadas com o número
+da linha, a coluna e o motivo.
+"""
+
+import time
+import unicodedata
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from .database import DB_FASE2, transacao
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:
+    pq = None
+
+FonteImportacao = Union[str, Path, BinaryIO]
+
+# Valores aceitos pela página (com os sinônimos usados na Fase 2 original)
+TIPOS_COLHEITA = {
+    "mecanizada": "Mecanizada",
+    "mecanica": "Mecanizada",
+    "manual": "Manual",
+    "mista": "Mista",
+}
+SEVERIDADES = {
+    "leve": "Leve",
+    "baixa": "Leve",
+    "media": "Média",
+    "alto": "Alto",
+    "alta": "Alto",
+    "critico": "Crítico",
+    "critica": "Crítico",
+}
+
+# Fator de perda estimada por tipo (calcular_perda_estimada da Fase 2)
+FATOR_PERDA_ESTIMADA = {"Manual": 0.05, "Mecanizada": 0.15, "Mista": 0.10}
+
+# Nomes de coluna aceitos -> coluna de registros_colheita. Inclui os
+# cabeçalhos de RegistroColheita.to_dict(), então a tabela exportada da
+# página pode ser reimportada
+COLUNAS = {
+    "id": "id",
+    "talhao": "talhao",
+    "maquina": "maquina",
+    "operador": "operador",
+    "data_colheita": "data_colheita",
+    "data": "data_colheita",
+    "quantidade_colhida": "quantidade_colhida",
+    "quantidade (t)": "quantidade_colhida",
+    "tipo_colheita": "tipo_colheita",
+    "tipo": "tipo_colheita",
+    "perda_estimada": "perda_estimada",
+    "perda estimada (t)": "perda_estimada",
+    "perda_real": "perda_real",
+    "perda real (t)": "perda_real",
+    "causa_perda": "causa_perda",
+    "causa": "causa_perda",
+    "condicao_solo": "condicao_solo",
+    "solo": "condicao_solo",
+    "condicao_clima": "condicao_clima",
+    "clima": "condicao_clima",
+    "severidade_perda": "severidade_perda",
+    "severidade": "severidade_perda",
+}
+COLUNAS_OBRIGATORIAS = ["talhao", "maquina", "operador", "quantidade_colhida", "tipo_colheita", "perda_real"]
+COLUNAS_TABELA = [
+    "id", "talhao", "maquina", "operador", "data_colheita", "quantidade_colhida", "tipo_colheita",
+    "perda_estimada", "perda_real", "causa_perda", "condicao_solo", "condicao_clima",
+    "severidade_perda", "data_registro",
+]
+
+# Colunas que identificam um registro importado sem id (ver _ids_deterministicos)
+CHAVE_NATURAL = [
+    "talhao", "maquina", "operador", "data_colheita", "quantidade_colhida", "tipo_colheita", "perda_real",
+]
+NAMESPACE_IDS = uuid.uuid5(uuid.NAMESPACE_URL, "farmtech:registros_colheita")
+
+
+def _sem_acentos(texto: str) -> str:
+    return unicodedata.normalize("NFKD", texto).encode("ascii", "ignore").decode("ascii")
+
+
+def _normalizar_colunas(bloco: pd.DataFrame) -> pd.DataFrame:
+    """Renomeia os cabeçalhos aceitos e converte tudo para texto ('' para vazio)"""
+    renomear = {}
+    for coluna in bloco.columns:
+        chave = _sem_acentos(str(coluna)).strip().lower()
+        if chave in COLUNAS:
+            renomear[coluna] = COLUNAS[chave]
+    bloco = bloco[list(renomear)].rename(columns=renomear)
+
+    for coluna in bloco.columns:
+        serie = bloco[coluna]
+        if pd.api.types.is_datetime64_any_dtype(serie):
+            bloco[coluna] = serie.dt.strftime("%Y-%m-%d").fillna("")
+        else:
+            bloco[coluna] = serie.astype(object).where(serie.notna(), "").astype(str).str.strip()
+    return bloco
+
+
+def _ler_blocos(fonte: FonteImportacao, formato: Optional[str], tamanho_bloco: int) -> Iterator[pd.DataFrame]:
+    """Lê a planilha em blocos de até `tamanho_bloco` linhas, sem carregá-la inteira"""
+    if formato is None:
+        nome = str(getattr(fonte, "name", fonte))
+        formato = "parquet" if nome.lower().endswith((".parquet", ".pq")) else "csv"
+
+    if formato == "parquet":
+        if pq is None:
+            # Sem pyarrow, pandas lê o arquivo inteiro (outro motor, se houver)
+            tabela = pd.read_parquet(fonte)
+            for inicio in range(0, len(tabela), tamanho_bloco):
+                yield tabela.iloc[inicio:inicio + tamanho_bloco]
+            return
+        for lote in pq.ParquetFile(fonte).iter_batches(batch_size=tamanho_bloco):
+            yield lote.to_pandas()
+        return
+
+    yield from pd.read_csv(
+        fonte, chunksize=tamanho_bloco, dtype=str, keep_default_na=False,
+        sep=_detectar_separador(fonte), encoding="utf-8-sig"
+    )
+
+
+def _detectar_separador(fonte: FonteImportacao) -> str:
+    """Vírgula ou ponto e vírgula (planilhas exportadas em português), pelo cabeçalho"""
+    if isinstance(fonte, (str, Path)):
+        with open(fonte, "rb") as f:
+            cabecalho = f.readline()
+    else:
+        posicao = fonte.tell()
+        cabecalho = fonte.readline()
+        fonte.seek(posicao)
+    if isinstance(cabecalho, str):
+        cabecalho = cabecalho.encode()
+    return ";" if cabecalho.count(b";") > cabecalho.count(b",") else ","
+
+
+def _mapear_opcoes(serie: pd.Series, opcoes: Dict[str, str]) -> pd.Series:
+    """Mapeia texto livre para o valor canônico (sem diferenciar maiúsculas e acentos); inválidos viram NaN"""
+    # Normaliza só os valores distintos, não cada linha
+    tabela = {valor: opcoes.get(_sem_acentos(valor).lower()) for valor in pd.unique(serie)}
+    return serie.map(tabela)
+
+
+def _numero(serie: pd.Series) -> pd.Series:
+    """Converte texto em número aceitando vírgula decimal; inválidos viram NaN"""
+    return pd.to_numeric(serie.str.replace(",", ".", regex=False), errors="coerce")
+
+
+def _ids_deterministicos(linhas: pd.DataFrame) -> List[str]:
+    """
+    Id derivado da chave natural do registro, para linhas sem coluna id
+
+    A mesma linha gera sempre o mesmo id, então o INSERT OR IGNORE descarta
+    reimportações; linhas com chave natural idêntica contam como duplicadas.
+    """
+    return [
+        uuid.uuid5(NAMESPACE_IDS, "|".join(map(str, chave))).hex
+        for chave in linhas[CHAVE_NATURAL].itertuples(index=False, name=None)
+    ]
+
+
+def validar_bloco(bloco: pd.DataFrame, linha_inicial: int = 2) -> Tuple[pd.DataFrame, List[Dict]]:
+    """
+    Valida um bloco já normalizado, todas as linhas de uma vez
+
+    Args:
+        bloco: Colunas de registros_colheita como texto
+        linha_inicial: Número da primeira linha do bloco no arquivo (2 = após o cabeçalho)
+
+    Returns:
+        (linhas válidas prontas para inserir, erros por linha)
+    """
+    n = len(bloco)
+    linhas = np.arange(linha_inicial, linha_inicial + n)
+    invalida = np.zeros(n, dtype=bool)
+    erros: List[Dict] = []
+
+    def coluna(nome: str) -> pd.Series:
+        return bloco[nome] if nome in bloco.columns else pd.Series([""] * n, index=bloco.index, dtype=object)
+
+    def registrar(mascara, nome: str, mensagem: str):
+        mascara = np.asarray(mascara, dtype=bool) & ~invalida
+        for i in np.flatnonzero(mascara):
+            erros.append({"linha": int(linhas[i]), "coluna": nome, "valor": coluna(nome).iat[i], "erro": mensagem})
+        invalida[mascara] = True
+
+    # validar_id: talhão, máquina e operador obrigatórios
+    for nome, rotulo in (("talhao", "Talhão"), ("maquina", "Máquina"), ("operador", "Operador")):
+        registrar(coluna(nome) == "", nome, f"{rotulo} é obrigatório e não pode estar vazio")
+
+    # validar_quantidade
+    quantidade = _numero(coluna("quantidade_colhida"))
+    registrar(quantidade.isna(), "quantidade_colhida", "Quantidade colhida deve ser um número válido")
+    registrar(quantidade <= 0, "quantidade_colhida", "Quantidade colhida deve ser um número positivo")
+
+    # validar_perda_real (obrigatória: a coluna não aceita nulo no banco)
+    perda_real = _numero(coluna("perda_real"))
+    registrar(perda_real.isna(), "perda_real", "Perda real deve ser um número válido")
+    registrar(perda_real < 0, "perda_real", "Perda real não pode ser negativa")
+    registrar(perda_real > quantidade, "perda_real", "Perda real não pode ser maior que a quantidade colhida")
+
+    # validar_tipo_colheita
+    tipo = _mapear_opcoes(coluna("tipo_colheita"), TIPOS_COLHEITA)
+    registrar(tipo.isna(), "tipo_colheita", f"Tipo de colheita inválido. Escolha entre: {', '.join(FATOR_PERDA_ESTIMADA)}")
+
+    # validar_severidade (vazio = Leve, o padrão de RegistroColheita)
+    texto_severidade = coluna("severidade_perda")
+    severidade = _mapear_opcoes(texto_severidade, {**SEVERIDADES, "": "Leve"})
+    registrar(severidade.isna(), "severidade_perda", f"Severidade inválida. Escolha entre: {', '.join(dict.fromkeys(SEVERIDADES.values()))}")
+
+    # validar_data (vazio = hoje)
+    texto_data = coluna("data_colheita")
+    data = pd.to_datetime(texto_data, format="%Y-%m-%d", errors="coerce")
+    registrar(data.isna() & (texto_data != ""), "data_colheita", "Data inválida. Use o formato YYYY-MM-DD")
+
+    # Perda estimada informada ou calculada pelo tipo (calcular_perda_estimada)
+    texto_estimada = coluna("perda_estimada")
+    perda_estimada = _numero(texto_estimada)
+    registrar(perda_estimada.isna() & (texto_estimada != ""), "perda_estimada", "Perda estimada deve ser um número válido")
+    registrar(perda_estimada < 0, "perda_estimada", "Perda estimada não pode ser negativa")
+    calculada = (quantidade * tipo.map(FATOR_PERDA_ESTIMADA).astype(float)).round(2)
+    perda_estimada = perda_estimada.fillna(calculada)
+
+    valido = ~invalida
+    ids = coluna("id")
+    agora = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    validos = pd.DataFrame({
+        "id": ids[valido].tolist(),
+        "talhao": coluna("talhao")[valido].values,
+        "maquina": coluna("maquina")[valido].values,
+        "operador": coluna("operador")[valido].values,
+        "data_colheita": texto_data[valido].values,
+        "quantidade_colhida": quantidade[valido].values,
+        "tipo_colheita": tipo[valido].values,
+        "perda_estimada": perda_estimada[valido].values,
+        "perda_real": perda_real[valido].values,
+        "causa_perda": coluna("causa_perda")[valido].values,
+        "condicao_solo": coluna("condicao_solo")[valido].replace("", "Normal").values,
+        "condicao_clima": coluna("condicao_clima")[valido].replace("", "Normal").values,
+        "severidade_perda": severidade[valido].values,
+        "data_registro": agora,
+    }, columns=COLUNAS_TABELA)
+
+    # O id sai da data como veio no arquivo: com o padrão "hoje" aplicado antes,
+    # a mesma linha sem data geraria outro id ao ser reimportada em outro dia
+    sem_id = validos["id"] == ""
+    if sem_id.any():
+        validos.loc[sem_id, "id"] = _ids_deterministicos(validos[sem_id])
+    validos["data_colheita"] = validos["data_colheita"].replace("", agora[:10])
+
+    erros.sort(key=lambda e: e["linha"])
+    return validos, erros
+
+
+def importar_registros(
+    fonte: FonteImportacao,
+    formato: Optional[str] = None,
+    db_path: Path = DB_FASE2,
+    tamanho_bloco: int = 10000,
+    max_erros: int = 1000
+) -> Dict:
+    """
+    Importa uma planilha CSV ou Parquet para registros_colheita
+
+    Args:
+        fonte: Caminho ou arquivo aberto (ex.: upload do Streamlit)
+        formato: "csv" ou "parquet" (None = pela extensão do nome)
+        db_path: Banco de destino
+        tamanho_bloco: Linhas lidas, validadas e gravadas por transação
+        max_erros: Máximo de erros guardados no resultado (todos são contados)
+
+    Returns:
+        Contadores da importação, erros por linha e linhas por segundo.
+        Linhas com id já existente no banco são ignoradas; sem coluna id,
+        o id vem da chave natural (talhão, máquina, operador, data,
+        quantidade, tipo e perda real), então reimportar o mesmo arquivo
+        não duplica registros.
+    """
+    resultado = {
+        "linhas_lidas": 0,
+        "linhas_validas": 0,
+        "linhas_inseridas": 0,
+        "linhas_duplicadas": 0,
+        "linhas_invalidas": 0,
+        "blocos": 0,
+        "erros": [],
+        "colunas_faltando": [],
+        "tempo_s": 0.0,
+        "linhas_por_segundo": 0.0,
+    }
+    inicio = time.perf_counter()
+    placeholders = ", ".join("?" for _ in COLUNAS_TABELA)
+    sql = f"INSERT OR IGNORE INTO registros_colheita ({', '.join(COLUNAS_TABELA)}) VALUES ({placeholders})"
+
+    try:
+        linha_arquivo = 2
+        for bloco in _ler_blocos(fonte, formato, tamanho_bloco):
+            bloco = _normalizar_colunas(bloco)
+            if resultado["blocos"] == 0:
+                faltando = [c for c in COLUNAS_OBRIGATORIAS if c not in bloco.columns]
+                if faltando:
+                    resultado["colunas_faltando"] = faltando
+                    print(f"Erro na importação: colunas obrigatórias ausentes: {', '.join(faltando)}")
+                    break
+
+            validos, erros = validar_bloco(bloco, linha_arquivo)
+            linha_arquivo += len(bloco)
+            resultado["blocos"] += 1
+            resultado["linhas_lidas"] += len(bloco)
+            resultado["linhas_validas"] += len(validos)
+            resultado["linhas_invalidas"] += len(bloco) - len(validos)
+            espaco = max_erros - len(resultado["erros"])
+            if espaco > 0:
+                resultado["erros"].extend(erros[:espaco])
+
+            if len(validos):
+                linhas = validos.astype(object).itertuples(index=False, name=None)
+                with transacao(db_path) as conn:
+                    antes = conn.total_changes
+                    conn.executemany(sql, linhas)
+                    inseridas = conn.total_changes - antes
+                resultado["linhas_inseridas"] += inseridas
+                resultado["linhas_duplicadas"] += len(validos) - inseridas
+    except Exception as e:
+        print(f"Erro na importação de registros: {e}")
+        resultado["erros"].append({"linha": None, "coluna": None, "valor": None, "erro": str(e)})
+
+    resultado["tempo_s"] = round(time.perf_counter() - inicio, 3)
+    if resultado["tempo_s"]:
+        resultado["linhas_por_segundo"] = round(resultado["linhas_lidas"] / resultado["tempo_s"], 1)
+    return resultado
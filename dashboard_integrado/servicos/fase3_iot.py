@@ -3,11 +3,19 @@ Serviços da Fase 3 - IoT e Sensores
 FarmTech Solutions
 """
 
+import calendar
+import queue
 import random
-from datetime import datetime, timedelta
-from typing import Dict, List, Tuple
+import threading
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterator, List, Tuple
+import numpy as np
 import pandas as pd
-from .database import DatabaseManager, DB_FASE3, init_fase3_db
+from .database import (
+    DB_FASE3, RESOLUCOES_AGREGADOS, init_fase3_db,
+    executar, consultar, consultar_um, transacao, em_transacao
+)
 
 
 class LeituraSensor:
@@ -38,6 +46,153 @@ class LeituraSensor:
         }
 
 
+class BufferCircularLeituras:
+    """
+    Buffer circular colunar com as leituras de um sensor
+
+    Guarda valores (float64) e timestamps (int64, segundos como em ts_epoch)
+    em arrays NumPy de capacidade fixa. A inserção é O(1) e mantém soma,
+    mínimo e máximo correntes da janela armazenada; estatísticas de janelas
+    menores são calculadas de forma vetorizada. Também se comporta como uma
+    sequência de LeituraSensor (len, índice, fatia, iteração) para manter
+    compatibilidade com o código que percorre `Sensor.leituras`.
+    """
+
+    def __init__(self, sensor_id: str, tipo_sensor: str, unidade: str, capacidade: int = 1024):
+        self.sensor_id = sensor_id
+        self.tipo_sensor = tipo_sensor
+        self.unidade = unidade
+        self.capacidade = capacidade
+        self._valores = np.zeros(capacidade, dtype=np.float64)
+        self._timestamps = np.zeros(capacidade, dtype=np.int64)
+        self.limpar()
+
+    def limpar(self):
+        """Remove todas as leituras"""
+        self._inicio = 0
+        self._tamanho = 0
+        self._total = 0  # leituras já inseridas (sequencial)
+        self._soma = 0.0
+        self._minimos: deque = deque()  # (sequencial, valor) crescente
+        self._maximos: deque = deque()  # (sequencial, valor) decrescente
+
+    def adicionar(self, valor: float, timestamp: str):
+        """Insere uma leitura, descartando a mais antiga se o buffer estiver cheio"""
+        valor = float(valor)
+        if self._tamanho == self.capacidade:
+            self._soma -= self._valores[self._inicio]
+            self._inicio = (self._inicio + 1) % self.capacidade
+            self._tamanho -= 1
+
+        posicao = (self._inicio + self._tamanho) % self.capacidade
+        self._valores[posicao] = valor
+        self._timestamps[posicao] = timestamp_para_epoch(timestamp)
+        self._tamanho += 1
+        self._soma += valor
+
+        sequencial = self._total
+        self._total += 1
+        primeiro_valido = self._total - self._tamanho
+
+        while self._minimos and self._minimos[-1][1] >= valor:
+            self._minimos.pop()
+        self._minimos.append((sequencial, valor))
+        while self._minimos[0][0] < primeiro_valido:
+            self._minimos.popleft()
+
+        while self._maximos and self._maximos[-1][1] <= valor:
+            self._maximos.pop()
+        self._maximos.append((sequencial, valor))
+        while self._maximos[0][0] < primeiro_valido:
+            self._maximos.popleft()
+
+    def valores(self) -> np.ndarray:
+        """Valores em ordem cronológica"""
+        return self._ordenado(self._valores)
+
+    def timestamps(self) -> np.ndarray:
+        """Timestamps (segundos) em ordem cronológica"""
+        return self._ordenado(self._timestamps)
+
+    def _ordenado(self, dados: np.ndarray) -> np.ndarray:
+        fim = self._inicio + self._tamanho
+        if fim <= self.capacidade:
+            return dados[self._inicio:fim]
+        return np.concatenate((dados[self._inicio:], dados[:fim - self.capacidade]))
+
+    def ultimo(self) -> float:
+        """Valor da leitura mais recente (0.0 se vazio)"""
+        if not self._tamanho:
+            return 0.0
+        return float(self._valores[(self._inicio + self._tamanho - 1) % self.capacidade])
+
+    def media(self) -> float:
+        """Média corrente de todas as leituras armazenadas"""
+        return self._soma / self._tamanho if self._tamanho else 0.0
+
+    def minimo(self) -> float:
+        """Mínimo corrente das leituras armazenadas"""
+        return self._minimos[0][1] if self._tamanho else 0.0
+
+    def maximo(self) -> float:
+        """Máximo corrente das leituras armazenadas"""
+        return self._maximos[0][1] if self._tamanho else 0.0
+
+    def estatisticas(self, ultimas: int = None, segundos: int = None) -> Dict[str, float]:
+        """
+        Estatísticas vetorizadas de uma janela
+
+        Args:
+            ultimas: Considera apenas as N leituras mais recentes
+            segundos: Considera apenas leituras dos últimos N segundos
+                      (relativo à leitura mais recente)
+
+        Returns:
+            Dict com contagem, media, minimo, maximo e desvio
+        """
+        valores = self.valores()
+        if segundos is not None and len(valores):
+            timestamps = self.timestamps()
+            inicio = np.searchsorted(timestamps, timestamps[-1] - segundos, side="left")
+            valores = valores[inicio:]
+        if ultimas is not None:
+            valores = valores[-ultimas:]
+
+        if not len(valores):
+            return {"contagem": 0, "media": 0.0, "minimo": 0.0, "maximo": 0.0, "desvio": 0.0}
+
+        return {
+            "contagem": int(len(valores)),
+            "media": float(valores.mean()),
+            "minimo": float(valores.min()),
+            "maximo": float(valores.max()),
+            "desvio": float(valores.std())
+        }
+
+    def _leitura(self, indice: int) -> LeituraSensor:
+        posicao = (self._inicio + indice) % self.capacidade
+        timestamp = datetime.fromtimestamp(int(self._timestamps[posicao]), tz=timezone.utc)
+        return LeituraSensor(
+            sensor_id=self.sensor_id,
+            tipo_sensor=self.tipo_sensor,
+            valor=float(self._valores[posicao]),
+            unidade=self.unidade,
+            timestamp=timestamp.strftime("%Y-%m-%d %H:%M:%S")
+        )
+
+    def __len__(self) -> int:
+        return self._tamanho
+
+    def __getitem__(self, indice):
+        if isinstance(indice, slice):
+            return [self._leitura(i) for i in range(self._tamanho)[indice]]
+        return self._leitura(range(self._tamanho)[indice])
+
+    def __iter__(self) -> Iterator[LeituraSensor]:
+        for i in range(self._tamanho):
+            yield self._leitura(i)
+
+
 class Sensor:
     """Representa um sensor IoT"""
 
@@ -49,7 +204,8 @@ class Sensor:
         min_valor: float,
         max_valor: float,
         min_ideal: float = None,
-        max_ideal: float = None
+        max_ideal: float = None,
+        capacidade: int = 1024
     ):
         self.sensor_id = sensor_id
         self.tipo = tipo
@@ -58,7 +214,18 @@ class Sensor:
         self.max_valor = max_valor
         self.min_ideal = min_ideal or min_valor
         self.max_ideal = max_ideal or max_valor
-        self.leituras: List[LeituraSensor] = []
+        self._leituras = BufferCircularLeituras(sensor_id, tipo, unidade, capacidade)
+
+    @property
+    def leituras(self) -> BufferCircularLeituras:
+        """Leituras armazenadas no buffer circular"""
+        return self._leituras
+
+    @leituras.setter
+    def leituras(self, leituras: List[LeituraSensor]):
+        self._leituras.limpar()
+        for leitura in leituras:
+            self._leituras.adicionar(leitura.valor, leitura.timestamp)
 
     def adicionar_leitura(self, valor: float, timestamp: str = None) -> LeituraSensor:
         """Adiciona nova leitura"""
@@ -69,20 +236,16 @@ class Sensor:
             unidade=self.unidade,
             timestamp=timestamp
         )
-        self.leituras.append(leitura)
+        self._leituras.adicionar(leitura.valor, leitura.timestamp)
         return leitura
 
     def ultima_leitura(self) -> float:
         """Retorna o valor da última leitura"""
-        if self.leituras:
-            return self.leituras[-1].valor
-        return 0.0
+        return self._leituras.ultimo()
 
     def valor_medio(self) -> float:
         """Calcula média de leituras"""
-        if not self.leituras:
-            return 0.0
-        return sum(l.valor for l in self.leituras) / len(self.leituras)
+        return self._leituras.media()
 
     def esta_ideal(self) -> bool:
         """Verifica se está na faixa ideal"""
@@ -275,61 +438,211 @@ def gerar_alertas_sensores(sensores: Dict[str, Sensor]) -> List[Dict]:
 
 
 def calcular_historico_resumido(sensores: Dict[str, Sensor], horas: int = 24) -> pd.DataFrame:
-    """Calcula resumo do histórico dos últimos N horas"""
+    """
+    Calcula resumo do histórico das últimas N horas
+
+    Usa os agregados incrementais do banco (custo constante por sensor)
+    quando eles correspondem às leituras do sensor; caso contrário (ex.: dados
+    de exemplo em memória) resume a partir do buffer de leituras.
+    """
 
+    agregados = resumo_agregado(horas * 3600, list(sensores))
     dados = []
 
     for sensor_id, sensor in sensores.items():
-        if sensor.leituras:
-            leituras_recentes = sensor.leituras[-horas:]
-            valores = [l.valor for l in leituras_recentes]
-
-            dados.append({
-                "Sensor": sensor_id,
-                "Tipo": sensor.tipo,
-                "Última": f"{sensor.ultima_leitura():.2f} {sensor.unidade}",
-                "Média": f"{sensor.valor_medio():.2f} {sensor.unidade}",
-                "Min": f"{min(valores):.2f}",
-                "Max": f"{max(valores):.2f}",
-                "Status": sensor.status()
-            })
+        if not sensor.leituras:
+            continue
+
+        resumo = agregados.get(sensor_id)
+        if resumo is None or resumo["ultimo_epoch"] != sensor.leituras.timestamps()[-1]:
+            resumo = sensor.leituras.estatisticas(segundos=horas * 3600)
+
+        dados.append({
+            "Sensor": sensor_id,
+            "Tipo": sensor.tipo,
+            "Última": f"{sensor.ultima_leitura():.2f} {sensor.unidade}",
+            "Média": f"{resumo['media']:.2f} {sensor.unidade}",
+            "Min": f"{resumo['minimo']:.2f}",
+            "Max": f"{resumo['maximo']:.2f}",
+            "Status": sensor.status()
+        })
 
     return pd.DataFrame(dados)
 
 
 # ===== FUNÇÕES DE BANCO DE DADOS =====
 
+def timestamp_para_epoch(timestamp: str) -> int:
+    """
+    Converte o timestamp textual de uma leitura para segundos (coluna ts_epoch)
+
+    Usa o horário de parede sem fuso, igual a strftime('%s', timestamp) no SQLite,
+    para que linhas gravadas pelo Python e pela migração fiquem comparáveis.
+    """
+    try:
+        data = datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S")
+    except ValueError:
+        data = datetime.fromisoformat(timestamp)
+    return calendar.timegm(data.timetuple())
+
+
 def salvar_leitura_sensor(leitura: LeituraSensor, status: str = "Normal") -> bool:
     """Salva uma leitura de sensor no banco de dados"""
     try:
-        db = DatabaseManager(DB_FASE3)
-        db.execute("""
+        executar(DB_FASE3, """
             INSERT INTO leituras_sensores (
-                sensor_id, tipo_sensor, valor, unidade, timestamp, status
-            ) VALUES (?, ?, ?, ?, ?, ?)
+                sensor_id, tipo_sensor, valor, unidade, timestamp, status, ts_epoch
+            ) VALUES (?, ?, ?, ?, ?, ?, ?)
         """, (
             leitura.sensor_id,
             leitura.tipo_sensor,
             leitura.valor,
             leitura.unidade,
             leitura.timestamp,
-            status
+            status,
+            timestamp_para_epoch(leitura.timestamp)
         ))
-        db.close()
         return True
     except Exception as e:
         print(f"Erro ao salvar leitura: {e}")
+        if em_transacao(DB_FASE3):
+            # Parte de uma transação maior: quem a abriu precisa desfazê-la
+            raise
         return False
 
 
+class BufferLeituras:
+    """
+    Buffer de escrita em lote para leituras de sensores
+
+    Acumula leituras em uma fila limitada e as grava com executemany em uma
+    única transação quando a fila atinge `tamanho_lote` ou a cada
+    `intervalo_flush` segundos. Com a fila cheia, `adicionar` bloqueia o
+    produtor (back-pressure) até o próximo flush liberar espaço; se a gravação
+    falhar, a fila só volta a ser esvaziada depois que o lote retido for gravado.
+    """
+
+    SQL_INSERT = """
+        INSERT INTO leituras_sensores (
+            sensor_id, tipo_sensor, valor, unidade, timestamp, status, ts_epoch
+        ) VALUES (?, ?, ?, ?, ?, ?, ?)
+    """
+
+    def __init__(
+        self,
+        db_path=DB_FASE3,
+        tamanho_lote: int = 500,
+        intervalo_flush: float = 2.0,
+        capacidade: int = 10000
+    ):
+        self.db_path = db_path
+        self.tamanho_lote = tamanho_lote
+        self.intervalo_flush = intervalo_flush
+        self.total_gravadas = 0
+        self.total_lotes = 0
+
+        self._fila: queue.Queue = queue.Queue(maxsize=max(capacidade, tamanho_lote))
+        self._pendentes: List[Tuple] = []
+        self._lock_flush = threading.Lock()
+        self._evento_flush = threading.Event()
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name="buffer-leituras", daemon=True)
+        self._thread.start()
+
+    def adicionar(
+        self,
+        sensor_id: str,
+        tipo_sensor: str,
+        valor: float,
+        unidade: str,
+        timestamp: str,
+        status: str = "Normal",
+        timeout: float = None
+    ):
+        """
+        Enfileira uma leitura para gravação
+
+        Bloqueia enquanto a fila estiver cheia; com `timeout`, levanta
+        queue.Full se não houver espaço dentro do prazo.
+        """
+        if self._parar.is_set():
+            raise RuntimeError("Buffer de leituras já foi fechado")
+
+        linha = (sensor_id, tipo_sensor, valor, unidade, timestamp, status, timestamp_para_epoch(timestamp))
+        self._fila.put(linha, timeout=timeout)
+        if self._fila.qsize() >= self.tamanho_lote:
+            self._evento_flush.set()
+
+    def flush(self) -> int:
+        """Grava imediatamente todas as leituras enfileiradas e retorna a quantidade"""
+        with self._lock_flush:
+            gravadas = 0
+            if self._pendentes:
+                # Lote de uma falha anterior: enquanto ele não for gravado a fila
+                # não é esvaziada, então `adicionar` continua bloqueando o
+                # produtor e a memória fica limitada a fila + um lote
+                self._gravar(self._pendentes)
+                gravadas = len(self._pendentes)
+                self._pendentes = []
+
+            linhas = []
+            while True:
+                try:
+                    linhas.append(self._fila.get_nowait())
+                except queue.Empty:
+                    break
+
+            if linhas:
+                try:
+                    self._gravar(linhas)
+                except Exception:
+                    # Mantém o lote para a próxima tentativa
+                    self._pendentes = linhas
+                    raise
+            return gravadas + len(linhas)
+
+    def _gravar(self, linhas: List[Tuple]):
+        """Grava um lote em uma única transação"""
+        with transacao(self.db_path) as conn:
+            conn.executemany(self.SQL_INSERT, linhas)
+        self.total_gravadas += len(linhas)
+        self.total_lotes += 1
+
+    def _loop(self):
+        """Thread de flush periódico"""
+        while not self._parar.is_set():
+            self._evento_flush.wait(self.intervalo_flush)
+            self._evento_flush.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Erro ao gravar lote de leituras: {e}")
+
+    def pendentes(self) -> int:
+        """Quantidade de leituras aguardando gravação"""
+        return self._fila.qsize() + len(self._pendentes)
+
+    def fechar(self):
+        """Interrompe a thread de flush e grava o que restou na fila"""
+        self._parar.set()
+        self._evento_flush.set()
+        self._thread.join()
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.fechar()
+
+
 def carregar_leituras_sensor(sensor_id: str, limite: int = 100) -> List[LeituraSensor]:
     """Carrega leituras de um sensor específico"""
     try:
-        db = DatabaseManager(DB_FASE3)
-        rows = db.fetchall("""
+        rows = consultar(DB_FASE3, """
             SELECT * FROM leituras_sensores
             WHERE sensor_id = ?
-            ORDER BY timestamp DESC
+            ORDER BY ts_epoch DESC, id DESC
             LIMIT ?
         """, (sensor_id, limite))
 
@@ -344,33 +657,249 @@ def carregar_leituras_sensor(sensor_id: str, limite: int = 100) -> List[LeituraS
             )
             leituras.append(leitura)
 
-        db.close()
         return list(reversed(leituras))  # Ordem cronológica
     except Exception as e:
         print(f"Erro ao carregar leituras: {e}")
         return []
 
 
+def carregar_leituras_sensores(sensor_ids: List[str], limite: int = 100) -> Dict[str, List[LeituraSensor]]:
+    """
+    Carrega as últimas `limite` leituras de vários sensores em uma única consulta
+
+    Usa ROW_NUMBER() particionado por sensor_id e retorna as leituras agrupadas
+    por sensor, em ordem cronológica.
+    """
+    agrupadas: Dict[str, List[LeituraSensor]] = {sensor_id: [] for sensor_id in sensor_ids}
+    if not sensor_ids:
+        return agrupadas
+
+    marcadores = ", ".join("?" for _ in sensor_ids)
+    try:
+        rows = consultar(DB_FASE3, f"""
+            SELECT sensor_id, tipo_sensor, valor, unidade, timestamp
+            FROM (
+                SELECT sensor_id, tipo_sensor, valor, unidade, timestamp, ts_epoch, id,
+                       ROW_NUMBER() OVER (
+                           PARTITION BY sensor_id
+                           ORDER BY ts_epoch DESC, id DESC
+                       ) AS posicao
+                FROM leituras_sensores
+                WHERE sensor_id IN ({marcadores})
+            )
+            WHERE posicao <= ?
+            ORDER BY sensor_id, ts_epoch, id
+        """, (*sensor_ids, limite))
+
+        for sensor_id, tipo_sensor, valor, unidade, timestamp in rows:
+            agrupadas[sensor_id].append(
+                LeituraSensor(sensor_id, tipo_sensor, valor, unidade, timestamp)
+            )
+    except Exception as e:
+        print(f"Erro ao carregar leituras: {e}")
+
+    return agrupadas
+
+
+# Retenção aplicada por aplicar_retencao: leituras brutas e agregados
+HORAS_RETENCAO_LEITURAS = 24
+DIAS_RETENCAO_AGREGADOS = 30
+
+# Janelas pré-definidas para resumos (em segundos)
+JANELAS_RESUMO = {"1h": 3600, "24h": 86400, "7d": 604800}
+
+# Máximo de intervalos agregados combinados por sensor em um resumo
+MAX_INTERVALOS_RESUMO = 200
+
+
+def resumo_agregado(janela_segundos: int, sensor_ids: List[str] = None) -> Dict[str, Dict]:
+    """
+    Resume as leituras de cada sensor na janela informada sem ler linhas brutas
+
+    Combina os intervalos de `agregados_sensores` na resolução mais fina que
+    caiba em MAX_INTERVALOS_RESUMO, contando a janela a partir da leitura mais
+    recente de cada sensor. A precisão das bordas é a da resolução escolhida.
+
+    Returns:
+        Dict sensor_id -> {contagem, media, minimo, maximo, ultimo, ultimo_epoch}
+    """
+    resolucao = RESOLUCOES_AGREGADOS[-1]
+    for candidata in RESOLUCOES_AGREGADOS:
+        if janela_segundos / candidata <= MAX_INTERVALOS_RESUMO:
+            resolucao = candidata
+            break
+
+    filtro = ""
+    params: Tuple = (resolucao,)
+    if sensor_ids:
+        filtro = f"AND sensor_id IN ({', '.join('?' for _ in sensor_ids)})"
+        params += tuple(sensor_ids)
+    params += (resolucao, janela_segundos)
+
+    try:
+        rows = consultar(DB_FASE3, f"""
+            WITH recentes AS (
+                SELECT sensor_id, MAX(ultimo_epoch) AS fim
+                FROM agregados_sensores
+                WHERE resolucao = ? {filtro}
+                GROUP BY sensor_id
+            )
+            SELECT a.sensor_id, SUM(a.contagem) AS contagem, SUM(a.soma) AS soma,
+                   MIN(a.minimo) AS minimo, MAX(a.maximo) AS maximo,
+                   (SELECT u.ultimo FROM agregados_sensores u
+                    WHERE u.sensor_id = a.sensor_id AND u.resolucao = a.resolucao
+                    ORDER BY u.bucket DESC LIMIT 1) AS ultimo,
+                   MAX(a.ultimo_epoch) AS ultimo_epoch
+            FROM agregados_sensores a
+            JOIN recentes r ON r.sensor_id = a.sensor_id
+            WHERE a.resolucao = ? AND a.bucket > r.fim - ?
+            GROUP BY a.sensor_id
+        """, params)
+    except Exception as e:
+        print(f"Erro ao carregar agregados: {e}")
+        return {}
+
+    return {
+        row['sensor_id']: {
+            "contagem": row['contagem'],
+            "media": row['soma'] / row['contagem'],
+            "minimo": row['minimo'],
+            "maximo": row['maximo'],
+            "ultimo": row['ultimo'],
+            "ultimo_epoch": row['ultimo_epoch']
+        }
+        for row in rows
+    }
+
+
+def serie_sensor(
+    sensor_id: str,
+    janela_segundos: int,
+    max_pontos: int = 500,
+    fim_epoch: int = None
+) -> pd.DataFrame:
+    """
+    Série temporal de um sensor limitada a um orçamento de pontos
+
+    Usa as leituras brutas quando a janela inteira está dentro da retenção
+    das leituras (HORAS_RETENCAO_LEITURAS) e elas cabem em `max_pontos`;
+    caso contrário, escolhe a resolução agregada mais fina (1 min, 1 h ou
+    1 dia) cujo número de intervalos na janela não ultrapassa o orçamento.
+
+    Args:
+        sensor_id: Sensor a consultar
+        janela_segundos: Tamanho da janela terminando em `fim_epoch`
+        max_pontos: Número máximo de pontos desejado no gráfico
+        fim_epoch: Fim da janela (padrão: leitura mais recente do sensor)
+
+    Returns:
+        DataFrame com timestamp, media, minimo, maximo e contagem; a
+        resolução usada (0 = leituras brutas) fica em `df.attrs["resolucao"]`
+    """
+    colunas = ["timestamp", "media", "minimo", "maximo", "contagem"]
+
+    try:
+        if fim_epoch is None:
+            fim = consultar_um(
+                DB_FASE3,
+                "SELECT MAX(ts_epoch) AS fim FROM leituras_sensores WHERE sensor_id = ?",
+                (sensor_id,)
+            )
+            fim_epoch = fim['fim'] if fim else None
+            if fim_epoch is None:
+                fim = consultar_um(DB_FASE3, """
+                    SELECT MAX(ultimo_epoch) AS fim FROM agregados_sensores
+                    WHERE sensor_id = ? AND resolucao = ?
+                """, (sensor_id, RESOLUCOES_AGREGADOS[0]))
+                fim_epoch = fim['fim'] if fim else None
+        if fim_epoch is None:
+            df = pd.DataFrame(columns=colunas)
+            df.attrs["resolucao"] = 0
+            return df
+
+        inicio_epoch = fim_epoch - janela_segundos
+
+        # Antes do horizonte de retenção só restam os agregados: contar as
+        # leituras brutas ali subestimaria a janela
+        horizonte_brutas = timestamp_para_epoch(
+            (datetime.now() - timedelta(hours=HORAS_RETENCAO_LEITURAS)).strftime("%Y-%m-%d %H:%M:%S")
+        )
+        brutas = max_pontos + 1
+        if inicio_epoch >= horizonte_brutas:
+            brutas = consultar_um(DB_FASE3, """
+                SELECT COUNT(*) AS total FROM (
+                    SELECT 1 FROM leituras_sensores
+                    WHERE sensor_id = ? AND ts_epoch > ? AND ts_epoch <= ?
+                    LIMIT ?
+                )
+            """, (sensor_id, inicio_epoch, fim_epoch, max_pontos + 1))['total']
+
+        if brutas <= max_pontos:
+            resolucao = 0
+            rows = consultar(DB_FASE3, """
+                SELECT ts_epoch AS bucket, valor AS media, valor AS minimo,
+                       valor AS maximo, 1 AS contagem
+                FROM leituras_sensores
+                WHERE sensor_id = ? AND ts_epoch > ? AND ts_epoch <= ?
+                ORDER BY ts_epoch, id
+            """, (sensor_id, inicio_epoch, fim_epoch))
+        else:
+            resolucao = RESOLUCOES_AGREGADOS[-1]
+            for candidata in RESOLUCOES_AGREGADOS:
+                if janela_segundos / candidata <= max_pontos:
+                    resolucao = candidata
+                    break
+            rows = consultar(DB_FASE3, """
+                SELECT bucket, soma / contagem AS media, minimo, maximo, contagem
+                FROM agregados_sensores
+                WHERE sensor_id = ? AND resolucao = ? AND bucket > ? AND bucket <= ?
+                ORDER BY bucket
+            """, (sensor_id, resolucao, inicio_epoch - resolucao, fim_epoch))
+    except Exception as e:
+        print(f"Erro ao carregar série do sensor: {e}")
+        rows, resolucao = [], 0
+
+    df = pd.DataFrame([tuple(row) for row in rows], columns=["bucket"] + colunas[1:])
+    df.insert(0, "timestamp", pd.to_datetime(df.pop("bucket"), unit="s"))
+    df.attrs["resolucao"] = resolucao
+    return df
+
+
+def versoes_dados() -> Dict[str, int]:
+    """
+    Retorna a versão atual de cada tabela da Fase 3
+
+    A versão aumenta a cada inserção, alteração ou remoção (via trigger), então
+    comparar com a versão anterior indica se a tabela mudou sem ler seus dados.
+    """
+    try:
+        rows = consultar(DB_FASE3, "SELECT tabela, versao FROM versoes_dados")
+        return {row['tabela']: row['versao'] for row in rows}
+    except Exception as e:
+        print(f"Erro ao carregar versões dos dados: {e}")
+        return {}
+
+
 def salvar_irrigacao(timestamp: str, motivo: str, duracao_minutos: int = None) -> bool:
     """Salva um registro de irrigação"""
     try:
-        db = DatabaseManager(DB_FASE3)
-        db.execute("""
+        executar(DB_FASE3, """
             INSERT INTO historico_irrigacao (timestamp, motivo, duracao_minutos)
             VALUES (?, ?, ?)
         """, (timestamp, motivo, duracao_minutos))
-        db.close()
         return True
     except Exception as e:
         print(f"Erro ao salvar irrigação: {e}")
+        if em_transacao(DB_FASE3):
+            # Parte de uma transação maior: quem a abriu precisa desfazê-la
+            raise
         return False
 
 
 def carregar_historico_irrigacao(limite: int = 50) -> List[Dict]:
     """Carrega histórico de irrigações"""
     try:
-        db = DatabaseManager(DB_FASE3)
-        rows = db.fetchall("""
+        rows = consultar(DB_FASE3, """
             SELECT * FROM historico_irrigacao
             ORDER BY timestamp DESC
             LIMIT ?
@@ -384,7 +913,6 @@ def carregar_historico_irrigacao(limite: int = 50) -> List[Dict]:
                 "Duração (min)": row['duracao_minutos'] or "-"
             })
 
-        db.close()
         return historico
     except Exception as e:
         print(f"Erro ao carregar histórico de irrigação: {e}")
@@ -394,24 +922,24 @@ def carregar_historico_irrigacao(limite: int = 50) -> List[Dict]:
 def salvar_alerta(titulo: str, mensagem: str, severidade: str, sensor_id: str = None) -> bool:
     """Salva um alerta no banco de dados"""
     try:
-        db = DatabaseManager(DB_FASE3)
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        db.execute("""
+        executar(DB_FASE3, """
             INSERT INTO alertas (titulo, mensagem, severidade, sensor_id, timestamp)
             VALUES (?, ?, ?, ?, ?)
         """, (titulo, mensagem, severidade, sensor_id, timestamp))
-        db.close()
         return True
     except Exception as e:
         print(f"Erro ao salvar alerta: {e}")
+        if em_transacao(DB_FASE3):
+            # Parte de uma transação maior: quem a abriu precisa desfazê-la
+            raise
         return False
 
 
 def carregar_alertas(limite: int = 20) -> List[Dict]:
     """Carrega alertas recentes do banco de dados"""
     try:
-        db = DatabaseManager(DB_FASE3)
-        rows = db.fetchall("""
+        rows = consultar(DB_FASE3, """
             SELECT * FROM alertas
             ORDER BY timestamp DESC
             LIMIT ?
@@ -427,13 +955,69 @@ def carregar_alertas(limite: int = 20) -> List[Dict]:
                 "timestamp": row['timestamp']
             })
 
-        db.close()
         return alertas
     except Exception as e:
         print(f"Erro ao carregar alertas: {e}")
         return []
 
 
+def aplicar_retencao(
+    horas: int = HORAS_RETENCAO_LEITURAS,
+    tamanho_lote: int = 2000,
+    dias_agregados: int = DIAS_RETENCAO_AGREGADOS
+) -> Dict[str, int]:
+    """
+    Remove leituras e alertas mais antigos que `horas`
+
+    Apaga por faixa indexada (ts_epoch / timestamp) em lotes pequenos, cada
+    um em sua própria transação, para que o custo seja proporcional às linhas
+    removidas e o simulador não fique bloqueado durante a limpeza. Os
+    agregados de sensores são mantidos por `dias_agregados` dias.
+    """
+    limite = datetime.now() - timedelta(hours=horas)
+    limite_epoch = timestamp_para_epoch(limite.strftime("%Y-%m-%d %H:%M:%S"))
+    limite_texto = limite.strftime("%Y-%m-%d %H:%M:%S")
+    limite_agregados = timestamp_para_epoch(
+        (datetime.now() - timedelta(days=dias_agregados)).strftime("%Y-%m-%d %H:%M:%S")
+    )
+
+    removidos = {"leituras": 0, "alertas": 0, "agregados": 0}
+    comandos = {
+        "leituras": ("""
+            DELETE FROM leituras_sensores WHERE id IN (
+                SELECT id FROM leituras_sensores
+                WHERE ts_epoch < ?
+                ORDER BY ts_epoch
+                LIMIT ?
+            )
+        """, limite_epoch),
+        "alertas": ("""
+            DELETE FROM alertas WHERE id IN (
+                SELECT id FROM alertas
+                WHERE timestamp < ?
+                ORDER BY timestamp
+                LIMIT ?
+            )
+        """, limite_texto),
+        "agregados": ("""
+            DELETE FROM agregados_sensores WHERE (sensor_id, resolucao, bucket) IN (
+                SELECT sensor_id, resolucao, bucket FROM agregados_sensores
+                WHERE bucket < ?
+                LIMIT ?
+            )
+        """, limite_agregados),
+    }
+
+    for tabela, (sql, corte) in comandos.items():
+        while True:
+            apagadas = executar(DB_FASE3, sql, (corte, tamanho_lote)).rowcount
+            removidos[tabela] += apagadas
+            if apagadas < tamanho_lote:
+                break
+
+    return removidos
+
+
 def gerar_leitura_simulada(sensor_id: str, valor_anterior: float = None, estado_irrigacao: str = "normal") -> float:
     """Gera uma leitura simulada para um sensor, simulando variações realistas"""
 
@@ -522,43 +1106,45 @@ def simular_e_salvar_leituras() -> Dict[str, Sensor]:
         except:
             pass
 
-    for sensor_id, sensor in sensores.items():
-        # Obter valor anterior para simular mudança gradual
-        valor_anterior = sensor.ultima_leitura() if sensor.leituras else None
+    # Todas as escritas do ciclo compartilham uma única transação
+    with transacao(DB_FASE3):
+        for sensor_id, sensor in sensores.items():
+            # Obter valor anterior para simular mudança gradual
+            valor_anterior = sensor.ultima_leitura() if sensor.leituras else None
 
-        # Gerar nova leitura simulada
-        novo_valor = gerar_leitura_simulada(sensor_id, valor_anterior, estado_irrigacao)
+            # Gerar nova leitura simulada
+            novo_valor = gerar_leitura_simulada(sensor_id, valor_anterior, estado_irrigacao)
 
-        # Adicionar ao sensor
-        leitura = sensor.adicionar_leitura(novo_valor, timestamp)
+            # Adicionar ao sensor
+            leitura = sensor.adicionar_leitura(novo_valor, timestamp)
 
-        # Determinar status
-        status = sensor.status()
+            # Determinar status
+            status = sensor.status()
 
-        # Salvar no banco de dados
-        salvar_leitura_sensor(leitura, status)
+            # Salvar no banco de dados
+            salvar_leitura_sensor(leitura, status)
 
-    # Verificar se deve gerar alertas
-    alertas = gerar_alertas_sensores(sensores)
-    for alerta in alertas:
-        salvar_alerta(
-            titulo=alerta['titulo'],
-            mensagem=alerta['mensagem'],
-            severidade=alerta['severidade'],
-            sensor_id=sensores["DHT22_01"].sensor_id if alerta['tipo'] == "UMIDADE_BAIXA" else None
-        )
+        # Verificar se deve gerar alertas
+        alertas = gerar_alertas_sensores(sensores)
+        for alerta in alertas:
+            salvar_alerta(
+                titulo=alerta['titulo'],
+                mensagem=alerta['mensagem'],
+                severidade=alerta['severidade'],
+                sensor_id=sensores["DHT22_01"].sensor_id if alerta['tipo'] == "UMIDADE_BAIXA" else None
+            )
 
-    # Verificar irrigação
-    umidade = sensores["DHT22_01"].ultima_leitura()
-    ph = sensores["LDR_01"].ultima_leitura()
-    fosforo = sensores["BTN_FOSFORO"].ultima_leitura() == 1
-    potassio = sensores["BTN_POTASSIO"].ultima_leitura() == 1
-    nutrientes_presentes = fosforo and potassio
+        # Verificar irrigação
+        umidade = sensores["DHT22_01"].ultima_leitura()
+        ph = sensores["LDR_01"].ultima_leitura()
+        fosforo = sensores["BTN_FOSFORO"].ultima_leitura() == 1
+        potassio = sensores["BTN_POTASSIO"].ultima_leitura() == 1
+        nutrientes_presentes = fosforo and potassio
 
-    # Se deve irrigar, salvar no banco
-    if umidade < 40 and (5.5 <= ph <= 7.5) and nutrientes_presentes:
-        motivo = f"Umidade baixa ({umidade:.1f}%), pH ideal ({ph:.2f}), nutrientes OK"
-        salvar_irrigacao(timestamp, motivo, duracao_minutos=15)
+        # Se deve irrigar, salvar no banco
+        if umidade < 40 and (5.5 <= ph <= 7.5) and nutrientes_presentes:
+            motivo = f"Umidade baixa ({umidade:.1f}%), pH ideal ({ph:.2f}), nutrientes OK"
+            salvar_irrigacao(timestamp, motivo, duracao_minutos=15)
 
     return sensores
 
@@ -605,10 +1191,10 @@ def carregar_sensores_do_banco() -> Dict[str, Sensor]:
         ),
     }
 
-    # Carregar últimas 24 leituras de cada sensor
+    # Carregar últimas 24 leituras de todos os sensores em uma consulta
+    leituras = carregar_leituras_sensores(list(sensores), limite=24)
     for sensor_id, sensor in sensores.items():
-        leituras = carregar_leituras_sensor(sensor_id, limite=24)
-        sensor.leituras = leituras
+        sensor.leituras = leituras[sensor_id]
 
     return sensores
 
@@ -618,12 +1204,10 @@ def carregar_sensores_do_banco() -> Dict[str, Sensor]:
 def adicionar_contato(nome: str, email: str, telefone: str = None) -> bool:
     """Adiciona um novo contato para notificações"""
     try:
-        db = DatabaseManager(DB_FASE3)
-        db.execute("""
+        executar(DB_FASE3, """
             INSERT INTO contatos_notificacao (nome, email, telefone)
             VALUES (?, ?, ?)
         """, (nome, email, telefone))
-        db.close()
         return True
     except Exception as e:
         print(f"Erro ao adicionar contato: {e}")
@@ -633,9 +1217,7 @@ def adicionar_contato(nome: str, email: str, telefone: str = None) -> bool:
 def remover_contato(contato_id: int) -> bool:
     """Remove um contato"""
     try:
-        db = DatabaseManager(DB_FASE3)
-        db.execute("DELETE FROM contatos_notificacao WHERE id = ?", (contato_id,))
-        db.close()
+        executar(DB_FASE3, "DELETE FROM contatos_notificacao WHERE id = ?", (contato_id,))
         return True
     except Exception as e:
         print(f"Erro ao remover contato: {e}")
@@ -645,8 +1227,7 @@ def remover_contato(contato_id: int) -> bool:
 def listar_contatos_ativos() -> List[Dict]:
     """Lista todos os contatos ativos"""
     try:
-        db = DatabaseManager(DB_FASE3)
-        rows = db.fetchall("""
+        rows = consultar(DB_FASE3, """
             SELECT * FROM contatos_notificacao
             WHERE ativo = 1
             ORDER BY nome
@@ -661,7 +1242,6 @@ def listar_contatos_ativos() -> List[Dict]:
                 "telefone": row['telefone'] or "-"
             })
 
-        db.close()
         return contatos
     except Exception as e:
         print(f"Erro ao listar contatos: {e}")
@@ -671,9 +1251,7 @@ def listar_contatos_ativos() -> List[Dict]:
 def contar_contatos_ativos() -> int:
     """Retorna o número de contatos ativos"""
     try:
-        db = DatabaseManager(DB_FASE3)
-        result = db.fetchone("SELECT COUNT(*) as total FROM contatos_notificacao WHERE ativo = 1")
-        db.close()
+        result = consultar_um(DB_FASE3, "SELECT COUNT(*) as total FROM contatos_notificacao WHERE ativo = 1")
         return result['total'] if result else 0
     except Exception as e:
         print(f"Erro ao contar contatos: {e}")
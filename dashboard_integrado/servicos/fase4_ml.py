@@ -5,11 +5,20 @@ FarmTech Solutions
 
 import pandas as pd
 import numpy as np
-from typing import Dict, List, Tuple
+from typing import Dict, List, Tuple, Union
 from datetime import datetime, timedelta
 import joblib
 import os
 
+from .recursos import obter_recurso
+
+
+def _carregar_modelo_joblib(caminho_modelo: str):
+    """Carrega o modelo do disco (executado uma vez por processo via registro de recursos)"""
+    modelo = joblib.load(caminho_modelo)
+    print(f"✅ Modelo carregado com sucesso: {caminho_modelo}")
+    return modelo
+
 
 class ModeloIrrigacao:
     """Gerencia o modelo de ML para previsão de irrigação"""
@@ -35,8 +44,12 @@ class ModeloIrrigacao:
 
         if caminho_modelo and os.path.exists(caminho_modelo):
             try:
-                self.modelo = joblib.load(caminho_modelo)
-                print(f"✅ Modelo carregado com sucesso: {caminho_modelo}")
+                # Compartilhado entre sessões; recarregado se o arquivo mudar
+                self.modelo = obter_recurso(
+                    f"modelo_irrigacao:{caminho_modelo}",
+                    lambda: _carregar_modelo_joblib(caminho_modelo),
+                    caminho=caminho_modelo
+                )
             except Exception as e:
                 print(f"⚠️ Aviso: Não foi possível carregar o modelo: {e}")
                 self.modelo = None
@@ -84,6 +97,95 @@ class ModeloIrrigacao:
             print(f"Erro ao fazer predição: {e}")
             return self._recomendacao_heuristica(fosforo, potassio, ph, umidade)
 
+    def prever_lote(self, leituras: Union[pd.DataFrame, np.ndarray]) -> pd.DataFrame:
+        """
+        Prediz a necessidade de irrigação para várias leituras de uma vez
+
+        Args:
+            leituras: DataFrame com as colunas de `feature_names` ou array
+                (n, 4) na ordem fósforo, potássio, pH, umidade
+
+        Returns:
+            DataFrame com as leituras e as colunas deve_irrigar, confianca,
+            recomendacao e motivo (uma linha por leitura)
+        """
+        if isinstance(leituras, pd.DataFrame):
+            entrada = leituras[self.feature_names].astype(float).reset_index(drop=True)
+        else:
+            entrada = pd.DataFrame(
+                np.asarray(leituras, dtype=float).reshape(-1, len(self.feature_names)),
+                columns=self.feature_names
+            )
+
+        resultado = None
+        if self.modelo is not None and len(entrada):
+            try:
+                resultado = self._prever_lote_ml(entrada)
+            except Exception as e:
+                print(f"Erro ao fazer predição em lote: {e}")
+
+        if resultado is None:
+            resultado = self._recomendacao_heuristica_lote(entrada)
+
+        return pd.concat([entrada, resultado], axis=1)
+
+    def _prever_lote_ml(self, entrada: pd.DataFrame) -> pd.DataFrame:
+        """Predição em lote com o modelo: uma única chamada a predict_proba"""
+        if hasattr(self.modelo, 'predict_proba'):
+            proba = self.modelo.predict_proba(entrada)
+            predicao = np.asarray(self.modelo.classes_)[proba.argmax(axis=1)]
+            confianca = proba.max(axis=1) * 100
+        else:
+            predicao = np.asarray(self.modelo.predict(entrada))
+            confianca = np.full(len(entrada), 100.0)
+
+        deve_irrigar = predicao == 1
+        fosforo, potassio, ph, umidade = (entrada[c].to_numpy() for c in self.feature_names)
+
+        motivo = _juntar_motivos([
+            (umidade < 30, "Umidade muito baixa"),
+            ((umidade >= 30) & (umidade < 40), "Umidade abaixo do ideal"),
+            ((ph < 5.5) | (ph > 7.5), np.char.mod("pH fora da faixa ideal (atual: %.2f)", ph)),
+            (fosforo < 0.8, "Fósforo insuficiente"),
+            (potassio < 0.8, "Potássio insuficiente"),
+        ], len(entrada), "Condições ótimas")
+
+        return pd.DataFrame({
+            "deve_irrigar": deve_irrigar,
+            "confianca": np.round(confianca, 2),
+            "recomendacao": np.where(deve_irrigar, "💧 IRRIGAÇÃO NECESSÁRIA", "✅ Não irrigar"),
+            "motivo": motivo
+        })
+
+    def _recomendacao_heuristica_lote(self, entrada: pd.DataFrame) -> pd.DataFrame:
+        """Versão vetorizada de _recomendacao_heuristica"""
+        fosforo, potassio, ph, umidade = (entrada[c].to_numpy() for c in self.feature_names)
+
+        umidade_critica = umidade < 30
+        umidade_baixa = umidade < 40
+        ph_inadequado = (ph < 5.5) | (ph > 7.5)
+        nutrientes_baixos = (fosforo < 0.8) | (potassio < 0.8)
+
+        confianca = np.select(
+            [umidade_critica, umidade_baixa & (ph_inadequado | nutrientes_baixos)],
+            [95.0, 90.0],
+            default=85.0
+        )
+
+        motivo = _juntar_motivos([
+            (umidade_baixa, np.char.mod("Umidade baixa (%.1f%%)", umidade)),
+            (ph_inadequado, np.char.mod("pH inadequado (%.2f)", ph)),
+            (fosforo < 0.8, np.char.mod("Fósforo baixo (%.2f)", fosforo)),
+            (potassio < 0.8, np.char.mod("Potássio baixo (%.2f)", potassio)),
+        ], len(entrada), "Condições ótimas - sem necessidade de irrigação")
+
+        return pd.DataFrame({
+            "deve_irrigar": umidade_baixa,
+            "confianca": confianca,
+            "recomendacao": np.where(umidade_baixa, "💧 IRRIGAÇÃO NECESSÁRIA", "✅ Não irrigar"),
+            "motivo": motivo
+        })
+
     def _recomendacao_heuristica(self, fosforo: float, potassio: float, ph: float, umidade: float) -> Dict:
         """Fornece recomendação baseada em regras heurísticas quando modelo não está disponível"""
 
@@ -157,6 +259,26 @@ class ModeloIrrigacao:
         return " | ".join(motivos)
 
 
+def _juntar_motivos(partes: List[Tuple[np.ndarray, object]], n: int, padrao: str) -> np.ndarray:
+    """
+    Monta os textos de motivo de várias leituras de forma vetorizada
+
+    Args:
+        partes: Pares (máscara booleana, texto fixo ou array de textos) na ordem de exibição
+        n: Quantidade de leituras
+        padrao: Texto usado quando nenhuma condição se aplica
+
+    Returns:
+        Array com um motivo por leitura, partes separadas por " | "
+    """
+    motivo = pd.Series([""] * n, dtype=object)
+    for condicao, texto in partes:
+        texto = pd.Series(texto, dtype=object) if isinstance(texto, np.ndarray) else texto
+        com_parte = motivo.where(motivo == "", motivo + " | ") + texto
+        motivo = com_parte.where(condicao, motivo)
+    return motivo.where(motivo != "", padrao).to_numpy()
+
+
 class AnalisadorHistoricoML:
     """Analisa histórico de predições de irrigação"""
 
@@ -236,6 +358,8 @@ def gerar_dados_exemplo_ml() -> Tuple[List[Dict], pd.DataFrame]:
     base_time = datetime.now()
     sensores_data = []
     predicoes = []
+    leituras = []
+    modelo = ModeloIrrigacao()
 
     for i in range(24):
         tempo = (base_time - timedelta(hours=24-i)).strftime("%Y-%m-%d %H:%M:%S")
@@ -260,14 +384,17 @@ def gerar_dados_exemplo_ml() -> Tuple[List[Dict], pd.DataFrame]:
             "potassio": round(potassio, 2)
         })
 
-        # Gerar predição (simulada)
-        modelo = ModeloIrrigacao()
-        pred = modelo.prever_irrigacao(fosforo, potassio, ph, umidade)
-        pred["timestamp"] = tempo
-        pred["umidade"] = round(umidade, 1)
-        pred["ph"] = round(ph, 2)
-        pred["fosforo"] = round(fosforo, 2)
-        pred["potassio"] = round(potassio, 2)
+        leituras.append([fosforo, potassio, ph, umidade])
+
+    # Gerar predições (simuladas) de todas as horas em uma única chamada
+    resultado = modelo.prever_lote(np.array(leituras))
+    colunas = ["deve_irrigar", "confianca", "recomendacao", "motivo"]
+    for dados, pred in zip(sensores_data, resultado[colunas].to_dict("records")):
+        pred["timestamp"] = dados["timestamp"]
+        pred["umidade"] = dados["umidade"]
+        pred["ph"] = dados["ph"]
+        pred["fosforo"] = dados["fosforo"]
+        pred["potassio"] = dados["potassio"]
         predicoes.append(pred)
 
     df_sensores = pd.DataFrame(sensores_data)
@@ -0,0 +1,377 @@
+"""
+Serviços da Fase 6 - Serviço de inferência YOLO fora do processo do Streamlit
+FarmTech Solutions
+
+Um pool de processos trabalhadores mantém o modelo carregado e recebe
+pedidos por uma fila local. Pedidos de várias sessões que chegam juntos
+são agrupados em lotes (uma chamada ao modelo por lote), e a inferência
+não disputa o GIL com as threads das sessões do Streamlit.
+
+    sessões -> ClienteInferencia -> fila -> despachante (agrupa) -> trabalhadores -> coletor -> sessões
+"""
+
+import atexit
+import itertools
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+def _loop_trabalhador(pedidos, respostas, indice: int, backend: Optional[str], threads: int):
+    """Processo trabalhador: carrega o modelo uma vez e atende lotes até receber None"""
+    # Limita as threads do torch/onnxruntime antes de importá-los, para que
+    # vários trabalhadores não disputem os mesmos núcleos
+    os.environ.setdefault("OMP_NUM_THREADS", str(threads))
+
+    from .fase6_yolo import DetectorYOLO
+
+    detector = DetectorYOLO(backend=backend)
+    respostas.put(("pronto", indice, detector.use_real_model and detector.model is not None))
+
+    while True:
+        lote = pedidos.get()
+        if lote is None:
+            break
+
+        inicio = time.perf_counter()
+        try:
+            resultados = []
+            inteiras = [(pid, img, conf) for pid, img, conf, mosaico in lote if mosaico is None]
+            if inteiras:
+                boxes = detector.inferir_boxes_lote(
+                    [img for _, img, _ in inteiras],
+                    min(conf for _, _, conf in inteiras)
+                )
+                resultados.extend((pid, dados) for (pid, _, _), dados in zip(inteiras, boxes))
+
+            # Mosaico já divide a imagem em lotes de tiles internamente
+            for pid, img, conf, mosaico in lote:
+                if mosaico is not None:
+                    resultados.append((pid, detector.inferir_boxes(img, conf, mosaico)))
+
+            respostas.put(("lote", indice, resultados, time.perf_counter() - inicio))
+        except Exception as e:
+            respostas.put(("erro", indice, [pid for pid, _, _, _ in lote], str(e)))
+
+
+class ServicoInferencia:
+    """
+    Pool de processos de inferência YOLO com agrupamento de pedidos
+
+    Args:
+        num_trabalhadores: Processos, cada um com uma cópia do modelo
+        tamanho_lote: Máximo de imagens por chamada ao modelo
+        espera_lote_ms: Tempo que o despachante aguarda outros pedidos para completar um lote
+        backend: Backend do DetectorYOLO nos trabalhadores (None = config.YOLO_BACKEND)
+        threads_por_trabalhador: Threads de CPU por processo (padrão: núcleos / trabalhadores)
+    """
+
+    def __init__(
+        self,
+        num_trabalhadores: int = 2,
+        tamanho_lote: int = 8,
+        espera_lote_ms: float = 15,
+        backend: Optional[str] = None,
+        threads_por_trabalhador: Optional[int] = None
+    ):
+        self.num_trabalhadores = max(1, num_trabalhadores)
+        self.tamanho_lote = max(1, tamanho_lote)
+        self.espera_lote = espera_lote_ms / 1000
+        self.backend = backend
+        self.threads_por_trabalhador = threads_por_trabalhador or max(1, (os.cpu_count() or 1) // self.num_trabalhadores)
+
+        self._contexto = mp.get_context("spawn")
+        self._pedidos: queue.Queue = queue.Queue()
+        self._futuros: Dict[int, Future] = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._processos: List = []
+        self._prontos = threading.Event()
+        self.modelo_real = False
+        self.ativo = False
+        self.encerrado_em: Optional[float] = None
+
+        self.pedidos_recebidos = 0
+        self.lotes_enviados = 0
+        self.imagens_processadas = 0
+        self.segundos_inferencia = 0.0
+        self.erros = 0
+
+    def iniciar(self, timeout: float = 60) -> bool:
+        """Sobe os processos e aguarda o modelo carregar em todos (True se o modelo real carregou)"""
+        # Fila limitada: com os trabalhadores ocupados o despachante espera e
+        # os pedidos que chegam nesse meio tempo entram no próximo lote
+        self._fila_trabalho = self._contexto.Queue(maxsize=self.num_trabalhadores * 2)
+        self._fila_respostas = self._contexto.Queue()
+
+        for indice in range(self.num_trabalhadores):
+            processo = self._contexto.Process(
+                target=_loop_trabalhador,
+                args=(self._fila_trabalho, self._fila_respostas, indice, self.backend, self.threads_por_trabalhador),
+                daemon=True
+            )
+            processo.start()
+            self._processos.append(processo)
+
+        self.ativo = True
+        self._prontos_restantes = self.num_trabalhadores
+        threading.Thread(target=self._coletar, daemon=True).start()
+        threading.Thread(target=self._despachar, daemon=True).start()
+        atexit.register(self.fechar)
+
+        limite = time.monotonic() + timeout
+        while not self._prontos.wait(0.5):
+            if any(not p.is_alive() for p in self._processos) or time.monotonic() > limite:
+                print("⚠️ Trabalhadores de inferência não ficaram prontos")
+                self.fechar()
+                return False
+        return self.modelo_real
+
+    def enviar(self, imagem: np.ndarray, confianca_minima: float, mosaico: Optional[Dict] = None) -> Future:
+        """Enfileira um pedido e retorna um Future com as boxes brutas (n, 6)"""
+        futuro: Future = Future()
+        if not self.ativo:
+            futuro.set_exception(RuntimeError("Serviço de inferência encerrado"))
+            return futuro
+
+        pid = next(self._ids)
+        with self._lock:
+            self._futuros[pid] = futuro
+            self.pedidos_recebidos += 1
+        self._pedidos.put((pid, imagem, confianca_minima, mosaico))
+        return futuro
+
+    def inferir_boxes(self, imagem: np.ndarray, confianca_minima: float,
+                      mosaico: Optional[Dict] = None, timeout: float = 60) -> np.ndarray:
+        """Versão bloqueante de enviar()"""
+        return self.enviar(imagem, confianca_minima, mosaico).result(timeout=timeout)
+
+    def _despachar(self):
+        """Agrupa pedidos próximos no tempo em lotes e os entrega aos trabalhadores"""
+        while self.ativo:
+            try:
+                primeiro = self._pedidos.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            if primeiro is None:
+                break
+
+            lote = [primeiro]
+            limite = time.monotonic() + self.espera_lote
+            while len(lote) < self.tamanho_lote:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    break
+                try:
+                    pedido = self._pedidos.get(timeout=restante)
+                except queue.Empty:
+                    break
+                if pedido is None:
+                    self.ativo = False
+                    break
+                lote.append(pedido)
+
+            # put() com prazo: se os trabalhadores morrerem com a fila cheia, o
+            # serviço é desativado e o despachante não fica preso aqui
+            while True:
+                try:
+                    self._fila_trabalho.put(lote, timeout=0.5)
+                    break
+                except queue.Full:
+                    if not self.ativo:
+                        self._falhar([pid for pid, _, _, _ in lote], "Serviço de inferência encerrado")
+                        return
+            self.lotes_enviados += 1
+
+    def _coletar(self):
+        """Recebe respostas dos trabalhadores e resolve os Futures"""
+        while True:
+            if self.ativo and self._prontos.is_set():
+                self._verificar_trabalhadores()
+            try:
+                mensagem = self._fila_respostas.get(timeout=0.5)
+            except queue.Empty:
+                if not self.ativo and not self._futuros:
+                    break
+                continue
+            except (EOFError, OSError):
+                break
+
+            tipo = mensagem[0]
+            if tipo == "pronto":
+                self.modelo_real = self.modelo_real or mensagem[2]
+                self._prontos_restantes -= 1
+                if self._prontos_restantes == 0:
+                    self._prontos.set()
+            elif tipo == "lote":
+                _, _, resultados, segundos = mensagem
+                self.imagens_processadas += len(resultados)
+                self.segundos_inferencia += segundos
+                for pid, dados in resultados:
+                    with self._lock:
+                        futuro = self._futuros.pop(pid, None)
+                    if futuro is not None:
+                        futuro.set_result(dados)
+            elif tipo == "erro":
+                _, _, pids, erro = mensagem
+                self.erros += 1
+                self._falhar(pids, erro)
+
+    def _falhar(self, pids: List[int], erro: str):
+        """Resolve os Futures dos pedidos com erro"""
+        for pid in pids:
+            with self._lock:
+                futuro = self._futuros.pop(pid, None)
+            if futuro is not None and not futuro.done():
+                futuro.set_exception(RuntimeError(erro))
+
+    def _verificar_trabalhadores(self):
+        """
+        Desativa o serviço se um trabalhador morreu (falta de memória, falha nativa)
+
+        Não há como saber quais pedidos estavam com ele, então todos os
+        pendentes falham: os clientes usam o detector local e
+        obter_servico_inferencia sobe um serviço novo após o intervalo.
+        """
+        mortos = [p for p in self._processos if not p.is_alive()]
+        if mortos:
+            codigos = ", ".join(str(p.exitcode) for p in mortos)
+            print(f"⚠️ {len(mortos)} trabalhador(es) de inferência encerrado(s) (código {codigos}); desativando o serviço")
+            self.erros += 1
+            self.ativo = False
+            with self._lock:
+                pids = list(self._futuros)
+            self._falhar(pids, "Trabalhador de inferência encerrado")
+            self.fechar()
+
+    def estatisticas(self) -> Dict:
+        """Contadores de pedidos, lotes e tempo de inferência"""
+        return {
+            "ativo": self.ativo,
+            "trabalhadores": sum(1 for p in self._processos if p.is_alive()),
+            "modelo_real": self.modelo_real,
+            "pedidos_recebidos": self.pedidos_recebidos,
+            "pendentes": len(self._futuros),
+            "lotes_enviados": self.lotes_enviados,
+            "imagens_processadas": self.imagens_processadas,
+            "imagens_por_lote": round(self.imagens_processadas / self.lotes_enviados, 2) if self.lotes_enviados else 0.0,
+            "tempo_medio_lote_ms": round(self.segundos_inferencia / self.lotes_enviados * 1000, 2) if self.lotes_enviados else 0.0,
+            "erros": self.erros,
+        }
+
+    def fechar(self):
+        """Encerra despachante e trabalhadores; pedidos pendentes falham"""
+        if not self._processos:
+            return
+        self.ativo = False
+        self.encerrado_em = time.monotonic()
+        self._pedidos.put(None)
+        for _ in self._processos:
+            try:
+                self._fila_trabalho.put(None, timeout=1)
+            except Exception:
+                pass
+        for processo in self._processos:
+            processo.join(timeout=5)
+            if processo.is_alive():
+                processo.terminate()
+        self._processos = []
+
+        with self._lock:
+            pendentes = list(self._futuros.values())
+            self._futuros.clear()
+        for futuro in pendentes:
+            if not futuro.done():
+                futuro.set_exception(RuntimeError("Serviço de inferência encerrado"))
+
+
+def _criar_servico() -> Optional[ServicoInferencia]:
+    """Sobe o serviço compartilhado, ou None se desativado ou sem modelo real"""
+    num_trabalhadores = int(os.getenv("YOLO_TRABALHADORES", "2"))
+    if num_trabalhadores <= 0:
+        return None
+
+    from .fase6_yolo import YOLO
+    if YOLO is None:
+        return None
+
+    servico = ServicoInferencia(num_trabalhadores=num_trabalhadores)
+    try:
+        if servico.iniciar():
+            print(f"✅ Serviço de inferência YOLO com {num_trabalhadores} processo(s)")
+            return servico
+    except Exception as e:
+        print(f"⚠️ Não foi possível iniciar o serviço de inferência: {e}")
+    servico.fechar()
+    return None
+
+
+# Serviço compartilhado do processo. Uma falha ao subir não fica guardada:
+# nova tentativa após INTERVALO_NOVA_TENTATIVA segundos
+INTERVALO_NOVA_TENTATIVA = 60
+_SERVICO: Optional[ServicoInferencia] = None
+_SERVICO_INICIANDO = False
+_PROXIMA_TENTATIVA = 0.0
+_SERVICO_LOCK = threading.Lock()
+
+
+def obter_servico_inferencia() -> Optional[ServicoInferencia]:
+    """
+    Serviço de inferência compartilhado por todas as sessões do processo
+
+    A sessão que o sobe espera os trabalhadores carregarem o modelo; as
+    demais recebem None nesse meio tempo (e usam o detector local) em vez
+    de ficarem bloqueadas.
+    """
+    global _SERVICO, _SERVICO_INICIANDO, _PROXIMA_TENTATIVA
+    with _SERVICO_LOCK:
+        if _SERVICO is not None:
+            if _SERVICO.ativo:
+                return _SERVICO
+            # Serviço desativado (ex.: trabalhador morreu): sobe outro após o intervalo
+            _PROXIMA_TENTATIVA = (_SERVICO.encerrado_em or time.monotonic()) + INTERVALO_NOVA_TENTATIVA
+            _SERVICO = None
+        if _SERVICO_INICIANDO or time.monotonic() < _PROXIMA_TENTATIVA:
+            return None
+        _SERVICO_INICIANDO = True
+
+    servico = None
+    try:
+        servico = _criar_servico()
+    finally:
+        with _SERVICO_LOCK:
+            _SERVICO = servico
+            _SERVICO_INICIANDO = False
+            if servico is None:
+                _PROXIMA_TENTATIVA = time.monotonic() + INTERVALO_NOVA_TENTATIVA
+    return servico
+
+
+class ClienteInferencia:
+    """
+    Cliente usado pelas páginas: envia ao serviço compartilhado e, se ele
+    não estiver disponível ou falhar, executa no detector local
+    """
+
+    def __init__(self, detector, timeout: float = 60):
+        self.detector = detector
+        self.timeout = timeout
+
+    def inferir_boxes(self, imagem: np.ndarray, confianca_minima: float, mosaico: Optional[Dict] = None) -> np.ndarray:
+        """Boxes brutas (n, 6) no mesmo formato de DetectorYOLO.inferir_boxes"""
+        # Simulação não precisa de processo separado
+        if self.detector.use_real_model and self.detector.model is not None:
+            servico = obter_servico_inferencia()
+            if servico is not None and servico.ativo:
+                try:
+                    return servico.inferir_boxes(imagem, confianca_minima, mosaico, timeout=self.timeout)
+                except Exception as e:
+                    print(f"⚠️ Serviço de inferência indisponível, usando detector local: {e}")
+
+        return self.detector.inferir_boxes(imagem, confianca_minima, mosaico)
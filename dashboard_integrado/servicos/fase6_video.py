@@ -0,0 +1,357 @@
+"""
+Serviços da Fase 6 - Detecção YOLO em vídeos e câmeras
+FarmTech Solutions
+
+Pipeline em três estágios ligados por filas limitadas:
+
+    leitura (thread) -> fila de frames -> inferência em lote -> fila de resultados -> gravação (thread)
+
+Quando a inferência não acompanha a leitura, a fila de frames enche e a
+thread de leitura fica bloqueada (backpressure), em vez de acumular frames
+em memória. O mesmo vale para a gravação no banco.
+"""
+
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+
+from .database import DB_FASE6
+from .fase6_yolo import DetectorYOLO, GeradorImagensTeste, cv2, salvar_deteccoes_lote
+
+# Marca de fim de fluxo entre os estágios
+_FIM = object()
+
+FonteVideo = Union[str, Path, int, Iterable[np.ndarray]]
+
+# Taxa assumida quando a fonte não informa FPS (câmeras, iteráveis de arrays)
+FPS_PADRAO = 30.0
+
+
+def ler_frames(
+    fonte: FonteVideo,
+    passo: int = 1,
+    max_frames: Optional[int] = None,
+    fps_padrao: float = FPS_PADRAO
+) -> Iterator[Tuple[int, float, np.ndarray]]:
+    """
+    Lê frames de um arquivo de vídeo, câmera (índice inteiro) ou iterável de arrays
+
+    Args:
+        fonte: Caminho do vídeo, índice da câmera ou iterável de frames
+        passo: Processa 1 a cada `passo` frames (os demais são pulados sem decodificar)
+        max_frames: Limite de frames lidos da fonte (None = até o fim)
+        fps_padrao: Taxa usada para calcular a posição quando a fonte não informa FPS
+
+    Yields:
+        Tuplas (índice do frame, posição em segundos desde o início, frame)
+    """
+    passo = max(1, int(passo))
+
+    if isinstance(fonte, (str, Path, int)):
+        if cv2 is None:
+            raise RuntimeError("OpenCV (cv2) é necessário para ler vídeos e câmeras")
+
+        captura = cv2.VideoCapture(fonte if isinstance(fonte, int) else str(fonte))
+        if not captura.isOpened():
+            raise RuntimeError(f"Não foi possível abrir a fonte de vídeo: {fonte}")
+
+        fps = captura.get(cv2.CAP_PROP_FPS) or 0
+        indice = 0
+        try:
+            while max_frames is None or indice < max_frames:
+                # grab() avança sem decodificar; retrieve() só nos frames usados
+                if not captura.grab():
+                    break
+                if indice % passo == 0:
+                    ok, frame = captura.retrieve()
+                    if not ok:
+                        break
+                    posicao = captura.get(cv2.CAP_PROP_POS_MSEC) / 1000 if fps else indice / fps_padrao
+                    yield indice, posicao, frame
+                indice += 1
+        finally:
+            captura.release()
+        return
+
+    for indice, frame in enumerate(fonte):
+        if max_frames is not None and indice >= max_frames:
+            break
+        if indice % passo == 0:
+            yield indice, indice / fps_padrao, frame
+
+
+def gerar_video_teste(caminho: Union[str, Path], total_frames: int = 60, fps: int = 10,
+                      largura: int = 640, altura: int = 480) -> Path:
+    """Gera um vídeo local com imagens sintéticas para testar o pipeline"""
+    if cv2 is None:
+        raise RuntimeError("OpenCV (cv2) é necessário para gerar o vídeo de teste")
+
+    caminho = Path(caminho)
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    escritor = cv2.VideoWriter(str(caminho), cv2.VideoWriter_fourcc(*"mp4v"), fps, (largura, altura))
+    try:
+        for _ in range(total_frames):
+            escritor.write(GeradorImagensTeste.gerar_imagem_aleatoria(altura, largura))
+    finally:
+        escritor.release()
+    return caminho
+
+
+class MetricaEstagio:
+    """Latência acumulada de um estágio do pipeline"""
+
+    def __init__(self):
+        self.chamadas = 0
+        self.itens = 0
+        self.segundos = 0.0
+        self.maximo = 0.0
+
+    def registrar(self, segundos: float, itens: int = 1):
+        self.chamadas += 1
+        self.itens += itens
+        self.segundos += segundos
+        self.maximo = max(self.maximo, segundos)
+
+    def resumo(self) -> Dict:
+        return {
+            "chamadas": self.chamadas,
+            "itens": self.itens,
+            "total_s": round(self.segundos, 3),
+            "media_ms": round(self.segundos / self.chamadas * 1000, 2) if self.chamadas else 0.0,
+            "por_item_ms": round(self.segundos / self.itens * 1000, 2) if self.itens else 0.0,
+            "max_ms": round(self.maximo * 1000, 2),
+        }
+
+
+class PipelineVideo:
+    """
+    Processa vídeos com o DetectorYOLO em lotes, gravando os resultados em deteccoes
+
+    Args:
+        detector: Detector usado na inferência (um novo se None)
+        db_path: Banco de destino (None para não gravar)
+        confianca_minima: Confiança mínima das detecções
+        tamanho_lote: Frames por chamada ao modelo
+        passo_frames: Processa 1 a cada N frames
+        capacidade_fila: Frames aguardando inferência antes de bloquear a leitura
+        lote_gravacao: Resultados por transação no banco
+        ao_resultado: Callback chamado com cada resultado (na thread de inferência)
+    """
+
+    def __init__(
+        self,
+        detector: Optional[DetectorYOLO] = None,
+        db_path: Optional[Path] = DB_FASE6,
+        confianca_minima: float = 0.5,
+        tamanho_lote: int = 8,
+        passo_frames: int = 1,
+        capacidade_fila: int = 32,
+        lote_gravacao: int = 50,
+        ao_resultado: Optional[Callable[[Dict], None]] = None
+    ):
+        self.detector = detector or DetectorYOLO()
+        self.db_path = db_path
+        self.confianca_minima = confianca_minima
+        self.tamanho_lote = max(1, tamanho_lote)
+        self.passo_frames = max(1, passo_frames)
+        self.capacidade_fila = max(1, capacidade_fila)
+        self.lote_gravacao = max(1, lote_gravacao)
+        self.ao_resultado = ao_resultado
+        self._parar = threading.Event()
+        self._reiniciar_metricas()
+
+    def _reiniciar_metricas(self):
+        self.metricas = {
+            "leitura": MetricaEstagio(),
+            "espera_fila": MetricaEstagio(),
+            "inferencia": MetricaEstagio(),
+            "gravacao": MetricaEstagio(),
+        }
+        self.frames_lidos = 0
+        self.frames_processados = 0
+        self.objetos_detectados = 0
+        self.resultados_gravados = 0
+        self.ocupacao_maxima_fila = 0
+        self.erros: List[str] = []
+
+    def parar(self):
+        """Interrompe o processamento em andamento (a fonte para de ser lida)"""
+        self._parar.set()
+
+    def _colocar(self, fila: queue.Queue, item, metrica: Optional[MetricaEstagio] = None) -> bool:
+        """put() bloqueante que desiste se o pipeline for parado"""
+        inicio = time.perf_counter()
+        while not self._parar.is_set():
+            try:
+                fila.put(item, timeout=0.1)
+                if metrica is not None:
+                    metrica.registrar(time.perf_counter() - inicio)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _ler(self, fonte: FonteVideo, max_frames: Optional[int], fila: queue.Queue):
+        """Estágio 1: lê frames e os coloca na fila (bloqueia se a fila estiver cheia)"""
+        try:
+            frames = ler_frames(fonte, self.passo_frames, max_frames)
+            while not self._parar.is_set():
+                inicio = time.perf_counter()
+                item = next(frames, None)
+                if item is None:
+                    break
+                self.metricas["leitura"].registrar(time.perf_counter() - inicio)
+                self.frames_lidos += 1
+                if not self._colocar(fila, item, self.metricas["espera_fila"]):
+                    break
+                self.ocupacao_maxima_fila = max(self.ocupacao_maxima_fila, fila.qsize())
+        except Exception as e:
+            self.erros.append(f"leitura: {e}")
+            print(f"Erro na leitura do vídeo: {e}")
+        finally:
+            # A marca de fim sempre chega, mesmo com a fila cheia
+            fila.put(_FIM)
+
+    def _gravar(self, fila: queue.Queue):
+        """Estágio 3: grava os resultados no banco em lotes"""
+        pendentes: List[Dict] = []
+        falhou = False
+
+        def descarregar():
+            nonlocal falhou
+            if not pendentes:
+                return
+            inicio = time.perf_counter()
+            try:
+                gravados = salvar_deteccoes_lote(pendentes, self.db_path, self.lote_gravacao)
+            except Exception as e:
+                # A thread continua consumindo a fila até _FIM, senão quem
+                # produz resultados ficaria bloqueado na fila cheia
+                falhou = True
+                self.erros.append(f"gravação: {e}")
+                print(f"Erro na gravação das detecções do vídeo: {e}")
+                self.parar()
+                gravados = 0
+            self.resultados_gravados += gravados
+            if gravados < len(pendentes) and not falhou:
+                self.erros.append(f"gravação: {len(pendentes) - gravados} resultados não gravados")
+            self.metricas["gravacao"].registrar(time.perf_counter() - inicio, len(pendentes))
+            pendentes.clear()
+
+        while True:
+            item = fila.get()
+            if item is _FIM:
+                break
+            if falhou:
+                continue
+            pendentes.append(item)
+            if len(pendentes) >= self.lote_gravacao:
+                descarregar()
+        if not falhou:
+            descarregar()
+
+    def _inferir(self, lote: List[Tuple[int, float, np.ndarray]], fila_gravacao: Optional[queue.Queue]):
+        """Estágio 2: uma chamada ao modelo para o lote inteiro"""
+        inicio = time.perf_counter()
+        boxes = self.detector.inferir_boxes_lote([frame for _, _, frame in lote], self.confianca_minima)
+        self.metricas["inferencia"].registrar(time.perf_counter() - inicio, len(lote))
+
+        for (indice, posicao, _), dados in zip(lote, boxes):
+            resultado = self.detector.detectar_de_boxes(dados, self.confianca_minima)
+            resultado["frame"] = indice
+            resultado["posicao_s"] = round(posicao, 3)
+            self.frames_processados += 1
+            self.objetos_detectados += resultado["total_objetos"]
+
+            if self.ao_resultado is not None:
+                self.ao_resultado(resultado)
+            if fila_gravacao is not None:
+                # Sem cópia das detecções: o dict não é mais alterado depois daqui
+                self._colocar(fila_gravacao, resultado)
+
+    def processar(self, fonte: FonteVideo, max_frames: Optional[int] = None) -> Dict:
+        """
+        Processa um vídeo, câmera ou iterável de frames até o fim (ou até parar())
+
+        Returns:
+            Métricas do processamento (ver estatisticas())
+        """
+        self._parar.clear()
+        self._reiniciar_metricas()
+        inicio = time.perf_counter()
+
+        fila_frames: queue.Queue = queue.Queue(maxsize=self.capacidade_fila)
+        leitor = threading.Thread(target=self._ler, args=(fonte, max_frames, fila_frames), daemon=True)
+        leitor.start()
+
+        fila_gravacao: Optional[queue.Queue] = None
+        gravador = None
+        if self.db_path is not None:
+            fila_gravacao = queue.Queue(maxsize=self.lote_gravacao * 4)
+            gravador = threading.Thread(target=self._gravar, args=(fila_gravacao,), daemon=True)
+            gravador.start()
+
+        try:
+            lote: List[Tuple[int, float, np.ndarray]] = []
+            fim = False
+            while not fim:
+                item = fila_frames.get()
+                if item is _FIM:
+                    fim = True
+                else:
+                    lote.append(item)
+                    # Completa o lote com o que já estiver na fila, sem esperar
+                    while len(lote) < self.tamanho_lote:
+                        try:
+                            item = fila_frames.get_nowait()
+                        except queue.Empty:
+                            break
+                        if item is _FIM:
+                            fim = True
+                            break
+                        lote.append(item)
+
+                if lote and (len(lote) >= self.tamanho_lote or fim or fila_frames.empty()):
+                    self._inferir(lote, fila_gravacao)
+                    lote = []
+        except Exception as e:
+            self.erros.append(f"inferência: {e}")
+            print(f"Erro na inferência do vídeo: {e}")
+            self._parar.set()
+        finally:
+            self._parar.set()
+            # Esvazia a fila para liberar a thread de leitura, se estiver bloqueada
+            while leitor.is_alive():
+                try:
+                    fila_frames.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            leitor.join()
+
+            if gravador is not None:
+                fila_gravacao.put(_FIM)
+                gravador.join()
+
+        self.tempo_total = time.perf_counter() - inicio
+        return self.estatisticas()
+
+    def estatisticas(self) -> Dict:
+        """Contadores, vazão e latência por estágio do último processamento"""
+        tempo_total = getattr(self, "tempo_total", 0.0)
+        return {
+            "frames_lidos": self.frames_lidos,
+            "frames_processados": self.frames_processados,
+            "passo_frames": self.passo_frames,
+            "objetos_detectados": self.objetos_detectados,
+            "resultados_gravados": self.resultados_gravados,
+            "tempo_total_s": round(tempo_total, 3),
+            "frames_por_segundo": round(self.frames_processados / tempo_total, 2) if tempo_total else 0.0,
+            "ocupacao_maxima_fila": self.ocupacao_maxima_fila,
+            "capacidade_fila": self.capacidade_fila,
+            "estagios": {nome: metrica.resumo() for nome, metrica in self.metricas.items()},
+            "erros": list(self.erros),
+        }
@@ -3,8 +3,13 @@ Serviços da Fase 6 - Vision Computacional com YOLO
 FarmTech Solutions
 """
 
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict, deque
 import numpy as np
-from typing import Dict, List, Tuple, Optional
+from typing import Callable, Dict, Iterable, Iterator, List, Tuple, Optional, Union
 from datetime import datetime
 import base64
 from io import BytesIO
@@ -25,20 +30,583 @@ try:
 except ImportError:
     YOLO = None
 
+from .database import DB_FASE6, init_fase6_db, consultar, transacao
+from .recursos import obter_recurso
+
+
+# Pasta com os pesos do melhor modelo (100 épocas com labels corrigidas) e os
+# artefatos exportados por fases/fase_6_cap_1/exportar_modelo.py
+PASTA_PESOS_YOLO = Path(__file__).parent.parent.parent / "fases" / "fase_6_cap_1" / "runs" / "detect" / "train_100epochs_corrigido" / "weights"
+
+# Backends de inferência: arquivo de pesos usado por cada um
+ARQUIVOS_BACKEND_YOLO = {
+    "pt": "best.pt",
+    "onnx": "best.onnx",
+    "onnx_int8": "best_int8.onnx",
+}
+
+
+def resolver_pesos_yolo(backend: str = "auto", pasta: Path = PASTA_PESOS_YOLO) -> Tuple[str, Path]:
+    """
+    Escolhe o arquivo de pesos para o backend pedido
+
+    Args:
+        backend: "pt" (PyTorch), "onnx", "onnx_int8" ou "auto" (ONNX se o
+            artefato exportado e o onnxruntime estiverem disponíveis, senão .pt)
+        pasta: Pasta com best.pt e os artefatos exportados
+
+    Returns:
+        Tupla (backend efetivo, caminho dos pesos)
+    """
+    if backend == "auto":
+        backend = "pt"
+        motivo = f"{ARQUIVOS_BACKEND_YOLO['onnx']} não encontrado"
+        if (pasta / ARQUIVOS_BACKEND_YOLO["onnx"]).exists():
+            try:
+                import onnxruntime  # noqa: F401
+                backend = "onnx"
+                motivo = "artefato ONNX e onnxruntime disponíveis"
+            except ImportError:
+                motivo = "onnxruntime não instalado"
+        print(f"🔧 Backend YOLO 'auto' selecionou '{backend}' ({motivo})")
+
+    if backend not in ARQUIVOS_BACKEND_YOLO:
+        raise ValueError(f"Backend YOLO desconhecido: '{backend}'")
+
+    return backend, pasta / ARQUIVOS_BACKEND_YOLO[backend]
+
+
+def _carregar_pesos_yolo(model_path: str):
+    """Carrega os pesos do YOLO (executado uma vez por processo via registro de recursos)"""
+    print(f"📦 Carregando modelo YOLO...")
+    # task explícita: artefatos ONNX nem sempre trazem a tarefa nos metadados
+    model = YOLO(model_path, task="detect")
+    print(f"✅ Modelo YOLO carregado com sucesso: {model_path}")
+    return model
+
+
+# Uma trava por arquivo de pesos: o mesmo modelo é compartilhado por todas as
+# sessões e o predict do ultralytics não é seguro para chamadas concorrentes
+_TRAVAS_MODELOS: Dict[str, threading.Lock] = {}
+_TRAVAS_MODELOS_LOCK = threading.Lock()
+
+
+def _trava_modelo(model_path: str) -> threading.Lock:
+    """Trava que serializa as predições do modelo compartilhado em `model_path`"""
+    with _TRAVAS_MODELOS_LOCK:
+        return _TRAVAS_MODELOS.setdefault(model_path, threading.Lock())
+
+
+_BANCOS_INICIALIZADOS = set()
+
+
+def _garantir_banco(db_path: Path):
+    """Cria tabelas e índices da Fase 6 no banco informado, uma vez por processo"""
+    if db_path not in _BANCOS_INICIALIZADOS:
+        init_fase6_db(db_path)
+        _BANCOS_INICIALIZADOS.add(db_path)
+
+
+def _inserir_deteccoes(conn, resultados: List[Dict]):
+    """Insere análises e todos os seus objetos na transação atual"""
+    objetos = []
+    for resultado in resultados:
+        cursor = conn.execute("""
+            INSERT INTO deteccoes (timestamp, total_objetos, confianca_media, modo_deteccao)
+            VALUES (?, ?, ?, ?)
+        """, (resultado['timestamp'], resultado['total_objetos'],
+              float(resultado['confianca_media']), resultado.get('modo', 'Desconhecido')))
+        deteccao_id = cursor.lastrowid
+
+        objetos.extend(
+            (deteccao_id, det['classe'], det.get('classe_original', det['classe']),
+             det.get('classe_id', 0), det['confianca'],
+             det['bbox'].get('x', 0), det['bbox'].get('y', 0),
+             det['bbox'].get('width', 0), det['bbox'].get('height', 0),
+             det.get('area_pixels', 0))
+            for det in resultado['deteccoes']
+        )
+
+    conn.executemany("""
+        INSERT INTO objetos_detectados
+        (deteccao_id, classe, classe_original, classe_id, confianca,
+         bbox_x, bbox_y, bbox_width, bbox_height, area_pixels)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, objetos)
+
+
+def salvar_deteccao(resultado: Dict, db_path: Path = DB_FASE6) -> bool:
+    """
+    Salva uma análise e seus objetos detectados em uma única transação
+
+    Args:
+        resultado: Dict retornado por detectar_objetos/detectar_lote
+        db_path: Banco de dados de destino
+
+    Returns:
+        True se salvou com sucesso
+    """
+    return salvar_deteccoes_lote([resultado], db_path) == 1
+
+
+def salvar_deteccoes_lote(resultados: List[Dict], db_path: Path = DB_FASE6, tamanho_lote: int = 100) -> int:
+    """
+    Salva várias análises, `tamanho_lote` imagens por transação
+
+    Args:
+        resultados: Lista de dicts retornados por detectar_objetos/detectar_lote
+        db_path: Banco de dados de destino
+        tamanho_lote: Quantidade de imagens gravadas por transação
+
+    Returns:
+        Quantidade de análises gravadas (lotes com erro são descartados inteiros)
+    """
+    return len(resultados) - len(_gravar_em_lotes(resultados, db_path, tamanho_lote))
+
+
+def _gravar_em_lotes(resultados: List[Dict], db_path: Path, tamanho_lote: int) -> List[Dict]:
+    """Grava as análises em transações de `tamanho_lote` e retorna as que não foram gravadas"""
+    try:
+        _garantir_banco(db_path)
+    except Exception as e:
+        print(f"Erro ao inicializar banco de detecções: {e}")
+        return list(resultados)
+
+    nao_gravadas: List[Dict] = []
+    for inicio in range(0, len(resultados), max(1, tamanho_lote)):
+        lote = resultados[inicio:inicio + tamanho_lote]
+        try:
+            with transacao(db_path) as conn:
+                _inserir_deteccoes(conn, lote)
+        except Exception as e:
+            print(f"Erro ao salvar detecções no banco: {e}")
+            nao_gravadas.extend(lote)
+
+    return nao_gravadas
+
+
+def carregar_deteccoes_db(limite: int = 50, db_path: Path = DB_FASE6) -> List[Dict]:
+    """Carrega as análises mais recentes do banco com seus objetos detectados"""
+    try:
+        _garantir_banco(db_path)
+        deteccoes = [dict(row) for row in consultar(db_path, """
+            SELECT id, timestamp, total_objetos, confianca_media, modo_deteccao
+            FROM deteccoes
+            ORDER BY id DESC
+            LIMIT ?
+        """, (limite,))]
+        if not deteccoes:
+            return []
+
+        por_id = {d['id']: d for d in deteccoes}
+        for d in deteccoes:
+            d['deteccoes'] = []
+
+        marcadores = ",".join("?" * len(por_id))
+        for row in consultar(db_path, f"""
+            SELECT deteccao_id, classe, classe_original, classe_id, confianca,
+                   bbox_x, bbox_y, bbox_width, bbox_height, area_pixels
+            FROM objetos_detectados
+            WHERE deteccao_id IN ({marcadores})
+            ORDER BY id
+        """, tuple(por_id)):
+            por_id[row['deteccao_id']]['deteccoes'].append({
+                "classe": row['classe'],
+                "classe_original": row['classe_original'],
+                "classe_id": row['classe_id'],
+                "confianca": row['confianca'],
+                "bbox": {
+                    "x": row['bbox_x'],
+                    "y": row['bbox_y'],
+                    "width": row['bbox_width'],
+                    "height": row['bbox_height']
+                },
+                "area_pixels": row['area_pixels']
+            })
+
+        return deteccoes
+    except Exception as e:
+        print(f"Erro ao carregar detecções: {e}")
+        return []
+
+
+def contar_objetos_por_classe_db(db_path: Path = DB_FASE6) -> Dict[str, int]:
+    """Total de objetos detectados por classe em todo o histórico gravado"""
+    try:
+        _garantir_banco(db_path)
+        return {
+            row['classe']: row['total']
+            for row in consultar(db_path, """
+                SELECT classe, COUNT(*) AS total
+                FROM objetos_detectados
+                GROUP BY classe
+                ORDER BY total DESC
+            """)
+        }
+    except Exception as e:
+        print(f"Erro ao contar objetos por classe: {e}")
+        return {}
+
+
+def gerar_tiles(altura: int, largura: int, tamanho_tile: int = 640, sobreposicao: float = 0.2) -> List[Tuple[int, int]]:
+    """
+    Calcula as origens (x, y) dos tiles que cobrem a imagem inteira
+
+    Tiles vizinhos se sobrepõem em `sobreposicao` do tamanho do tile e o
+    último tile de cada eixo é alinhado à borda da imagem.
+    """
+    passo = max(1, int(tamanho_tile * (1 - sobreposicao)))
+
+    def inicios(tamanho: int) -> List[int]:
+        if tamanho <= tamanho_tile:
+            return [0]
+        valores = list(range(0, tamanho - tamanho_tile, passo))
+        valores.append(tamanho - tamanho_tile)
+        return valores
+
+    return [(x, y) for y in inicios(altura) for x in inicios(largura)]
+
+
+def nms_vetorizado(
+    caixas: np.ndarray,
+    scores: np.ndarray,
+    classes: Optional[np.ndarray] = None,
+    limiar: float = 0.5,
+    criterio: str = "iou"
+) -> np.ndarray:
+    """
+    Supressão de não-máximos com a sobreposição calculada em NumPy
+
+    Args:
+        caixas: Array (n, 4) com x1, y1, x2, y2
+        scores: Array (n,) de confianças
+        classes: Array (n,) de classes; se informado, só suprime boxes da mesma classe
+        limiar: Sobreposição acima da qual a box de menor score é descartada
+        criterio: "iou" (interseção sobre união) ou "ios" (interseção sobre a menor área)
+
+    Returns:
+        Índices das boxes mantidas, em ordem decrescente de score
+    """
+    if len(caixas) == 0:
+        return np.empty(0, dtype=int)
+
+    caixas = caixas.astype(np.float64)
+    if classes is not None:
+        # Desloca cada classe para uma região disjunta: boxes de classes diferentes nunca se sobrepõem
+        caixas = caixas + (caixas.max() + 1) * np.asarray(classes, dtype=np.float64)[:, None]
+
+    x1, y1, x2, y2 = caixas[:, 0], caixas[:, 1], caixas[:, 2], caixas[:, 3]
+    areas = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    # Maior score primeiro; em empate, a maior box (ex.: a inteira em vez da cortada pelo tile)
+    ordem = np.lexsort((-areas, -np.asarray(scores, dtype=np.float64)))
+
+    manter = []
+    while len(ordem):
+        i = ordem[0]
+        manter.append(i)
+        resto = ordem[1:]
+
+        largura = np.clip(np.minimum(x2[i], x2[resto]) - np.maximum(x1[i], x1[resto]), 0, None)
+        altura = np.clip(np.minimum(y2[i], y2[resto]) - np.maximum(y1[i], y1[resto]), 0, None)
+        intersecao = largura * altura
+        if criterio == "ios":
+            base = np.minimum(areas[i], areas[resto])
+        else:
+            base = areas[i] + areas[resto] - intersecao
+        sobreposicao = intersecao / np.maximum(base, 1e-9)
+
+        ordem = resto[sobreposicao <= limiar]
+
+    return np.array(manter, dtype=int)
+
+
+def filtrar_boxes(dados: np.ndarray, confianca_minima: float) -> np.ndarray:
+    """Mantém as boxes brutas (n, 6) com confiança >= confianca_minima"""
+    if len(dados) == 0:
+        return dados
+    return dados[dados[:, 4] >= confianca_minima]
+
+
+def hash_conteudo(dados: bytes) -> str:
+    """Chave de cache de uma imagem a partir do conteúdo do arquivo"""
+    return hashlib.blake2b(dados, digest_size=16).hexdigest()
+
+
+def decodificar_imagem(dados: bytes) -> Optional[np.ndarray]:
+    """Decodifica bytes de JPEG/PNG em array numpy (BGR com cv2, RGB sem cv2)"""
+    if cv2 is not None:
+        return cv2.imdecode(np.frombuffer(dados, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if Image is not None:
+        try:
+            return np.array(Image.open(BytesIO(dados)).convert("RGB"))
+        except Exception:
+            return None
+    return None
+
+
+class CacheImagens:
+    """
+    Cache LRU de imagens decodificadas e boxes brutas, limitado em bytes
+
+    Cada entrada é indexada pelo hash do conteúdo do arquivo e guarda o
+    array decodificado (somente leitura, compartilhado sem cópia) e as
+    boxes brutas por variante de inferência (modelo, imagem inteira ou
+    mosaico). Boxes inferidas com limiar de confiança c servem qualquer
+    limiar >= c apenas refiltrando; as entradas menos usadas são
+    descartadas quando o total passa de `orcamento_bytes`.
+    """
+
+    def __init__(self, orcamento_bytes: int = 256 * 1024 * 1024):
+        self.orcamento_bytes = orcamento_bytes
+        self._entradas: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes_usados = 0
+        self.acertos_imagem = 0
+        self.faltas_imagem = 0
+        self.acertos_boxes = 0
+        self.faltas_boxes = 0
+        self.descartes = 0
+
+    def _entrada(self, chave: str) -> Dict:
+        entrada = self._entradas.get(chave)
+        if entrada is None:
+            entrada = {"imagem": None, "boxes": {}, "bytes": 0}
+            self._entradas[chave] = entrada
+        self._entradas.move_to_end(chave)
+        return entrada
+
+    def _atualizar_bytes(self, entrada: Dict, delta: int):
+        entrada["bytes"] += delta
+        self.bytes_usados += delta
+        # Descarta as menos usadas, preservando a entrada mais recente
+        while self.bytes_usados > self.orcamento_bytes and len(self._entradas) > 1:
+            _, antiga = self._entradas.popitem(last=False)
+            self.bytes_usados -= antiga["bytes"]
+            self.descartes += 1
+
+    def imagem(self, chave: str, decodificar: Callable[[], Optional[np.ndarray]]) -> Optional[np.ndarray]:
+        """Retorna a imagem decodificada do cache ou decodifica e guarda"""
+        with self._lock:
+            entrada = self._entrada(chave)
+            if entrada["imagem"] is not None:
+                self.acertos_imagem += 1
+                return entrada["imagem"]
+
+        self.faltas_imagem += 1
+        imagem = decodificar()
+        if imagem is None:
+            return None
+        imagem.flags.writeable = False
+
+        with self._lock:
+            entrada = self._entrada(chave)
+            if entrada["imagem"] is None:
+                entrada["imagem"] = imagem
+                self._atualizar_bytes(entrada, imagem.nbytes)
+            return entrada["imagem"]
+
+    def boxes(
+        self,
+        chave: str,
+        variante: str,
+        confianca_minima: float,
+        inferir: Callable[[float], np.ndarray]
+    ) -> np.ndarray:
+        """
+        Retorna boxes brutas que cobrem `confianca_minima`, inferindo só se necessário
+
+        Args:
+            chave: Hash do conteúdo da imagem
+            variante: Identifica modelo e modo de inferência
+            confianca_minima: Limiar desejado (o chamador filtra as boxes)
+            inferir: Função que recebe o limiar e executa o modelo
+
+        Returns:
+            Array (n, 6) inferido com limiar <= confianca_minima
+        """
+        with self._lock:
+            guardado = self._entrada(chave)["boxes"].get(variante)
+            if guardado is not None and guardado[0] <= confianca_minima:
+                self.acertos_boxes += 1
+                return guardado[1]
+
+        self.faltas_boxes += 1
+        dados = inferir(confianca_minima)
+
+        with self._lock:
+            entrada = self._entrada(chave)
+            anterior = entrada["boxes"].get(variante)
+            entrada["boxes"][variante] = (confianca_minima, dados)
+            self._atualizar_bytes(entrada, dados.nbytes - (anterior[1].nbytes if anterior else 0))
+        return dados
+
+    def limpar(self):
+        with self._lock:
+            self._entradas.clear()
+            self.bytes_usados = 0
+
+    def estatisticas(self) -> Dict:
+        """Ocupação e taxas de acerto do cache"""
+        return {
+            "entradas": len(self._entradas),
+            "mb_usados": round(self.bytes_usados / (1024 * 1024), 2),
+            "mb_orcamento": round(self.orcamento_bytes / (1024 * 1024), 2),
+            "acertos_imagem": self.acertos_imagem,
+            "faltas_imagem": self.faltas_imagem,
+            "acertos_boxes": self.acertos_boxes,
+            "faltas_boxes": self.faltas_boxes,
+            "descartes": self.descartes,
+        }
+
+
+def obter_cache_imagens() -> CacheImagens:
+    """Cache de imagens compartilhado entre as sessões do processo"""
+    return obter_recurso("cache_imagens_yolo", CacheImagens)
+
+
+class HistoricoDeteccoes:
+    """
+    Histórico limitado de análises com agregados mantidos na inserção
+
+    Guarda apenas as `capacidade` análises mais recentes (com detalhes),
+    mas as contagens por classe, somas de confiança e objetos por imagem
+    cobrem todas as análises já registradas, de modo que estatísticas e
+    relatórios não precisam percorrer o histórico. Se `db_path` for
+    informado, as análises que saem da janela são gravadas nas tabelas
+    deteccoes/objetos_detectados em lotes de `lote_gravacao`.
+    """
+
+    def __init__(self, capacidade: int = 500, db_path: Optional[Path] = None, lote_gravacao: int = 50):
+        self.capacidade = capacidade
+        self.db_path = db_path
+        self.lote_gravacao = lote_gravacao
+        self._analises: deque = deque(maxlen=capacidade)
+        self._pendentes_gravacao: List[Dict] = []
+        self.total_gravadas = 0
+        self.limpar_agregados()
+
+    def limpar_agregados(self):
+        """Zera os agregados (sem afetar o que já foi gravado no banco)"""
+        self.total_analises = 0
+        self.soma_objetos = 0
+        self.soma_confianca_media = 0.0
+        self.soma_confianca_objetos = 0.0
+        self.contagem_classes: Dict[str, int] = {}
+        self.contagem_classes_originais: Dict[str, int] = {}
+        self.soma_confianca_classes: Dict[str, float] = {}
+
+    def limpar(self):
+        """Descarta análises e agregados"""
+        self._analises.clear()
+        self.limpar_agregados()
+
+    def append(self, resultado: Dict):
+        """Registra uma análise e atualiza os agregados"""
+        if self.db_path is not None and len(self._analises) == self.capacidade:
+            self._pendentes_gravacao.append(self._analises[0])
+            if len(self._pendentes_gravacao) >= self.lote_gravacao:
+                self.gravar_pendentes()
+
+        self._analises.append(resultado)
+
+        self.total_analises += 1
+        self.soma_objetos += resultado['total_objetos']
+        self.soma_confianca_media += float(resultado['confianca_media'])
+        for det in resultado['deteccoes']:
+            classe = det['classe']
+            original = det.get('classe_original', classe)
+            self.contagem_classes[classe] = self.contagem_classes.get(classe, 0) + 1
+            self.contagem_classes_originais[original] = self.contagem_classes_originais.get(original, 0) + 1
+            self.soma_confianca_classes[classe] = self.soma_confianca_classes.get(classe, 0.0) + det['confianca']
+            self.soma_confianca_objetos += det['confianca']
+
+    def extend(self, resultados: Iterable[Dict]):
+        for resultado in resultados:
+            self.append(resultado)
+
+    def gravar_pendentes(self) -> int:
+        """Grava no banco as análises que saíram da janela e ainda não foram gravadas"""
+        if self.db_path is None or not self._pendentes_gravacao:
+            return 0
+
+        # Só saem da fila as análises gravadas; as de lotes com erro ficam para a próxima vez
+        nao_gravadas = _gravar_em_lotes(self._pendentes_gravacao, self.db_path, self.lote_gravacao)
+        gravadas = len(self._pendentes_gravacao) - len(nao_gravadas)
+        self.total_gravadas += gravadas
+        self._pendentes_gravacao = nao_gravadas
+        return gravadas
+
+    def colunas(self) -> Dict[str, np.ndarray]:
+        """Objetos e confiança média por imagem das análises em memória, como arrays"""
+        return {
+            "total_objetos": np.fromiter((a['total_objetos'] for a in self._analises), dtype=np.int32, count=len(self._analises)),
+            "confianca_media": np.fromiter((a['confianca_media'] for a in self._analises), dtype=np.float64, count=len(self._analises)),
+        }
+
+    @property
+    def media_objetos(self) -> float:
+        return self.soma_objetos / self.total_analises if self.total_analises else 0.0
+
+    @property
+    def confianca_media(self) -> float:
+        return self.soma_confianca_media / self.total_analises if self.total_analises else 0.0
+
+    @property
+    def confianca_media_objetos(self) -> float:
+        return self.soma_confianca_objetos / self.soma_objetos if self.soma_objetos else 0.0
+
+    def __len__(self) -> int:
+        return len(self._analises)
+
+    def __iter__(self):
+        return iter(self._analises)
+
+    def __getitem__(self, indice):
+        if isinstance(indice, slice):
+            return list(self._analises)[indice]
+        return self._analises[indice]
+
+
+def _ler_imagem(caminho: str) -> Optional[np.ndarray]:
+    """Lê uma imagem do disco como array numpy (None se não for possível)"""
+    if cv2 is not None:
+        return cv2.imread(caminho)
+    if Image is not None:
+        try:
+            return np.array(Image.open(caminho).convert("RGB"))
+        except Exception:
+            return None
+    return None
+
+
+def listar_imagens_pasta(pasta: Union[str, Path], extensoes: Tuple[str, ...] = (".jpg", ".jpeg", ".png", ".bmp")) -> List[Path]:
+    """Lista, em ordem, os arquivos de imagem de uma pasta para uso com detectar_lote"""
+    return sorted(p for p in Path(pasta).iterdir() if p.suffix.lower() in extensoes)
+
 
 class DetectorYOLO:
     """Detector YOLO real integrado com modelo treinado"""
 
-    def __init__(self, model_path: Optional[str] = None, use_real_model: bool = True):
+    CONFIANCA_PISO = 0.25
+
+    def __init__(self, model_path: Optional[str] = None, use_real_model: bool = True, backend: Optional[str] = None):
         """
         Inicializa o detector YOLO
 
         Args:
-            model_path: Caminho para o modelo .pt treinado
+            model_path: Caminho para o modelo treinado (.pt ou .onnx); se
+                informado, tem precedência sobre o backend
             use_real_model: Se True, usa modelo YOLO real. Se False, usa simulação
+            backend: "pt", "onnx", "onnx_int8" ou "auto" (padrão:
+                config.YOLO_BACKEND, definido pela variável de ambiente)
         """
+        from config import YOLO_BACKEND
+
         self.use_real_model = use_real_model and YOLO is not None
         self.model = None
+        self.model_path: Optional[str] = None
+        self._trava_predicao: Optional[threading.Lock] = None
+        self.backend = backend or YOLO_BACKEND
 
         # Classes do modelo treinado (cat/dog)
         self.classes = ["cat", "dog"]
@@ -49,21 +617,39 @@ class DetectorYOLO:
             "dog": "Cachorro 🐶"
         }
 
-        self.historico_deteccoes: List[Dict] = []
+        self.historico_deteccoes = HistoricoDeteccoes()
+
+        # Limiar usado na inferência: qualquer confiança mínima acima dele é
+        # atendida filtrando as boxes brutas guardadas, sem rodar o modelo
+        self.confianca_piso = self.CONFIANCA_PISO
+        self.ultimas_boxes = np.empty((0, 6), dtype=np.float32)
+
+        # Vazão da última chamada a detectar_lote
+        self.vazao_lote: Dict = {"imagens": 0, "segundos": 0.0, "imagens_por_segundo": 0.0}
 
         # Tentar carregar modelo real
         if self.use_real_model:
             if model_path is None:
-                # Caminho padrão para o melhor modelo (100 épocas com labels corrigidas)
-                base_path = Path(__file__).parent.parent.parent
-                model_path = base_path / "fases" / "fase_6_cap_1" / "runs" / "detect" / "train_100epochs_corrigido" / "weights" / "best.pt"
-                print(f"🔍 Procurando modelo em: {model_path}")
+                # Caminho padrão: melhor modelo no formato do backend escolhido
+                try:
+                    self.backend, model_path = resolver_pesos_yolo(self.backend)
+                except ValueError as e:
+                    print(f"⚠️ {e} - usando PyTorch (.pt)")
+                    self.backend, model_path = resolver_pesos_yolo("pt")
+                print(f"🔍 Procurando modelo em: {model_path} (backend: {self.backend})")
+            else:
+                self.backend = "onnx" if str(model_path).endswith(".onnx") else "pt"
 
             if Path(model_path).exists():
                 try:
-                    print(f"📦 Carregando modelo YOLO...")
-                    self.model = YOLO(str(model_path))
-                    print(f"✅ Modelo YOLO carregado com sucesso: {model_path}")
+                    # Pesos compartilhados entre sessões; recarregados se o arquivo mudar
+                    self.model_path = str(model_path)
+                    self.model = obter_recurso(
+                        f"yolo:{self.model_path}",
+                        lambda: _carregar_pesos_yolo(self.model_path),
+                        caminho=self.model_path
+                    )
+                    self._trava_predicao = _trava_modelo(self.model_path)
                 except Exception as e:
                     print(f"⚠️ Erro ao carregar modelo: {e}")
                     print(f"⚠️ Tipo do erro: {type(e).__name__}")
@@ -79,6 +665,11 @@ class DetectorYOLO:
         else:
             print("⚠️ YOLO não está disponível (ultralytics não instalado)")
 
+    @property
+    def chave_modelo(self) -> str:
+        """Identifica o modelo em uso (para chaves de cache)"""
+        return self.model_path if self.use_real_model and self.model is not None else "simulacao"
+
     def detectar_objetos(
         self,
         imagem: np.ndarray,
@@ -103,7 +694,17 @@ class DetectorYOLO:
             # Filtrar por confiança
             deteccoes = [d for d in deteccoes if d['confianca'] >= confianca_minima]
 
-        resultado = {
+        return self._registrar_resultado(deteccoes)
+
+    def _registrar_resultado(self, deteccoes: List[Dict]) -> Dict:
+        """Monta o resultado de uma imagem e o adiciona ao histórico"""
+        resultado = self._montar_resultado(deteccoes)
+        self.historico_deteccoes.append(resultado)
+        return resultado
+
+    def _montar_resultado(self, deteccoes: List[Dict]) -> Dict:
+        """Monta o dict de resultado de uma imagem"""
+        return {
             "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
             "total_objetos": len(deteccoes),
             "deteccoes": deteccoes,
@@ -111,71 +712,306 @@ class DetectorYOLO:
             "modo": "YOLO Real" if self.use_real_model else "Simulação"
         }
 
-        self.historico_deteccoes.append(resultado)
+    def detectar_lote(
+        self,
+        imagens: Iterable[Union[np.ndarray, str, Path]],
+        confianca_minima: float = 0.5,
+        tamanho_lote: int = 8
+    ) -> Iterator[Dict]:
+        """
+        Detecta objetos em várias imagens, enviando-as ao modelo em lotes
+
+        As imagens são consumidas sob demanda (pode ser um gerador sobre uma
+        pasta) e os resultados são devolvidos um a um, na ordem de entrada,
+        assim que o lote correspondente termina.
+
+        Args:
+            imagens: Arrays numpy ou caminhos de arquivos de imagem
+            confianca_minima: Confiança mínima para detecção
+            tamanho_lote: Quantidade de imagens por chamada ao modelo
+
+        Yields:
+            Dict no mesmo formato de detectar_objetos, com "indice",
+            "origem" (caminho, se houver) e "imagens_por_segundo" acumulado
+        """
+        tamanho_lote = max(1, int(tamanho_lote))
+        self.vazao_lote = {"imagens": 0, "segundos": 0.0, "imagens_por_segundo": 0.0}
+        inicio = time.perf_counter()
+        indice = 0
+        lote: List[Tuple[np.ndarray, Optional[str]]] = []
+
+        def processar(lote):
+            nonlocal indice
+            # Mesmo caminho de inferir_boxes_lote: modelo no limiar piso, NMS
+            # (iou=0.5), máximo de 10 detecções e refiltragem pela confiança pedida
+            try:
+                arrays = self.inferir_boxes_lote([img for img, _ in lote], confianca_minima, max_det=10)
+            except Exception as e:
+                print(f"⚠️ Erro na detecção em lote: {e}")
+                arrays = [np.empty((0, 6), dtype=np.float32) for _ in lote]
+
+            decorrido = time.perf_counter() - inicio
+            self.vazao_lote["imagens"] += len(lote)
+            self.vazao_lote["segundos"] = round(decorrido, 3)
+            self.vazao_lote["imagens_por_segundo"] = (
+                round(self.vazao_lote["imagens"] / decorrido, 2) if decorrido > 0 else 0.0
+            )
+
+            for (_, origem), dados in zip(lote, arrays):
+                resultado = self.detectar_de_boxes(dados, confianca_minima)
+                resultado["indice"] = indice
+                resultado["origem"] = origem
+                resultado["imagens_por_segundo"] = self.vazao_lote["imagens_por_segundo"]
+                indice += 1
+                yield resultado
+
+        for item in imagens:
+            origem = None
+            if isinstance(item, (str, Path)):
+                origem = str(item)
+                item = _ler_imagem(origem)
+                if item is None:
+                    print(f"⚠️ Não foi possível ler a imagem: {origem}")
+                    continue
+            lote.append((item, origem))
+
+            if len(lote) >= tamanho_lote:
+                yield from processar(lote)
+                lote = []
+
+        if lote:
+            yield from processar(lote)
+
+        print(
+            f"📈 Lote concluído: {self.vazao_lote['imagens']} imagens em "
+            f"{self.vazao_lote['segundos']}s ({self.vazao_lote['imagens_por_segundo']} imagens/s)"
+        )
+
+    def _converter_array(self, dados: np.ndarray) -> List[Dict]:
+        """Converte um array (n, 6) de boxes [x1, y1, x2, y2, confiança, classe] em detecções"""
+        if len(dados) == 0:
+            return []
+
+        x1, y1, x2, y2 = dados[:, 0], dados[:, 1], dados[:, 2], dados[:, 3]
+        confs = dados[:, 4]
+        classes = dados[:, 5].astype(int)
+        x_centers = ((x1 + x2) / 2).astype(int)
+        y_centers = ((y1 + y2) / 2).astype(int)
+        widths = (x2 - x1).astype(int)
+        heights = (y2 - y1).astype(int)
+
+        deteccoes = []
+        for i in range(len(dados)):
+            cls = int(classes[i])
+            class_name = self.classes[cls] if cls < len(self.classes) else f"Classe_{cls}"
+            class_name_pt = self.class_names_pt.get(class_name, class_name)
+            width, height = int(widths[i]), int(heights[i])
+
+            deteccoes.append({
+                "classe": class_name_pt,
+                "classe_original": class_name,
+                "classe_id": cls,
+                "confianca": round(float(confs[i]), 3),
+                "bbox": {
+                    "x": int(x1[i]),
+                    "y": int(y1[i]),
+                    "x_center": int(x_centers[i]),
+                    "y_center": int(y_centers[i]),
+                    "width": width,
+                    "height": height
+                },
+                "area_pixels": width * height
+            })
+
+        return deteccoes
+
+    def detectar_em_mosaico(
+        self,
+        imagem: np.ndarray,
+        confianca_minima: float = 0.5,
+        tamanho_tile: int = 640,
+        sobreposicao: float = 0.2,
+        tamanho_lote: int = 8,
+        limiar_nms: float = 0.5,
+        max_deteccoes: int = 300
+    ) -> Dict:
+        """
+        Detecta objetos em imagens grandes dividindo-as em tiles sobrepostos
+
+        Os tiles (recortes sem cópia da imagem) são enviados ao modelo em
+        lotes, as boxes voltam para as coordenadas da imagem inteira e as
+        duplicatas nas bordas entre tiles são eliminadas com NMS vetorizado
+        por classe (critério de interseção sobre a menor área, para juntar
+        boxes cortadas pela borda do tile com a box completa).
+
+        Args:
+            imagem: Array numpy da imagem
+            confianca_minima: Confiança mínima para detecção
+            tamanho_tile: Lado do tile em pixels (o modelo foi treinado em 640)
+            sobreposicao: Fração de sobreposição entre tiles vizinhos (0 a <1)
+            tamanho_lote: Quantidade de tiles por chamada ao modelo
+            limiar_nms: Limiar de sobreposição para considerar duas boxes duplicadas
+            max_deteccoes: Máximo de detecções mantidas na imagem inteira
+
+        Returns:
+            Dict no formato de detectar_objetos, com "tiles" (quantidade de tiles)
+        """
+        try:
+            dados, total_tiles = self._boxes_mosaico(
+                imagem, confianca_minima, tamanho_tile, sobreposicao, tamanho_lote, limiar_nms, max_deteccoes
+            )
+        except Exception as e:
+            print(f"⚠️ Erro na detecção em mosaico: {e}")
+            dados = np.empty((0, 6), dtype=np.float32)
+            total_tiles = len(gerar_tiles(*imagem.shape[:2], tamanho_tile, sobreposicao))
+        resultado = self._registrar_resultado(self._converter_array(dados))
+        resultado["tiles"] = total_tiles
         return resultado
 
-    def _detectar_com_modelo_real(self, imagem: np.ndarray, confianca_minima: float) -> List[Dict]:
+    def _boxes_mosaico(
+        self,
+        imagem: np.ndarray,
+        confianca_minima: float,
+        tamanho_tile: int = 640,
+        sobreposicao: float = 0.2,
+        tamanho_lote: int = 8,
+        limiar_nms: float = 0.5,
+        max_deteccoes: int = 300
+    ) -> Tuple[np.ndarray, int]:
+        """Boxes brutas (n, 6) da imagem inteira em modo mosaico e a quantidade de tiles"""
+        altura, largura = imagem.shape[:2]
+        origens = gerar_tiles(altura, largura, tamanho_tile, sobreposicao)
+        tiles = [imagem[y:y + tamanho_tile, x:x + tamanho_tile] for x, y in origens]
+
+        arrays = []
+        for inicio in range(0, len(tiles), max(1, tamanho_lote)):
+            lote = tiles[inicio:inicio + tamanho_lote]
+            for (x, y), dados in zip(origens[inicio:inicio + tamanho_lote], self._boxes_lote(lote, confianca_minima)):
+                if len(dados):
+                    dados = dados.astype(np.float32, copy=True)
+                    dados[:, [0, 2]] += x
+                    dados[:, [1, 3]] += y
+                    arrays.append(dados)
+
+        dados = np.concatenate(arrays) if arrays else np.empty((0, 6), dtype=np.float32)
+        if len(dados):
+            manter = nms_vetorizado(dados[:, :4], dados[:, 4], dados[:, 5], limiar_nms, criterio="ios")
+            dados = dados[manter[:max_deteccoes]]
+
+        return dados, len(tiles)
+
+    def inferir_boxes(
+        self,
+        imagem: np.ndarray,
+        confianca_minima: float = 0.5,
+        mosaico: Optional[Dict] = None
+    ) -> np.ndarray:
         """
-        Executa detecção usando modelo YOLO real
+        Executa o modelo e retorna as boxes brutas, sem registrar no histórico
 
         Args:
             imagem: Array numpy da imagem
-            confianca_minima: Confiança mínima
+            confianca_minima: Confiança mínima passada ao modelo
+            mosaico: Parâmetros de detectar_em_mosaico (tamanho_tile, sobreposicao...);
+                None para analisar a imagem inteira
 
         Returns:
-            Lista de detecções
+            Array (n, 6) com x1, y1, x2, y2, confiança, classe
+
+        Raises:
+            Exception: erro do modelo, para que o chamador não trate a falha
+                como "nenhum objeto" (e não a guarde no cache)
         """
-        deteccoes = []
+        if mosaico is not None:
+            return self._boxes_mosaico(imagem, confianca_minima, **mosaico)[0]
+        return self._boxes_lote([imagem], confianca_minima, max_det=10)[0]
 
-        try:
-            # Executar predição com NMS para eliminar detecções duplicadas
-            results = self.model.predict(
-                source=imagem,
+    def inferir_boxes_lote(self, imagens: List[np.ndarray], confianca_minima: float = 0.5, max_det: int = 10) -> List[np.ndarray]:
+        """Boxes brutas de várias imagens com uma única chamada ao modelo (no limiar piso)"""
+        return self._boxes_lote(imagens, self.limiar_inferencia(confianca_minima), max_det=max_det)
+
+    def limiar_inferencia(self, confianca_minima: float) -> float:
+        """Limiar realmente passado ao modelo: o piso, para que limiares maiores só refiltrem"""
+        return min(confianca_minima, self.confianca_piso)
+
+    def detectar_de_boxes(self, dados: np.ndarray, confianca_minima: float = 0.5) -> Dict:
+        """
+        Monta e registra o resultado a partir de boxes brutas já inferidas
+
+        Filtra as boxes pela confiança mínima (vetorizado), permitindo
+        reaproveitar uma inferência feita com limiar menor.
+        """
+        return self._registrar_resultado(self._converter_array(filtrar_boxes(dados, confianca_minima)))
+
+    def refiltrar(self, confianca_minima: float, dados: Optional[np.ndarray] = None) -> Dict:
+        """
+        Resultado para outro limiar de confiança sem executar o modelo de novo
+
+        Usa as boxes brutas informadas ou as da última detecção com o modelo
+        real. Não adiciona nada ao histórico.
+        """
+        if dados is None:
+            dados = self.ultimas_boxes
+        return self._montar_resultado(self._converter_array(filtrar_boxes(dados, confianca_minima)))
+
+    def _predizer(self, imagens: List[np.ndarray], confianca_minima: float, max_det: int):
+        """Chama o modelo compartilhado, uma predição por vez no processo"""
+        with self._trava_predicao:
+            return self.model.predict(
+                source=imagens,
                 conf=confianca_minima,
-                iou=0.5,  # IoU threshold para NMS - elimina boxes sobrepostas
-                max_det=10,  # Máximo de detecções por imagem
+                iou=0.5,
+                max_det=max_det,
                 verbose=False
             )
 
-            # Processar resultados
-            for result in results:
-                boxes = result.boxes
-                for box in boxes:
-                    # Extrair informações
-                    x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-                    conf = float(box.conf[0].cpu().numpy())
-                    cls = int(box.cls[0].cpu().numpy())
-
-                    # Calcular centro e dimensões
-                    x_center = int((x1 + x2) / 2)
-                    y_center = int((y1 + y2) / 2)
-                    width = int(x2 - x1)
-                    height = int(y2 - y1)
-
-                    # Nome da classe
-                    class_name = self.classes[cls] if cls < len(self.classes) else f"Classe_{cls}"
-                    class_name_pt = self.class_names_pt.get(class_name, class_name)
-
-                    deteccoes.append({
-                        "classe": class_name_pt,
-                        "classe_original": class_name,
-                        "classe_id": cls,
-                        "confianca": round(conf, 3),
-                        "bbox": {
-                            "x": int(x1),
-                            "y": int(y1),
-                            "x_center": x_center,
-                            "y_center": y_center,
-                            "width": width,
-                            "height": height
-                        },
-                        "area_pixels": width * height
-                    })
+    def _boxes_lote(self, imagens: List[np.ndarray], confianca_minima: float, max_det: int = 100) -> List[np.ndarray]:
+        """
+        Boxes brutas (n, 6) de cada imagem do lote, em uma única chamada ao modelo
+
+        Erros do modelo são propagados: um array vazio aqui significa "nenhum
+        objeto" e seria guardado no cache como resultado válido.
+        """
+        if self.use_real_model and self.model is not None:
+            results = self._predizer(imagens, confianca_minima, max_det=max_det)
+            return [result.boxes.data.cpu().numpy() for result in results]
+
+        # Simulação: mesmas detecções fictícias de detectar_objetos, em formato de array
+        arrays = []
+        for img in imagens:
+            simuladas = [
+                d for d in self._gerar_deteccoes_simuladas(max(img.shape[0], 101), max(img.shape[1], 101))
+                if d['confianca'] >= confianca_minima
+            ]
+            arrays.append(np.array([
+                [d['bbox']['x'], d['bbox']['y'],
+                 d['bbox']['x'] + d['bbox']['width'], d['bbox']['y'] + d['bbox']['height'],
+                 d['confianca'], d['classe_id']]
+                for d in simuladas
+            ], dtype=np.float32).reshape(-1, 6))
+        return arrays
+
+    def _detectar_com_modelo_real(self, imagem: np.ndarray, confianca_minima: float) -> List[Dict]:
+        """
+        Executa detecção usando modelo YOLO real
 
+        O modelo roda no limiar piso e as boxes brutas ficam em
+        `ultimas_boxes`, para que `refiltrar` atenda outros limiares.
+
+        Args:
+            imagem: Array numpy da imagem
+            confianca_minima: Confiança mínima
+
+        Returns:
+            Lista de detecções
+        """
+        # NMS (iou=0.5) e máximo de 10 detecções aplicados pelo modelo
+        try:
+            self.ultimas_boxes = self.inferir_boxes(imagem, self.limiar_inferencia(confianca_minima))
         except Exception as e:
             print(f"⚠️ Erro na detecção: {e}")
-
-        return deteccoes
+            self.ultimas_boxes = np.empty((0, 6), dtype=np.float32)
+        return self._converter_array(filtrar_boxes(self.ultimas_boxes, confianca_minima))
 
     def _gerar_deteccoes_simuladas(self, altura: int, largura: int) -> List[Dict]:
         """Gera detecções simuladas para demonstração"""
@@ -226,6 +1062,20 @@ class DetectorYOLO:
 
         # Score baseado na confiança média
         conf_media = np.mean([d['confianca'] for d in deteccoes]) if deteccoes else 0
+        return self._analisar_contagens(total, cats, dogs, conf_media)
+
+    def analisar_saude_historico(self) -> Dict:
+        """Mesma análise de analisar_saude_plantacao sobre todo o histórico, usando os agregados"""
+        historico = self.historico_deteccoes
+        return self._analisar_contagens(
+            historico.soma_objetos,
+            historico.contagem_classes_originais.get('cat', 0),
+            historico.contagem_classes_originais.get('dog', 0),
+            historico.confianca_media_objetos
+        )
+
+    def _analisar_contagens(self, total: int, cats: int, dogs: int, conf_media: float) -> Dict:
+        """Monta a análise de saúde a partir das contagens já calculadas"""
         score = round(conf_media * 100, 1)
 
         status = "✅ Alta Confiança" if score >= 80 else \
@@ -288,12 +1138,13 @@ class DetectorYOLO:
         return recomendacoes
 
     def obter_historico(self) -> List[Dict]:
-        """Retorna histórico de detecções"""
-        return self.historico_deteccoes
+        """Retorna as análises mais recentes do histórico (limitado à capacidade)"""
+        return list(self.historico_deteccoes)
 
     def obter_estatisticas(self) -> Dict:
-        """Retorna estatísticas gerais"""
-        if not self.historico_deteccoes:
+        """Retorna estatísticas gerais (O(1), a partir dos agregados do histórico)"""
+        historico = self.historico_deteccoes
+        if not historico.total_analises:
             return {
                 "total_analises": 0,
                 "media_objetos_por_imagem": 0,
@@ -301,23 +1152,12 @@ class DetectorYOLO:
                 "classes_mais_detectadas": []
             }
 
-        total = len(self.historico_deteccoes)
-        media_objetos = np.mean([d['total_objetos'] for d in self.historico_deteccoes])
-        confianca_media = np.mean([d['confianca_media'] for d in self.historico_deteccoes])
-
-        # Contar classes
-        classes_count = {}
-        for analise in self.historico_deteccoes:
-            for det in analise['deteccoes']:
-                classe = det['classe']
-                classes_count[classe] = classes_count.get(classe, 0) + 1
-
-        classes_top = sorted(classes_count.items(), key=lambda x: x[1], reverse=True)[:3]
+        classes_top = sorted(historico.contagem_classes.items(), key=lambda x: x[1], reverse=True)[:3]
 
         return {
-            "total_analises": total,
-            "media_objetos_por_imagem": round(media_objetos, 1),
-            "confianca_media_geral": round(confianca_media, 3),
+            "total_analises": historico.total_analises,
+            "media_objetos_por_imagem": round(historico.media_objetos, 1),
+            "confianca_media_geral": round(historico.confianca_media, 3),
             "classes_mais_detectadas": [c[0] for c in classes_top]
         }
 
@@ -407,26 +1247,21 @@ class RelatorioVisao:
 
     def gerar_relatorio_completo(self) -> Dict:
         """Gera relatório completo de análises"""
-        historico = self.detector.obter_historico()
         stats = self.detector.obter_estatisticas()
 
-        if not historico:
+        if not stats['total_analises']:
             return {
                 "data_geracao": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
                 "mensagem": "Nenhuma análise realizada ainda"
             }
 
-        # Análise geral
-        todas_deteccoes = []
-        for analise in historico:
-            todas_deteccoes.extend(analise['deteccoes'])
-
-        # Calcular saúde geral
-        pragas_total = sum(1 for d in todas_deteccoes if d['classe'] == 'Praga')
-        doencas_total = sum(1 for d in todas_deteccoes if d['classe'] == 'Doença')
-        ervas_total = sum(1 for d in todas_deteccoes if d['classe'] == 'Erva Daninha')
+        # Calcular saúde geral a partir dos agregados do histórico
+        contagem = self.detector.historico_deteccoes.contagem_classes
+        pragas_total = contagem.get('Praga', 0)
+        doencas_total = contagem.get('Doença', 0)
+        ervas_total = contagem.get('Erva Daninha', 0)
 
-        saude_geral = self.detector.analisar_saude_plantacao(todas_deteccoes)
+        saude_geral = self.detector.analisar_saude_historico()
 
         return {
             "data_geracao": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
@@ -448,10 +1283,21 @@ def gerar_dados_exemplo_yolo() -> Dict:
 
     detector = DetectorYOLO()
 
-    # Gerar algumas análises de exemplo
-    for i in range(5):
-        imagem = GeradorImagensTeste.gerar_imagem_aleatoria()
-        detector.detectar_objetos(imagem)
+    # Gerar algumas análises de exemplo (uma vez por processo e por modelo);
+    # cada sessão recebe sua própria cópia do histórico
+    def analisar_exemplos() -> List[Dict]:
+        return [
+            detector.detectar_objetos(GeradorImagensTeste.gerar_imagem_aleatoria())
+            for _ in range(5)
+        ]
+
+    exemplos = obter_recurso(
+        f"yolo_exemplos:{detector.model_path or 'simulacao'}",
+        analisar_exemplos,
+        caminho=detector.model_path
+    )
+    detector.historico_deteccoes.limpar()
+    detector.historico_deteccoes.extend(copy.deepcopy(exemplos))
 
     relatorio = RelatorioVisao(detector)
 
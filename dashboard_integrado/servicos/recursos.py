@@ -0,0 +1,140 @@
+"""
+Registro de recursos pesados compartilhados entre sessões
+FarmTech Solutions - Dashboard Integrado
+
+Modelos de ML e pesos do YOLO são carregados uma única vez por processo,
+sob demanda, e reaproveitados por todas as sessões do Streamlit. Quando o
+arquivo de origem muda (mtime diferente), o recurso é recarregado no
+próximo acesso.
+"""
+
+import os
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+
+class RecursoCompartilhado:
+    """Entrada do registro: objeto carregado e metadados da carga"""
+
+    def __init__(self, chave: str, caminho: Optional[str] = None):
+        self.chave = chave
+        self.caminho = str(caminho) if caminho else None
+        self.objeto: Any = None
+        self.carregado = False
+        self.mtime: Optional[float] = None
+        self.tamanho_bytes = 0
+        self.tempo_carga = 0.0
+        self.carregado_em: Optional[float] = None
+        self.cargas = 0
+        self.acessos = 0
+        self.lock = threading.Lock()
+
+    def mtime_atual(self) -> Optional[float]:
+        """mtime do arquivo de origem (None se não houver arquivo)"""
+        if not self.caminho:
+            return None
+        try:
+            return os.path.getmtime(self.caminho)
+        except OSError:
+            return None
+
+    def desatualizado(self) -> bool:
+        """Indica se o recurso precisa ser (re)carregado"""
+        return not self.carregado or self.mtime_atual() != self.mtime
+
+
+_RECURSOS: Dict[str, RecursoCompartilhado] = {}
+_RECURSOS_LOCK = threading.Lock()
+
+
+def _estimar_tamanho(objeto: Any, caminho: Optional[str]) -> int:
+    """Estima a memória ocupada pelo recurso (tamanho do arquivo de origem, se houver)"""
+    if caminho:
+        try:
+            return os.path.getsize(caminho)
+        except OSError:
+            pass
+    return sys.getsizeof(objeto)
+
+
+def obter_recurso(chave: str, carregar: Callable[[], Any], caminho: Optional[str] = None) -> Any:
+    """
+    Retorna o recurso compartilhado, carregando-o no primeiro uso
+
+    Args:
+        chave: Identificador único do recurso no processo
+        carregar: Função sem argumentos que constrói o recurso
+        caminho: Arquivo de origem; se o mtime mudar, o recurso é recarregado
+
+    Returns:
+        Objeto retornado por `carregar`. Exceções da carga são propagadas
+        e nada é guardado, de modo que o próximo acesso tenta de novo.
+    """
+    with _RECURSOS_LOCK:
+        recurso = _RECURSOS.get(chave)
+        if recurso is None or (caminho and recurso.caminho != str(caminho)):
+            recurso = RecursoCompartilhado(chave, caminho)
+            _RECURSOS[chave] = recurso
+
+    with recurso.lock:
+        recurso.acessos += 1
+        if recurso.desatualizado():
+            mtime = recurso.mtime_atual()
+            inicio = time.perf_counter()
+            objeto = carregar()
+            recurso.tempo_carga = time.perf_counter() - inicio
+            recurso.objeto = objeto
+            recurso.carregado = True
+            recurso.mtime = mtime
+            recurso.tamanho_bytes = _estimar_tamanho(objeto, recurso.caminho)
+            recurso.carregado_em = time.time()
+            recurso.cargas += 1
+        return recurso.objeto
+
+
+def invalidar_recurso(chave: Optional[str] = None) -> int:
+    """
+    Descarta um recurso (ou todos, se chave for None) para recarga no próximo acesso
+
+    Returns:
+        Quantidade de recursos descartados
+    """
+    with _RECURSOS_LOCK:
+        if chave is None:
+            removidos = list(_RECURSOS.values())
+            _RECURSOS.clear()
+        else:
+            recurso = _RECURSOS.pop(chave, None)
+            removidos = [recurso] if recurso else []
+
+    for recurso in removidos:
+        with recurso.lock:
+            recurso.objeto = None
+            recurso.carregado = False
+    return len(removidos)
+
+
+def estatisticas_recursos() -> Dict[str, Dict]:
+    """Retorna memória estimada, tempo de carga e contadores de cada recurso"""
+    with _RECURSOS_LOCK:
+        recursos = list(_RECURSOS.values())
+
+    return {
+        r.chave: {
+            "carregado": r.carregado,
+            "caminho": r.caminho,
+            "tamanho_mb": round(r.tamanho_bytes / (1024 * 1024), 2),
+            "tempo_carga_s": round(r.tempo_carga, 3),
+            "cargas": r.cargas,
+            "acessos": r.acessos,
+            "desatualizado": r.carregado and r.mtime_atual() != r.mtime,
+        }
+        for r in recursos
+    }
+
+
+def memoria_total_recursos() -> float:
+    """Memória estimada (MB) de todos os recursos carregados"""
+    return round(sum(s["tamanho_mb"] for s in estatisticas_recursos().values() if s["carregado"]), 2)
@@ -14,15 +14,23 @@ from pathlib import Path
 sys.path.append(str(Path(__file__).parent))
 
 from servicos.database import DatabaseManager, DB_FASE3, init_fase3_db
+from servicos.fase3_iot import BufferLeituras, HORAS_RETENCAO_LEITURAS, aplicar_retencao
 
 
 class SimuladorSensores:
     """Simula leituras de sensores em tempo real"""
 
-    def __init__(self):
+    def __init__(self, tamanho_lote: int = 500, intervalo_flush: float = 2.0):
         self.db = DatabaseManager(DB_FASE3)
         init_fase3_db()
 
+        # Leituras são gravadas em lote pelo buffer (uma transação por flush)
+        self.buffer = BufferLeituras(
+            DB_FASE3,
+            tamanho_lote=tamanho_lote,
+            intervalo_flush=intervalo_flush
+        )
+
         # Estado dos sensores
         self.umidade = 65.0
         self.ph = 6.5
@@ -70,7 +78,7 @@ class SimuladorSensores:
         return 1 - atual
 
     def salvar_leitura(self, sensor_id: str, tipo: str, valor: float, unidade: str):
-        """Salva leitura no banco de dados"""
+        """Enfileira leitura para gravação em lote no banco de dados"""
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
         # Determinar status
@@ -87,10 +95,7 @@ class SimuladorSensores:
             status = "Presente" if valor == 1 else "Ausente"
 
         try:
-            self.db.execute("""
-                INSERT INTO leituras_sensores (sensor_id, tipo_sensor, valor, unidade, timestamp, status)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, (sensor_id, tipo, valor, unidade, timestamp, status))
+            self.buffer.adicionar(sensor_id, tipo, valor, unidade, timestamp, status)
         except Exception as e:
             print(f"Erro ao salvar leitura: {e}")
 
@@ -226,19 +231,13 @@ class SimuladorSensores:
         timestamp = datetime.now().strftime("%H:%M:%S")
         print(f"[{timestamp}] Umidade: {umidade:.1f}% | pH: {ph:.2f} | P: {self.fosforo} | K: {self.potassio}")
 
-    def limpar_dados_antigos(self):
+    def limpar_dados_antigos(self) -> dict:
         """Remove leituras antigas (mais de 24h)"""
         try:
-            self.db.execute("""
-                DELETE FROM leituras_sensores
-                WHERE datetime(created_at) < datetime('now', '-24 hours')
-            """)
-            self.db.execute("""
-                DELETE FROM alertas
-                WHERE datetime(created_at) < datetime('now', '-24 hours')
-            """)
+            return aplicar_retencao(horas=HORAS_RETENCAO_LEITURAS)
         except Exception as e:
             print(f"Erro ao limpar dados antigos: {e}")
+            return {"leituras": 0, "alertas": 0}
 
     def rodar(self, intervalo_segundos: int = 5):
         """Roda o simulador continuamente"""
@@ -254,14 +253,20 @@ class SimuladorSensores:
                 # Limpar dados antigos a cada 100 ciclos
                 ciclo += 1
                 if ciclo % 100 == 0:
-                    self.limpar_dados_antigos()
-                    print("🧹 Dados antigos removidos")
+                    removidos = self.limpar_dados_antigos()
+                    print(f"🧹 Dados antigos removidos ({removidos['leituras']} leituras, {removidos['alertas']} alertas)")
 
                 time.sleep(intervalo_segundos)
 
         except KeyboardInterrupt:
             print("\n\n⏹️  Simulador parado pelo usuário")
         finally:
+            # Garante que as leituras ainda no buffer sejam gravadas
+            try:
+                self.buffer.fechar()
+                print(f"💾 {self.buffer.total_gravadas} leituras gravadas em {self.buffer.total_lotes} lote(s)")
+            except Exception as e:
+                print(f"Erro ao gravar leituras pendentes: {e}")
             self.db.close()
             print("✅ Conexão com banco de dados encerrada")
 
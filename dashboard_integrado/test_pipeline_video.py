@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Teste do pipeline de vídeo da Fase 6 (servicos/fase6_video.py)
+
+Usa frames sintéticos em memória e o DetectorYOLO em modo simulação, então
+não precisa de OpenCV, do modelo treinado nem de câmera. Verifica o passo
+entre frames, a posição em segundos, o limite das filas (backpressure),
+as métricas por estágio e a gravação no banco.
+
+Executar:  python test_pipeline_video.py  (ou pytest)
+"""
+
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from servicos import fase6_video
+from servicos.fase6_video import FPS_PADRAO, PipelineVideo, ler_frames
+from servicos.fase6_yolo import DetectorYOLO
+
+
+def gerar_frames(total, altura=120, largura=160):
+    for _ in range(total):
+        yield np.zeros((altura, largura, 3), dtype=np.uint8)
+
+
+def test_ler_frames_passo_e_posicao():
+    """Só 1 a cada `passo` frames sai, com posição em segundos desde o início"""
+    lidos = list(ler_frames(gerar_frames(25), passo=4, fps_padrao=10))
+    assert [indice for indice, _, _ in lidos] == [0, 4, 8, 12, 16, 20, 24]
+    assert [posicao for _, posicao, _ in lidos] == [0.0, 0.4, 0.8, 1.2, 1.6, 2.0, 2.4]
+
+    limitados = list(ler_frames(gerar_frames(25), passo=3, max_frames=10))
+    assert [indice for indice, _, _ in limitados] == [0, 3, 6, 9]
+    assert limitados[-1][1] == 9 / FPS_PADRAO
+
+
+def test_pipeline_metricas_e_gravacao():
+    """Contadores e métricas por estágio batem entre si e com o banco"""
+    with tempfile.TemporaryDirectory() as pasta:
+        pipeline = PipelineVideo(
+            detector=DetectorYOLO(use_real_model=False),
+            db_path=Path(pasta) / "video.db",
+            tamanho_lote=4,
+            passo_frames=2,
+            lote_gravacao=5,
+        )
+        resultados = []
+        pipeline.ao_resultado = resultados.append
+        metricas = pipeline.processar(gerar_frames(30))
+
+    assert metricas["erros"] == []
+    assert metricas["frames_lidos"] == 15
+    assert metricas["frames_processados"] == 15
+    assert metricas["resultados_gravados"] == 15
+    assert [r["frame"] for r in resultados] == list(range(0, 30, 2))
+    assert [r["posicao_s"] for r in resultados] == [round(i / FPS_PADRAO, 3) for i in range(0, 30, 2)]
+    assert metricas["objetos_detectados"] == sum(r["total_objetos"] for r in resultados)
+
+    estagios = metricas["estagios"]
+    assert estagios["leitura"]["chamadas"] == 15
+    assert estagios["inferencia"]["itens"] == 15
+    # Uma chamada ao modelo por lote, nunca acima de tamanho_lote frames
+    assert estagios["inferencia"]["chamadas"] >= 15 / 4
+    assert estagios["gravacao"]["itens"] == 15
+    assert metricas["frames_por_segundo"] > 0
+
+
+def test_pipeline_fila_limitada():
+    """Com a inferência lenta, a leitura espera: a fila nunca passa da capacidade"""
+    pipeline = PipelineVideo(
+        detector=DetectorYOLO(use_real_model=False),
+        db_path=None,
+        tamanho_lote=2,
+        capacidade_fila=3,
+        ao_resultado=lambda resultado: time.sleep(0.01),
+    )
+    metricas = pipeline.processar(gerar_frames(40))
+
+    assert metricas["erros"] == []
+    assert metricas["frames_processados"] == 40
+    assert metricas["ocupacao_maxima_fila"] <= 3
+    assert metricas["ocupacao_maxima_fila"] == 3
+    # A espera da leitura por espaço na fila é medida como estágio próprio
+    assert metricas["estagios"]["espera_fila"]["max_ms"] > 0
+    assert metricas["resultados_gravados"] == 0
+
+
+def test_pipeline_parar():
+    """parar() interrompe uma fonte infinita sem travar as threads"""
+    def infinitos():
+        while True:
+            yield np.zeros((120, 160, 3), dtype=np.uint8)
+
+    pipeline = PipelineVideo(detector=DetectorYOLO(use_real_model=False), db_path=None, tamanho_lote=2)
+
+    def ao_resultado(resultado):
+        if resultado["frame"] >= 10:
+            pipeline.parar()
+
+    pipeline.ao_resultado = ao_resultado
+    metricas = pipeline.processar(infinitos())
+
+    assert metricas["frames_processados"] >= 11
+    assert metricas["frames_lidos"] <= metricas["frames_processados"] + pipeline.capacidade_fila + 1
+
+
+def test_pipeline_banco_invalido():
+    """Banco que não abre: o pipeline termina e informa os resultados não gravados"""
+    with tempfile.TemporaryDirectory() as pasta:
+        # Um diretório no lugar do arquivo do banco
+        pipeline = PipelineVideo(
+            detector=DetectorYOLO(use_real_model=False),
+            db_path=Path(pasta),
+            tamanho_lote=4,
+            lote_gravacao=5,
+        )
+        metricas = pipeline.processar(gerar_frames(20))
+
+    assert metricas["frames_processados"] == 20
+    assert metricas["resultados_gravados"] == 0
+    assert metricas["erros"] and all(erro.startswith("gravação:") for erro in metricas["erros"])
+
+
+def test_pipeline_erro_na_gravacao_nao_trava():
+    """Exceção na gravação para o pipeline sem deixar threads bloqueadas na fila"""
+    def falhar(*args, **kwargs):
+        raise RuntimeError("banco bloqueado")
+
+    original = fase6_video.salvar_deteccoes_lote
+    fase6_video.salvar_deteccoes_lote = falhar
+    try:
+        pipeline = PipelineVideo(
+            detector=DetectorYOLO(use_real_model=False),
+            db_path=Path("nao_usado.db"),
+            tamanho_lote=2,
+            capacidade_fila=2,
+            lote_gravacao=1,
+        )
+        inicio = time.perf_counter()
+        metricas = pipeline.processar(gerar_frames(500))
+    finally:
+        fase6_video.salvar_deteccoes_lote = original
+
+    assert time.perf_counter() - inicio < 10
+    assert metricas["erros"] == ["gravação: banco bloqueado"]
+    assert metricas["resultados_gravados"] == 0
+    # parar() interrompeu a leitura antes do fim da fonte
+    assert metricas["frames_lidos"] < 500
+
+
+if __name__ == "__main__":
+    testes = [
+        test_ler_frames_passo_e_posicao,
+        test_pipeline_metricas_e_gravacao,
+        test_pipeline_fila_limitada,
+        test_pipeline_parar,
+        test_pipeline_banco_invalido,
+        test_pipeline_erro_na_gravacao_nao_trava,
+    ]
+    falhas = 0
+    for teste in testes:
+        try:
+            teste()
+            print(f"✅ {teste.__name__}")
+        except Exception as e:
+            falhas += 1
+            print(f"❌ {teste.__name__}: {e!r}")
+    sys.exit(1 if falhas else 0)
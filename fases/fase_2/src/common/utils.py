@@ -1,14 +1,18 @@
 import uuid
 
-from src.persistencia.adapters.oracle_repository import OracleRepository
+from src.persistencia.adapters.oracle_repository import OracleRepository, criar_pool_oracle
 
 CONNECTION_STRING = "dev/dev123@localhost:1521/freepdb1"
 
+# Um único pool de sessões para todos os repositórios: as conexões são
+# abertas sob demanda e o ALTER SESSION roda uma vez por conexão
+_POOL_SESSOES = criar_pool_oracle(CONNECTION_STRING, maximo=4)
+
 _REPOSITORIOS = {
-    "talhoes": OracleRepository(CONNECTION_STRING, "talhoes"),
-    "maquinas": OracleRepository(CONNECTION_STRING, "maquinas"),
-    "operadores": OracleRepository(CONNECTION_STRING, "operadores"),
-    "colheitas": OracleRepository(CONNECTION_STRING, "colheitas")
+    "talhoes": OracleRepository(CONNECTION_STRING, "talhoes", pool=_POOL_SESSOES),
+    "maquinas": OracleRepository(CONNECTION_STRING, "maquinas", pool=_POOL_SESSOES),
+    "operadores": OracleRepository(CONNECTION_STRING, "operadores", pool=_POOL_SESSOES),
+    "colheitas": OracleRepository(CONNECTION_STRING, "colheitas", pool=_POOL_SESSOES)
 }
 
 def get_repositorio(nome: str):
@@ -17,6 +21,12 @@ def get_repositorio(nome: str):
         raise Exception(f"Repositório '{nome}' não encontrado.")
     return repo
 
+def estatisticas_sessoes():
+    return _POOL_SESSOES.estatisticas()
+
+def fechar_sessoes():
+    _POOL_SESSOES.fechar()
+
 def gerar_id():
     return str(uuid.uuid4())
 
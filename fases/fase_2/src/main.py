@@ -1,6 +1,6 @@
 import asyncio
 
-from src.common.utils import obter_entrada_nao_vazia, obter_numero_positivo
+from src.common.utils import obter_entrada_nao_vazia, obter_numero_positivo, fechar_sessoes
 from src.maquinas import cadastrar_maquina, listar_maquinas, atualizar_maquina, deletar_maquina
 from src.operadores import cadastrar_operador, listar_operadores, atualizar_operador, deletar_operador
 from src.registro_colheita import registrar_colheita, listar_colheitas, atualizar_colheita, deletar_colheita, \
@@ -368,7 +368,10 @@ async def menu_relatorios():
     await ranking_causas_perda()
 
 async def main():
-    await menu_principal()
+    try:
+        await menu_principal()
+    finally:
+        fechar_sessoes()
 
 # INÍCIO
 if __name__ == "__main__":
@@ -1,23 +1,51 @@
 from src.persistencia.base_repository import BaseRepository
-import oracledb
+from src.persistencia.pool_sessoes import PoolSessoes
 import json
 from datetime import datetime
 
+
+def definir_formato_data(conexao):
+    cursor = conexao.cursor()
+    try:
+        cursor.execute("ALTER SESSION SET NLS_DATE_FORMAT = 'YYYY-MM-DD'")
+    finally:
+        cursor.close()
+
+
+def criar_pool_oracle(connection_string, maximo=4):
+    def conectar():
+        # Importado só ao abrir a conexão: com um pool próprio (ex.: sqlite3
+        # nos testes) o repositório funciona sem o driver do Oracle instalado
+        import oracledb
+        return oracledb.connect(connection_string)
+
+    return PoolSessoes(conectar, maximo=maximo, inicializadores=[definir_formato_data])
+
+
 class OracleRepository(BaseRepository):
-    def __init__(self, connection_string, tabela):
+    def __init__(self, connection_string, tabela, pool=None):
         self.connection_string = connection_string
         self.tabela = tabela
+        # Sem pool compartilhado, o repositório cria o seu
+        self.pool = pool or criar_pool_oracle(connection_string)
+        self.pool.adicionar_inicializador(definir_formato_data)
 
-    async def _obter_conexao(self):
+    def _desfazer(self, conexao):
+        # Rollback que falha indica conexão quebrada: ela não volta ao pool
         try:
-            conn = oracledb.connect(self.connection_string)
-            cursor = conn.cursor()
-            cursor.execute("ALTER SESSION SET NLS_DATE_FORMAT = 'YYYY-MM-DD'")
-            cursor.close()
-            return conn
-        except Exception as e:
-            print(f"Erro ao conectar ao banco Oracle: {e}")
-            raise
+            conexao.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _liberar(self, conexao, cursor, saudavel=True):
+        # Cursor None: a falha foi ao abri-lo, mas a conexão ainda volta ao pool
+        if cursor is not None:
+            try:
+                cursor.close()
+            except Exception:
+                saudavel = False
+        self.pool.devolver(conexao, descartar=not saudavel)
 
     def _processar_valores(self, dados):
         processados = {}
@@ -29,10 +57,12 @@ class OracleRepository(BaseRepository):
         return processados
 
     async def inserir(self, entidade):
-        conexao = await self._obter_conexao()
-        cursor = conexao.cursor()
+        conexao = self.pool.adquirir()
+        cursor = None
+        saudavel = True
 
         try:
+            cursor = conexao.cursor()
             entidade_copia = dict(entidade)
 
             if 'data' in entidade_copia and entidade_copia['data']:
@@ -55,18 +85,19 @@ class OracleRepository(BaseRepository):
             conexao.commit()
             return True
         except Exception as e:
-            conexao.rollback()
+            saudavel = self._desfazer(conexao)
             print(f"Erro ao inserir dados: {e}")
             raise
         finally:
-            cursor.close()
-            conexao.close()
+            self._liberar(conexao, cursor, saudavel)
 
     async def listar(self):
-        conexao = await self._obter_conexao()
-        cursor = conexao.cursor()
+        conexao = self.pool.adquirir()
+        cursor = None
+        saudavel = True
 
         try:
+            cursor = conexao.cursor()
             query = f"SELECT * FROM {self.tabela}"
             cursor.execute(query)
 
@@ -97,17 +128,19 @@ class OracleRepository(BaseRepository):
 
             return resultado
         except Exception as e:
+            saudavel = self._desfazer(conexao)
             print(f"Erro ao listar dados: {e}")
             raise
         finally:
-            cursor.close()
-            conexao.close()
+            self._liberar(conexao, cursor, saudavel)
 
     async def atualizar(self, id, novos_dados):
-        conexao = await self._obter_conexao()
-        cursor = conexao.cursor()
+        conexao = self.pool.adquirir()
+        cursor = None
+        saudavel = True
 
         try:
+            cursor = conexao.cursor()
             dados_copia = dict(novos_dados)
 
             if 'data' in dados_copia and dados_copia['data']:
@@ -133,18 +166,19 @@ class OracleRepository(BaseRepository):
 
             return afetados > 0
         except Exception as e:
-            conexao.rollback()
+            saudavel = self._desfazer(conexao)
             print(f"Erro ao atualizar dados: {e}")
             raise
         finally:
-            cursor.close()
-            conexao.close()
+            self._liberar(conexao, cursor, saudavel)
 
     async def deletar(self, id):
-        conexao = await self._obter_conexao()
-        cursor = conexao.cursor()
+        conexao = self.pool.adquirir()
+        cursor = None
+        saudavel = True
 
         try:
+            cursor = conexao.cursor()
             query = f"DELETE FROM {self.tabela} WHERE id = :1"
             cursor.execute(query, [id])
 
@@ -153,9 +187,8 @@ class OracleRepository(BaseRepository):
 
             return afetados > 0
         except Exception as e:
-            conexao.rollback()
+            saudavel = self._desfazer(conexao)
             print(f"Erro ao deletar dados: {e}")
             raise
         finally:
-            cursor.close()
-            conexao.close()
\ No newline at end of file
+            self._liberar(conexao, cursor, saudavel)
\ No newline at end of file
@@ -0,0 +1,154 @@
+import threading
+import time
+from contextlib import contextmanager
+
+
+class PoolSessoes:
+    """
+    Pool de conexões para qualquer driver DB-API (oracledb, sqlite3, ...).
+
+    - conectar: função sem argumentos que abre uma conexão nova
+    - inicializadores: funções chamadas uma única vez em cada conexão
+      física (ex.: ALTER SESSION), não a cada uso
+    - maximo: conexões abertas ao mesmo tempo; acima disso, quem pede espera
+    """
+
+    def __init__(self, conectar, maximo=4, timeout=30, inicializadores=None):
+        self.conectar = conectar
+        self.maximo = maximo
+        self.timeout = timeout
+        self.inicializadores = []
+        for inicializador in inicializadores or []:
+            self.adicionar_inicializador(inicializador)
+
+        self._ociosas = []
+        self._abertas = 0
+        self._aplicados = {}  # id(conexão) -> quantos inicializadores já rodaram nela
+        self._condicao = threading.Condition()
+        self._fechado = False
+
+        self.metricas = {
+            "conexoes_criadas": 0,
+            "conexoes_descartadas": 0,
+            "aquisicoes": 0,
+            "reutilizacoes": 0,
+            "esperas": 0,
+            "tempo_espera_s": 0.0,
+            "inicializacoes_sessao": 0,
+        }
+
+    def adicionar_inicializador(self, inicializador):
+        if inicializador not in self.inicializadores:
+            self.inicializadores.append(inicializador)
+
+    def _inicializar(self, conexao):
+        # Conexões já abertas recebem também os inicializadores adicionados depois
+        aplicados = self._aplicados.get(id(conexao), 0)
+        for inicializador in self.inicializadores[aplicados:]:
+            inicializador(conexao)
+            with self._condicao:
+                self.metricas["inicializacoes_sessao"] += 1
+        self._aplicados[id(conexao)] = len(self.inicializadores)
+
+    def adquirir(self):
+        inicio = time.perf_counter()
+        with self._condicao:
+            if self._fechado:
+                raise Exception("Pool de sessões encerrado.")
+
+            esperou = False
+            while not self._ociosas and self._abertas >= self.maximo:
+                esperou = True
+                restante = self.timeout - (time.perf_counter() - inicio)
+                if restante <= 0 or not self._condicao.wait(restante):
+                    raise Exception(f"Tempo esgotado aguardando conexão do pool ({self.maximo} em uso).")
+            if esperou:
+                self.metricas["esperas"] += 1
+                self.metricas["tempo_espera_s"] += time.perf_counter() - inicio
+
+            self.metricas["aquisicoes"] += 1
+            if self._ociosas:
+                conexao = self._ociosas.pop()
+                self.metricas["reutilizacoes"] += 1
+            else:
+                conexao = None
+                self._abertas += 1
+
+        if conexao is None:
+            # Conexão nova é aberta fora do lock (pode demorar)
+            try:
+                conexao = self.conectar()
+            except Exception as e:
+                print(f"Erro ao conectar ao banco: {e}")
+                self._liberar_vaga()
+                raise
+            with self._condicao:
+                self.metricas["conexoes_criadas"] += 1
+
+        try:
+            self._inicializar(conexao)
+        except Exception as e:
+            print(f"Erro ao inicializar sessão: {e}")
+            self._descartar(conexao)
+            raise
+        return conexao
+
+    def devolver(self, conexao, descartar=False):
+        if descartar or self._fechado:
+            self._descartar(conexao)
+            return
+        with self._condicao:
+            self._ociosas.append(conexao)
+            self._condicao.notify()
+
+    def _descartar(self, conexao):
+        self._aplicados.pop(id(conexao), None)
+        try:
+            conexao.close()
+        except Exception:
+            pass
+        self._liberar_vaga(descartada=True)
+
+    def _liberar_vaga(self, descartada=False):
+        with self._condicao:
+            self._abertas -= 1
+            if descartada:
+                self.metricas["conexoes_descartadas"] += 1
+            self._condicao.notify()
+
+    @contextmanager
+    def sessao(self):
+        """Empresta uma conexão; se o rollback falhar, a conexão está quebrada e é descartada"""
+        conexao = self.adquirir()
+        saudavel = True
+        try:
+            yield conexao
+        except Exception:
+            try:
+                conexao.rollback()
+            except Exception:
+                saudavel = False
+            raise
+        finally:
+            self.devolver(conexao, descartar=not saudavel)
+
+    def estatisticas(self):
+        with self._condicao:
+            ociosas = len(self._ociosas)
+            abertas = self._abertas
+        estatisticas = dict(self.metricas)
+        estatisticas.update({
+            "maximo": self.maximo,
+            "abertas": abertas,
+            "ociosas": ociosas,
+            "em_uso": abertas - ociosas,
+            "tempo_espera_s": round(self.metricas["tempo_espera_s"], 4),
+        })
+        return estatisticas
+
+    def fechar(self):
+        with self._condicao:
+            self._fechado = True
+            ociosas, self._ociosas = self._ociosas, []
+        for conexao in ociosas:
+            self._descartar(conexao)
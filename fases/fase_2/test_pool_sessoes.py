@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Teste do pool de sessões e do OracleRepository sem banco Oracle
+
+Usa o sqlite3 (também DB-API) como substituto do oracledb: as conexões são
+envolvidas para ignorar o ALTER SESSION e para contar quantas foram abertas,
+fechadas e quantas vezes a inicialização de sessão rodou.
+
+Executar a partir de fases/fase_2:  python test_pool_sessoes.py  (ou pytest)
+"""
+
+import asyncio
+import sqlite3
+import sys
+import threading
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from src.persistencia.pool_sessoes import PoolSessoes
+
+
+class ConexaoSubstituta:
+    """Conexão sqlite3 com a interface usada pelo repositório"""
+
+    def __init__(self, banco, falhar_cursor=False, falhar_rollback=False):
+        self.conexao = sqlite3.connect(banco, check_same_thread=False)
+        self.falhar_cursor = falhar_cursor
+        self.falhar_rollback = falhar_rollback
+        self.fechada = False
+        self.sessoes_alteradas = 0
+
+    def cursor(self):
+        if self.falhar_cursor:
+            raise Exception("falha ao abrir cursor")
+        return CursorSubstituto(self, self.conexao.cursor())
+
+    def commit(self):
+        self.conexao.commit()
+
+    def rollback(self):
+        if self.falhar_rollback:
+            raise Exception("conexão perdida")
+        self.conexao.rollback()
+
+    def close(self):
+        self.fechada = True
+        self.conexao.close()
+
+
+class CursorSubstituto:
+    """Cursor que ignora ALTER SESSION e troca os binds :1, :2 do Oracle por ?"""
+
+    def __init__(self, conexao, cursor):
+        self._conexao = conexao
+        self._cursor = cursor
+
+    def execute(self, query, params=()):
+        if query.upper().startswith("ALTER SESSION"):
+            self._conexao.sessoes_alteradas += 1
+            return
+        for i in range(len(params), 0, -1):
+            query = query.replace(f":{i}", "?")
+        self._cursor.execute(query, params)
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def close(self):
+        self._cursor.close()
+
+
+def criar_banco(caminho):
+    conexao = sqlite3.connect(caminho)
+    conexao.execute("CREATE TABLE talhoes (id TEXT PRIMARY KEY, nome TEXT, data TEXT)")
+    conexao.commit()
+    conexao.close()
+
+
+def criar_pool(caminho, abertas, maximo=2, timeout=30, **opcoes):
+    def conectar():
+        conexao = ConexaoSubstituta(caminho, **opcoes)
+        abertas.append(conexao)
+        return conexao
+    return PoolSessoes(conectar, maximo=maximo, timeout=timeout)
+
+
+def test_pool_reutiliza_conexoes(tmp_path):
+    """Conexões voltam ao pool e são reaproveitadas; a sessão é inicializada uma vez"""
+    abertas = []
+    inicializacoes = []
+    pool = criar_pool(tmp_path / "pool.db", abertas)
+    pool.adicionar_inicializador(lambda conexao: inicializacoes.append(conexao))
+
+    for _ in range(5):
+        with pool.sessao() as conexao:
+            conexao.cursor().execute("SELECT 1")
+
+    estatisticas = pool.estatisticas()
+    assert len(abertas) == 1
+    assert len(inicializacoes) == 1
+    assert estatisticas["aquisicoes"] == 5
+    assert estatisticas["reutilizacoes"] == 4
+    assert estatisticas["em_uso"] == 0
+
+    pool.fechar()
+    assert all(conexao.fechada for conexao in abertas)
+
+
+def test_pool_respeita_maximo(tmp_path):
+    """Acima do máximo quem pede espera; sem devolução, o timeout é respeitado"""
+    abertas = []
+    pool = criar_pool(tmp_path / "pool.db", abertas, maximo=2, timeout=0.2)
+
+    primeira = pool.adquirir()
+    segunda = pool.adquirir()
+    try:
+        pool.adquirir()
+        assert False, "a terceira aquisição deveria esgotar o tempo"
+    except Exception as e:
+        assert "Tempo esgotado" in str(e)
+
+    # Uma devolução em outra thread libera quem está esperando
+    threading.Timer(0.05, pool.devolver, args=(primeira,)).start()
+    pool.timeout = 5
+    terceira = pool.adquirir()
+    assert terceira is primeira
+    assert len(abertas) == 2
+    assert pool.estatisticas()["esperas"] == 1
+
+    pool.devolver(segunda)
+    pool.devolver(terceira)
+    pool.fechar()
+
+
+def test_pool_descarta_conexao_quebrada(tmp_path):
+    """Se o rollback falha, a conexão é fechada em vez de voltar ao pool"""
+    abertas = []
+    pool = criar_pool(tmp_path / "pool.db", abertas, falhar_rollback=True)
+
+    try:
+        with pool.sessao():
+            raise ValueError("erro na operação")
+    except ValueError:
+        pass
+
+    estatisticas = pool.estatisticas()
+    assert abertas[0].fechada
+    assert estatisticas["conexoes_descartadas"] == 1
+    assert estatisticas["abertas"] == 0
+
+
+def test_repositorio_com_pool(tmp_path):
+    """CRUD do OracleRepository sobre o substituto, com uma única sessão inicializada"""
+    from src.persistencia.adapters.oracle_repository import OracleRepository
+
+    criar_banco(tmp_path / "fase2.db")
+    abertas = []
+    pool = criar_pool(tmp_path / "fase2.db", abertas)
+    repositorio = OracleRepository("substituto", "talhoes", pool=pool)
+
+    assert asyncio.run(repositorio.inserir({"id": "t1", "nome": "Talhão 1", "data": "01/02/2024"}))
+    assert asyncio.run(repositorio.atualizar("t1", {"nome": "Talhão A"}))
+    registros = asyncio.run(repositorio.listar())
+    assert registros == [{"id": "t1", "nome": "Talhão A", "data": "01/02/2024"}]
+    assert asyncio.run(repositorio.deletar("t1"))
+    assert asyncio.run(repositorio.listar()) == []
+
+    assert len(abertas) == 1
+    assert abertas[0].sessoes_alteradas == 1
+    assert pool.estatisticas()["em_uso"] == 0
+    pool.fechar()
+
+
+def test_repositorio_devolve_conexao_se_cursor_falha(tmp_path):
+    """Falha ao abrir o cursor não pode deixar a conexão presa fora do pool"""
+    from src.persistencia.adapters.oracle_repository import OracleRepository
+
+    criar_banco(tmp_path / "fase2.db")
+    abertas = []
+    pool = criar_pool(tmp_path / "fase2.db", abertas, maximo=1, timeout=0.2)
+    repositorio = OracleRepository("substituto", "talhoes", pool=pool)
+
+    abertas_antes = len(abertas)
+    conexao = pool.adquirir()
+    conexao.falhar_cursor = True
+    pool.devolver(conexao)
+
+    for operacao in (
+        repositorio.inserir({"id": "t1"}),
+        repositorio.listar(),
+        repositorio.atualizar("t1", {"nome": "x"}),
+        repositorio.deletar("t1"),
+    ):
+        try:
+            asyncio.run(operacao)
+            assert False, "a operação deveria propagar o erro do cursor"
+        except Exception as e:
+            assert "falha ao abrir cursor" in str(e)
+        assert pool.estatisticas()["em_uso"] == 0
+
+    assert len(abertas) == abertas_antes + 1
+    pool.fechar()
+
+
+if __name__ == "__main__":
+    import tempfile
+
+    testes = [
+        test_pool_reutiliza_conexoes,
+        test_pool_respeita_maximo,
+        test_pool_descarta_conexao_quebrada,
+        test_repositorio_com_pool,
+        test_repositorio_devolve_conexao_se_cursor_falha,
+    ]
+    falhas = 0
+    for teste in testes:
+        with tempfile.TemporaryDirectory() as pasta:
+            try:
+                teste(Path(pasta))
+                print(f"✅ {teste.__name__}")
+            except Exception as e:
+                falhas += 1
+                print(f"❌ {teste.__name__}: {e}")
+    sys.exit(1 if falhas else 0)
@@ -0,0 +1,94 @@
+"""
+Benchmark dos backends do modelo YOLO: latência em CPU e mAP no conjunto de teste
+
+Compara best.pt (PyTorch), best.onnx e best_int8.onnx (gerados por
+exportar_modelo.py) usando as imagens de yolo_dataset/images/test.
+"""
+
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+from ultralytics import YOLO
+
+# Adicionar path do dashboard
+sys.path.append(str(Path(__file__).parent.parent.parent / "dashboard_integrado"))
+
+from servicos.fase6_yolo import ARQUIVOS_BACKEND_YOLO, PASTA_PESOS_YOLO
+
+# Caminhos
+base_path = Path(__file__).parent
+data_yaml = base_path / "yolo_dataset" / "data.yaml"
+imagens_teste = sorted((base_path / "yolo_dataset" / "images" / "test").glob("*.jpg"))
+
+# Configuração
+IMGSZ = 640
+AQUECIMENTO = 3  # Execuções descartadas antes de medir
+MAX_IMAGENS = 50
+
+# data.yaml com caminho local (o original aponta para a máquina de treino)
+data_yaml_local = base_path / "runs" / "benchmark_data.yaml"
+data_yaml_local.parent.mkdir(parents=True, exist_ok=True)
+linhas = [
+    f"path: {base_path / 'yolo_dataset'}" if linha.startswith("path:") else linha
+    for linha in data_yaml.read_text().splitlines()
+]
+data_yaml_local.write_text("\n".join(linhas) + "\n")
+
+if not imagens_teste:
+    raise SystemExit(f"❌ Nenhuma imagem de teste em {base_path / 'yolo_dataset' / 'images' / 'test'}")
+
+imagens = [str(p) for p in imagens_teste[:MAX_IMAGENS]]
+resultados = []
+
+for backend, arquivo in ARQUIVOS_BACKEND_YOLO.items():
+    pesos = PASTA_PESOS_YOLO / arquivo
+    if not pesos.exists():
+        print(f"⏭️ {backend}: {pesos.name} não encontrado (rode exportar_modelo.py)")
+        continue
+
+    print(f"\n🧪 Backend: {backend} ({pesos.name})")
+    model = YOLO(str(pesos), task="detect")
+
+    # Latência por imagem (CPU, uma imagem por chamada)
+    for img in imagens[:AQUECIMENTO]:
+        model.predict(source=img, imgsz=IMGSZ, device="cpu", verbose=False)
+
+    tempos = []
+    for img in imagens:
+        inicio = time.perf_counter()
+        model.predict(source=img, imgsz=IMGSZ, device="cpu", verbose=False)
+        tempos.append((time.perf_counter() - inicio) * 1000)
+
+    # Precisão no conjunto de teste
+    metricas = model.val(
+        data=str(data_yaml_local),
+        split="test",
+        imgsz=IMGSZ,
+        batch=1,
+        device="cpu",
+        plots=False,
+        verbose=False
+    )
+
+    resultados.append({
+        "backend": backend,
+        "tamanho_mb": pesos.stat().st_size / (1024 * 1024),
+        "latencia_media_ms": float(np.mean(tempos)),
+        "latencia_p95_ms": float(np.percentile(tempos, 95)),
+        "map50": float(metricas.box.map50),
+        "map50_95": float(metricas.box.map),
+    })
+
+print("\n" + "=" * 78)
+print(f"{'Backend':<12}{'Tamanho (MB)':>14}{'Média (ms)':>12}{'p95 (ms)':>10}{'mAP50':>10}{'mAP50-95':>11}{'Speedup':>9}")
+print("=" * 78)
+
+referencia = next((r for r in resultados if r["backend"] == "pt"), resultados[0] if resultados else None)
+for r in resultados:
+    speedup = referencia["latencia_media_ms"] / r["latencia_media_ms"] if r["latencia_media_ms"] else 0
+    print(
+        f"{r['backend']:<12}{r['tamanho_mb']:>14.1f}{r['latencia_media_ms']:>12.1f}"
+        f"{r['latencia_p95_ms']:>10.1f}{r['map50']:>10.3f}{r['map50_95']:>11.3f}{speedup:>8.2f}x"
+    )
@@ -0,0 +1,70 @@
+"""
+Script para exportar o modelo YOLO treinado para inferência otimizada em CPU
+
+Gera, ao lado de best.pt:
+  - best.onnx       (ONNX, batch dinâmico, usado pelo backend "onnx")
+  - best_int8.onnx  (pesos quantizados em int8, backend "onnx_int8")
+
+O dashboard escolhe o backend pela variável de ambiente YOLO_BACKEND
+("pt", "onnx", "onnx_int8" ou "auto"). Compare latência e mAP com
+benchmark_backends.py antes de adotar o int8.
+"""
+
+from ultralytics import YOLO
+from pathlib import Path
+import shutil
+
+# Caminhos
+base_path = Path(__file__).parent
+weights_dir = base_path / "runs" / "detect" / "train_100epochs_corrigido" / "weights"
+pesos_pt = weights_dir / "best.pt"
+
+# Configuração da exportação
+IMGSZ = 640  # Mesmo tamanho usado no treinamento (retreinar_modelo.py)
+QUANTIZAR_INT8 = True
+
+if not pesos_pt.exists():
+    raise SystemExit(f"❌ Modelo não encontrado: {pesos_pt}\n   Rode retreinar_modelo.py primeiro")
+
+print("=" * 60)
+print("📦 Exportando modelo para ONNX")
+print("=" * 60)
+
+model = YOLO(str(pesos_pt))
+onnx_exportado = Path(model.export(
+    format="onnx",
+    imgsz=IMGSZ,
+    dynamic=True,   # Permite lotes de tamanho variável (detectar_lote, vídeo)
+    simplify=True,
+    opset=12
+))
+
+pesos_onnx = weights_dir / "best.onnx"
+if onnx_exportado.resolve() != pesos_onnx.resolve():
+    shutil.move(str(onnx_exportado), pesos_onnx)
+print(f"✅ ONNX salvo em: {pesos_onnx}")
+
+if QUANTIZAR_INT8:
+    print("\n" + "=" * 60)
+    print("🗜️ Quantizando pesos para int8")
+    print("=" * 60)
+    try:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        pesos_int8 = weights_dir / "best_int8.onnx"
+        quantize_dynamic(
+            str(pesos_onnx),
+            str(pesos_int8),
+            weight_type=QuantType.QUInt8
+        )
+        tamanho_fp32 = pesos_onnx.stat().st_size / (1024 * 1024)
+        tamanho_int8 = pesos_int8.stat().st_size / (1024 * 1024)
+        print(f"✅ int8 salvo em: {pesos_int8}")
+        print(f"   Tamanho: {tamanho_fp32:.1f} MB -> {tamanho_int8:.1f} MB")
+    except ImportError:
+        print("⚠️ onnxruntime não instalado - quantização int8 ignorada")
+        print("   Instale com: pip install onnxruntime")
+
+print("\n✅ Exportação concluída!")
+print("   Use YOLO_BACKEND=onnx (ou onnx_int8) para ativar no dashboard")
+print("   Compare os backends com: python benchmark_backends.py")
@@ -0,0 +1,402 @@
+"""
+Script para preparar o dataset YOLO em paralelo e de forma incremental
+
+Substitui a conversão do notebook + corrigir_labels.py para datasets grandes:
+  1. Lista as imagens de dataset/<classe>/<split>/ e seus labels em labels/
+  2. Em um pool de processos, para cada imagem alterada:
+     - verifica a integridade da imagem (corrompida/truncada é descartada)
+     - valida e corrige o label (classe pela pasta, caixas dentro de [0, 1],
+       linhas inválidas ou duplicadas removidas)
+     - copia imagem e label para yolo_dataset/{images,labels}/{train,val,test}
+  3. Imagens fora de train/validation/test recebem o split pelo hash do
+     conteúdo (80/10/10), estável entre execuções
+  4. Calcula estatísticas por classe e split e atualiza data.yaml
+
+O manifesto (yolo_dataset/manifesto.json) guarda tamanho, mtime e hash de
+cada arquivo: numa nova execução só o que mudou é reprocessado, arquivos
+removidos da origem saem do dataset, e uma execução interrompida continua
+de onde parou.
+"""
+
+import hashlib
+import io
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+# Caminhos
+base_path = Path(__file__).parent
+DATASET_ORIGEM = base_path / "dataset"
+LABELS_ORIGEM = base_path / "labels"
+YOLO_DATASET = base_path / "yolo_dataset"
+MANIFESTO = YOLO_DATASET / "manifesto.json"
+
+# Configuração
+CLASSES = {"cat": 0, "dog": 1}
+SPLITS_ORIGEM = {"train": "train", "validation": "val", "val": "val", "test": "test"}
+PROPORCAO_SPLIT = {"train": 0.8, "val": 0.1, "test": 0.1}
+EXTENSOES_IMAGEM = (".jpg", ".jpeg", ".png")
+NUM_PROCESSOS = os.cpu_count() or 1
+ITENS_POR_TAREFA = 32      # Imagens enviadas de uma vez a cada processo
+SALVAR_MANIFESTO_A_CADA = 1000
+VERSAO_REGRAS = 1          # Incrementar ao mudar as regras abaixo reprocessa tudo
+
+
+def hash_bytes(dados):
+    """Hash do conteúdo (mesmo algoritmo do cache de imagens do dashboard)"""
+    return hashlib.blake2b(dados, digest_size=16).hexdigest()
+
+
+def assinatura(caminho):
+    """(tamanho, mtime) do arquivo, ou None se não existir"""
+    if caminho is None:
+        return None
+    try:
+        info = os.stat(caminho)
+    except OSError:
+        return None
+    return [info.st_size, info.st_mtime_ns]
+
+
+def split_por_hash(hash_imagem):
+    """Split determinístico a partir do hash: a mesma imagem cai sempre no mesmo split"""
+    posicao = int(hash_imagem[:8], 16) / 0xFFFFFFFF
+    acumulado = 0.0
+    for split, proporcao in PROPORCAO_SPLIT.items():
+        acumulado += proporcao
+        if posicao <= acumulado:
+            return split
+    return "train"
+
+
+def listar_origem():
+    """Lista as imagens da origem com classe, split e label correspondente"""
+    itens = []
+    for classe, class_id in CLASSES.items():
+        pasta_classe = DATASET_ORIGEM / classe
+        if not pasta_classe.exists():
+            print(f"  ⚠️  {pasta_classe} não encontrado")
+            continue
+
+        for imagem in sorted(pasta_classe.rglob("*")):
+            if imagem.suffix.lower() not in EXTENSOES_IMAGEM:
+                continue
+
+            # Split pela pasta (dataset/cat/train/0.jpg); senão, pelo hash
+            relativo = imagem.relative_to(pasta_classe)
+            split = SPLITS_ORIGEM.get(relativo.parts[0]) if len(relativo.parts) > 1 else None
+
+            # Label específico da classe (cat_0.txt) tem prioridade sobre o compartilhado (0.txt)
+            label = LABELS_ORIGEM / f"{classe}_{imagem.stem}.txt"
+            if not label.exists():
+                label = LABELS_ORIGEM / f"{imagem.stem}.txt"
+
+            itens.append({
+                "chave": str(imagem.relative_to(DATASET_ORIGEM)),
+                "imagem": str(imagem),
+                "label": str(label) if label.exists() else None,
+                "classe": classe,
+                "class_id": class_id,
+                "split": split,
+                "nome": f"{classe}_{imagem.stem}",
+                "extensao": imagem.suffix.lower(),
+            })
+    return itens
+
+
+def verificar_imagem(dados):
+    """Retorna (largura, altura) ou lança exceção se a imagem estiver corrompida"""
+    if Image is not None:
+        with Image.open(io.BytesIO(dados)) as img:
+            img.load()  # Decodifica tudo: detecta arquivos truncados
+            return img.size
+
+    # Sem Pillow: confere assinatura e marcador de fim do arquivo
+    if dados.startswith(b"\xff\xd8"):
+        if not dados.rstrip(b"\x00").endswith(b"\xff\xd9"):
+            raise ValueError("JPEG truncado")
+        return (None, None)
+    if dados.startswith(b"\x89PNG\r\n\x1a\n"):
+        if b"IEND" not in dados[-12:]:
+            raise ValueError("PNG truncado")
+        return (None, None)
+    if dados[:2] == b"BM" or dados[:4] in (b"GIF8", b"RIFF"):
+        return (None, None)
+    raise ValueError("formato de imagem não reconhecido")
+
+
+def corrigir_label(texto, class_id):
+    """
+    Valida e corrige um label YOLO
+
+    Returns:
+        (linhas corrigidas, contadores de correções)
+    """
+    correcoes = {"classe": 0, "caixa_ajustada": 0, "linha_descartada": 0, "duplicada": 0, "label_criado": 0}
+    linhas = []
+    vistas = set()
+
+    for linha in (texto or "").splitlines():
+        partes = linha.split()
+        if not partes:
+            continue
+        if len(partes) != 5:
+            correcoes["linha_descartada"] += 1
+            continue
+        try:
+            classe_label = int(float(partes[0]))
+            x, y, w, h = (float(v) for v in partes[1:])
+        except ValueError:
+            correcoes["linha_descartada"] += 1
+            continue
+
+        # A classe vem da pasta da imagem (erro corrigido por corrigir_labels.py)
+        if classe_label != class_id:
+            correcoes["classe"] += 1
+
+        # Recorta a caixa para dentro da imagem
+        x1, y1 = max(0.0, x - w / 2), max(0.0, y - h / 2)
+        x2, y2 = min(1.0, x + w / 2), min(1.0, y + h / 2)
+        if x2 <= x1 or y2 <= y1:
+            correcoes["linha_descartada"] += 1
+            continue
+        ajustada = (round((x1 + x2) / 2, 6), round((y1 + y2) / 2, 6), round(x2 - x1, 6), round(y2 - y1, 6))
+        if ajustada != (round(x, 6), round(y, 6), round(w, 6), round(h, 6)):
+            correcoes["caixa_ajustada"] += 1
+
+        nova = f"{class_id} " + " ".join(f"{v:.6f}" for v in ajustada)
+        if nova in vistas:
+            correcoes["duplicada"] += 1
+            continue
+        vistas.add(nova)
+        linhas.append(nova)
+
+    if not linhas:
+        # Mesmo padrão do notebook: caixa cobrindo a imagem inteira
+        linhas.append(f"{class_id} 0.500000 0.500000 1.000000 1.000000")
+        correcoes["label_criado"] = 1
+
+    return linhas, correcoes
+
+
+def escrever_atomico(caminho, dados):
+    """Escreve em arquivo temporário e renomeia (execução interrompida não deixa arquivo pela metade)"""
+    temporario = caminho.with_name(caminho.name + ".tmp")
+    with open(temporario, "wb") as f:
+        f.write(dados)
+    os.replace(temporario, caminho)
+
+
+def processar_item(item):
+    """Processa uma imagem no processo trabalhador e retorna a entrada do manifesto"""
+    entrada = {
+        "imagem": item["assinatura_imagem"],
+        "label": item["assinatura_label"],
+        "classe": item["classe"],
+        "class_id": item["class_id"],
+    }
+    try:
+        with open(item["imagem"], "rb") as f:
+            dados = f.read()
+        entrada["hash_imagem"] = hash_bytes(dados)
+
+        try:
+            entrada["largura"], entrada["altura"] = verificar_imagem(dados)
+        except Exception as e:
+            entrada["status"] = "corrompida"
+            entrada["erro"] = str(e)
+            return item["chave"], entrada
+
+        texto = ""
+        if item["label"]:
+            with open(item["label"], "r", encoding="utf-8", errors="replace") as f:
+                texto = f.read()
+        linhas, correcoes = corrigir_label(texto, item["class_id"])
+        conteudo_label = ("\n".join(linhas) + "\n").encode()
+
+        split = item["split"] or split_por_hash(entrada["hash_imagem"])
+        destino_imagem = YOLO_DATASET / "images" / split / (item["nome"] + item["extensao"])
+        destino_label = YOLO_DATASET / "labels" / split / (item["nome"] + ".txt")
+        destino_imagem.parent.mkdir(parents=True, exist_ok=True)
+        destino_label.parent.mkdir(parents=True, exist_ok=True)
+
+        # Só reescreve a imagem se o conteúdo mudou de fato (mtime pode mudar sem alteração)
+        if item.get("hash_anterior") != entrada["hash_imagem"] or not destino_imagem.exists():
+            escrever_atomico(destino_imagem, dados)
+        escrever_atomico(destino_label, conteudo_label)
+
+        entrada.update({
+            "status": "ok",
+            "split": split,
+            "destino_imagem": str(destino_imagem.relative_to(YOLO_DATASET)),
+            "destino_label": str(destino_label.relative_to(YOLO_DATASET)),
+            "caixas": len(linhas),
+            "area_media": round(sum(float(l.split()[3]) * float(l.split()[4]) for l in linhas) / len(linhas), 4),
+            "correcoes": {k: v for k, v in correcoes.items() if v},
+        })
+    except Exception as e:
+        entrada["status"] = "erro"
+        entrada["erro"] = str(e)
+    return item["chave"], entrada
+
+
+def carregar_manifesto():
+    """Lê o manifesto anterior (vazio se não existir ou se as regras mudaram)"""
+    if not MANIFESTO.exists():
+        return {}
+    try:
+        with open(MANIFESTO, "r", encoding="utf-8") as f:
+            manifesto = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Manifesto ilegível, reprocessando tudo: {e}")
+        return {}
+    if manifesto.get("versao_regras") != VERSAO_REGRAS:
+        print("♻️ Regras de validação mudaram, reprocessando tudo")
+        return {}
+    return manifesto.get("arquivos", {})
+
+
+def salvar_manifesto(arquivos, estatisticas=None):
+    conteudo = {"versao_regras": VERSAO_REGRAS, "atualizado_em": time.strftime("%Y-%m-%d %H:%M:%S"), "arquivos": arquivos}
+    if estatisticas is not None:
+        conteudo["estatisticas"] = estatisticas
+    escrever_atomico(MANIFESTO, json.dumps(conteudo, indent=1, ensure_ascii=False).encode("utf-8"))
+
+
+def remover_saidas(entrada):
+    """Remove do yolo_dataset a imagem e o label gerados por uma entrada antiga"""
+    for campo in ("destino_imagem", "destino_label"):
+        if entrada.get(campo):
+            (YOLO_DATASET / entrada[campo]).unlink(missing_ok=True)
+
+
+def calcular_estatisticas(arquivos):
+    """Contagens por split e classe a partir do manifesto (sem reler arquivos)"""
+    estatisticas = {"splits": {}, "corrompidas": 0, "erros": 0, "correcoes": {}}
+    for entrada in arquivos.values():
+        if entrada["status"] != "ok":
+            estatisticas["corrompidas" if entrada["status"] == "corrompida" else "erros"] += 1
+            continue
+        classes = estatisticas["splits"].setdefault(entrada["split"], {})
+        dados = classes.setdefault(entrada["classe"], {"imagens": 0, "caixas": 0, "soma_area": 0.0})
+        dados["imagens"] += 1
+        dados["caixas"] += entrada["caixas"]
+        dados["soma_area"] += entrada["area_media"]
+        for tipo, quantidade in entrada.get("correcoes", {}).items():
+            estatisticas["correcoes"][tipo] = estatisticas["correcoes"].get(tipo, 0) + quantidade
+
+    for classes in estatisticas["splits"].values():
+        for dados in classes.values():
+            dados["area_media"] = round(dados.pop("soma_area") / dados["imagens"], 4)
+    return estatisticas
+
+
+def escrever_data_yaml():
+    nomes = "\n".join(f"- {classe}" for classe in sorted(CLASSES, key=CLASSES.get))
+    conteudo = (
+        f"path: {YOLO_DATASET.resolve()}\n"
+        "train: images/train\n"
+        "val: images/val\n"
+        "test: images/test\n"
+        f"nc: {len(CLASSES)}\n"
+        f"names:\n{nomes}\n"
+    )
+    escrever_atomico(YOLO_DATASET / "data.yaml", conteudo.encode("utf-8"))
+
+
+def main():
+    inicio = time.perf_counter()
+    YOLO_DATASET.mkdir(parents=True, exist_ok=True)
+
+    print("=" * 60)
+    print("🗂️ Preparando dataset YOLO")
+    print("=" * 60)
+    print(f"📁 Origem: {DATASET_ORIGEM}")
+    print(f"📁 Labels: {LABELS_ORIGEM}")
+    print(f"📁 Destino: {YOLO_DATASET}")
+    if Image is None:
+        print("⚠️ Pillow não instalado: integridade verificada só pelo cabeçalho/fim do arquivo")
+
+    manifesto = carregar_manifesto()
+    itens = listar_origem()
+    chaves = {item["chave"] for item in itens}
+
+    # Arquivos que saíram da origem também saem do dataset
+    removidos = [chave for chave in manifesto if chave not in chaves]
+    for chave in removidos:
+        remover_saidas(manifesto.pop(chave))
+
+    # Só vai para o pool o que mudou desde a última execução
+    pendentes = []
+    for item in itens:
+        item["assinatura_imagem"] = assinatura(item["imagem"])
+        item["assinatura_label"] = assinatura(item["label"])
+        anterior = manifesto.get(item["chave"])
+        if (
+            anterior is not None
+            and anterior["imagem"] == item["assinatura_imagem"]
+            and anterior["label"] == item["assinatura_label"]
+            and (anterior["status"] != "ok" or (YOLO_DATASET / anterior["destino_label"]).exists())
+        ):
+            continue
+        item["hash_anterior"] = anterior.get("hash_imagem") if anterior else None
+        pendentes.append(item)
+
+    print(f"\n🔎 {len(itens)} imagens na origem | {len(pendentes)} novas ou alteradas | {len(removidos)} removidas")
+
+    if pendentes:
+        print(f"⚙️ Processando com {NUM_PROCESSOS} processo(s)...")
+        with ProcessPoolExecutor(max_workers=NUM_PROCESSOS) as executor:
+            resultados = executor.map(processar_item, pendentes, chunksize=ITENS_POR_TAREFA)
+            for n, (chave, entrada) in enumerate(resultados, start=1):
+                anterior = manifesto.get(chave)
+                # Mudou de split (ou ficou corrompida): apaga a cópia antiga
+                if anterior and anterior.get("destino_imagem") != entrada.get("destino_imagem"):
+                    remover_saidas(anterior)
+                manifesto[chave] = entrada
+                if entrada["status"] == "corrompida":
+                    print(f"  ❌ Corrompida: {chave} ({entrada['erro']})")
+                elif entrada["status"] == "erro":
+                    print(f"  ❌ Erro: {chave} ({entrada['erro']})")
+
+                # Checkpoint: uma execução interrompida retoma daqui
+                if n % SALVAR_MANIFESTO_A_CADA == 0:
+                    salvar_manifesto(manifesto)
+                    print(f"  💾 {n}/{len(pendentes)} processadas")
+
+    if pendentes or removidos:
+        # Cache de labels do Ultralytics fica desatualizado
+        for cache in (YOLO_DATASET / "labels").glob("*.cache"):
+            cache.unlink()
+
+    estatisticas = calcular_estatisticas(manifesto)
+    salvar_manifesto(manifesto, estatisticas)
+    escrever_data_yaml()
+
+    tempo = time.perf_counter() - inicio
+    print(f"\n📊 Estatísticas por split:")
+    for split in PROPORCAO_SPLIT:
+        for classe, dados in sorted(estatisticas["splits"].get(split, {}).items()):
+            print(f"   {split:5s} | {classe:5s} | {dados['imagens']:6d} imagens | "
+                  f"{dados['caixas']:6d} caixas | área média {dados['area_media']:.3f}")
+
+    if estatisticas["correcoes"]:
+        print(f"\n🛠️ Correções nos labels:")
+        for tipo, quantidade in sorted(estatisticas["correcoes"].items()):
+            print(f"   {tipo}: {quantidade}")
+
+    print(f"\n   Imagens corrompidas: {estatisticas['corrompidas']}")
+    print(f"   Erros: {estatisticas['erros']}")
+    print(f"\n✅ Dataset pronto em {tempo:.1f}s ({len(pendentes) / tempo:.0f} imagens/s processadas)")
+    print(f"📄 Manifesto: {MANIFESTO}")
+
+
+if __name__ == "__main__":
+    main()